@@ -1,22 +1,76 @@
 import os
+import threading
 from dotenv import load_dotenv
 from src.web_interface import WebInterface
 
 
+def create_server(web_interface):
+    """Serve the Gradio app next to liveness and readiness probes."""
+    import gradio as gr
+    from fastapi import FastAPI
+    from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse
+    from src.metrics import metrics
+
+    server = FastAPI()
+
+    @server.get("/healthz")
+    def liveness():
+        if not web_interface.is_live():
+            return JSONResponse({"status": "failed"}, status_code=500)
+        return {"status": "alive"}
+
+    @server.get("/readyz")
+    def readiness():
+        if not web_interface.is_ready():
+            return JSONResponse({"status": "warming up"}, status_code=503)
+        return {"status": "ready"}
+
+    @server.get("/metrics", response_class=PlainTextResponse)
+    def export_metrics():
+        return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+    @server.get("/jobs")
+    def list_jobs():
+        if web_interface.ingestion_jobs is None:
+            return []
+        return web_interface.ingestion_jobs.list_jobs()
+
+    @server.get("/jobs/{job_id}")
+    def get_job(job_id: str):
+        job = web_interface.ingestion_jobs.get_job(job_id) if web_interface.ingestion_jobs else None
+        if job is None:
+            return JSONResponse({"error": "unknown job"}, status_code=404)
+        return job
+
+    @server.get("/favicon.ico", include_in_schema=False)
+    def favicon():
+        return FileResponse("images/KnowNetQA_icon.png")
+
+    # Create the Gradio web interface
+    app = web_interface.create_web_interface()
+    return gr.mount_gradio_app(server, app, path="/")
+
+
 def run_app(prevent_thread_lock: bool = False):
+    import uvicorn
+
     # Load environment variables
     load_dotenv()
 
-    # Instantiate the WebInterface class
+    # Instantiate the WebInterface class, loading the models in the background
     web_interface = WebInterface()
+    web_interface.start_warm_up()
 
-    # Create and launch the Gradio web interface
-    app = web_interface.create_web_interface()
-    app.launch(server_name=os.environ.get('GRADIO_SERVER_NAME'),
-               server_port=int(os.environ.get('GRADIO_SERVER_PORT')),
-               favicon_path="images/KnowNetQA_icon.png",
-               prevent_thread_lock=prevent_thread_lock,
-               )
+    # Bind the port right away; /readyz reports when the models are loaded
+    server = uvicorn.Server(uvicorn.Config(
+        create_server(web_interface),
+        host=os.environ.get('GRADIO_SERVER_NAME') or "127.0.0.1",
+        port=int(os.environ.get('GRADIO_SERVER_PORT') or 8080),
+    ))
+    if prevent_thread_lock:
+        threading.Thread(target=server.run, daemon=True).start()
+        return server
+    server.run()
 
 
 if __name__ == "__main__":
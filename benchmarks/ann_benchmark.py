@@ -0,0 +1,78 @@
+import argparse
+import json
+import time
+import numpy as np
+from src.ann_index import ExactIndex, HnswIndex
+
+
+def generate_vectors(count, dimensions, clusters, rng):
+    """Normalized vectors drawn around random centers, closer to real embeddings than uniform noise."""
+    centers = rng.normal(size=(clusters, dimensions)).astype(np.float32)
+    vectors = centers[rng.integers(clusters, size=count)] + 0.5 * rng.normal(size=(count, dimensions)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def evaluate(name, index, ids, vectors, queries, ground_truth, k):
+    start = time.perf_counter()
+    for start_row in range(0, len(ids), 10_000):
+        index.add(ids[start_row:start_row + 10_000], vectors[start_row:start_row + 10_000])
+    build_time = time.perf_counter() - start
+
+    latencies, hits = [], 0
+    for query, expected in zip(queries, ground_truth):
+        start = time.perf_counter()
+        results = index.search(query, k)
+        latencies.append(time.perf_counter() - start)
+        hits += len(expected & {result_id for result_id, _ in results})
+
+    return {
+        "engine": name,
+        f"recall@{k}": round(hits / (k * len(queries)), 4),
+        "p50_ms": round(float(np.percentile(latencies, 50)) * 1e3, 3),
+        "p99_ms": round(float(np.percentile(latencies, 99)) * 1e3, 3),
+        "build_seconds": round(build_time, 3),
+        "estimated_bytes_per_vector": round(index.estimate_memory_bytes() / len(ids), 1),
+    }
+
+
+def run(sizes, dimensions, num_queries, k, hnsw_params, seed=0):
+    rng = np.random.default_rng(seed)
+    results = []
+    for size in sizes:
+        vectors = generate_vectors(size + num_queries, dimensions, clusters=max(size // 100, 10), rng=rng)
+        vectors, queries = vectors[:size], vectors[size:]
+        ids = [str(i) for i in range(size)]
+
+        # Exact float32 search is the reference for recall
+        scores = queries @ vectors.T
+        ground_truth = [{ids[row] for row in np.argpartition(-row_scores, k - 1)[:k]} for row_scores in scores]
+
+        engines = [("exact-float32", lambda: ExactIndex(dimensions, "float32")),
+                   ("exact-int8", lambda: ExactIndex(dimensions, "int8"))]
+        for M, ef_construction, ef_search in hnsw_params:
+            engines.append((f"hnsw-M{M}-efc{ef_construction}-ef{ef_search}",
+                            lambda M=M, efc=ef_construction, ef=ef_search: HnswIndex(dimensions, M, efc, ef)))
+
+        for name, create in engines:
+            result = evaluate(name, create(), ids, vectors, queries, ground_truth, k)
+            results.append({"corpus_size": size, **result})
+            print(json.dumps(results[-1]))
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recall and latency of the vector index engines against exact search.")
+    parser.add_argument("--sizes", nargs="+", type=int, default=[1_000, 10_000, 100_000])
+    parser.add_argument("--dimensions", type=int, default=384)
+    parser.add_argument("--num-queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=4)
+    parser.add_argument("--hnsw", nargs="+", default=["16,200,64", "32,200,128"],
+                        help="HNSW parameter sets as M,ef_construction,ef_search")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    args = parser.parse_args()
+
+    hnsw_params = [tuple(int(value) for value in params.split(",")) for params in args.hnsw]
+    results = run(args.sizes, args.dimensions, args.num_queries, args.k, hnsw_params)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
@@ -0,0 +1,130 @@
+import argparse
+import json
+import tempfile
+import time
+from urllib.parse import urljoin, urlparse
+import requests
+from bs4 import BeautifulSoup
+from src.utils import config
+from src.web_crawler import WebCrawler
+from src.page_cache import PageCache
+from benchmarks.fixture_site import FixtureSite, generate_pages
+
+
+def internal_links(soup, url, visited):
+    links = set()
+    for link in soup.find_all('a', href=True):
+        full_url = urljoin(url, link['href'])
+        if urlparse(full_url).netloc == urlparse(url).netloc and full_url not in visited:
+            links.add(full_url)
+    return links
+
+
+def crawl_sequential(start_url, max_pages):
+    """Baseline: one `requests.get` per page plus a second fetch and parse for link discovery."""
+    visited = set()
+    pages_to_visit = {start_url}
+    while pages_to_visit and len(visited) < max_pages:
+        url = pages_to_visit.pop()
+        if url in visited:
+            continue
+        visited.add(url)
+        response = requests.get(url)
+        BeautifulSoup(response.content, 'html.parser').find_all('p')
+        response = requests.get(url)
+        pages_to_visit.update(internal_links(BeautifulSoup(response.content, 'html.parser'), url, visited))
+    return len(visited)
+
+
+def crawl_concurrent(web_crawler, start_url, max_pages):
+    """Concurrent crawl with a pooled session and one fetch plus one parse per page."""
+    visited = set()
+    pages_to_visit = {start_url}
+
+    def process_page(url, response):
+        soup = BeautifulSoup(response.content, 'html.parser')
+        soup.find_all('p')
+        pages_to_visit.update(internal_links(soup, url, visited))
+        return True
+
+    web_crawler.crawl(pages_to_visit, visited, process_page, max_pages)
+    return len(visited)
+
+
+def crawl_cached(web_crawler, start_url, max_pages):
+    """Concurrent crawl through the page cache, parsing each distinct body once."""
+    visited = set()
+    pages_to_visit = {start_url}
+
+    def process_page(url, page):
+        parsed = web_crawler.page_cache.get_parsed(page.body_hash, "html.parser", page.encoding)
+        if parsed is None:
+            soup = BeautifulSoup(page.content, 'html.parser')
+            parsed = {"paragraphs": [p.get_text(strip=True) for p in soup.find_all('p')],
+                      "links": [link['href'] for link in soup.find_all('a', href=True)]}
+            web_crawler.page_cache.put_parsed(page.body_hash, "html.parser", page.encoding, parsed)
+        pages_to_visit.update(full_url for full_url in (urljoin(url, href) for href in parsed["links"])
+                              if urlparse(full_url).netloc == urlparse(url).netloc and full_url not in visited)
+        return True
+
+    web_crawler.crawl(pages_to_visit, visited, process_page, max_pages)
+    return len(visited)
+
+
+def run_recrawls(site, start_url, max_pages):
+    """Crawl the same site with a cold cache, then again with fresh entries and with expired (revalidated) ones."""
+    results = {}
+    with tempfile.TemporaryDirectory() as cache_dir:
+        page_cache = PageCache(cache_dir)
+        web_crawler = WebCrawler(page_cache=page_cache)
+        for name, ttl in [("cold_cache", 3600), ("fresh_cache", 3600), ("revalidated_cache", 0)]:
+            config.page_cache.ttl = ttl
+            site.request_count = site.not_modified_count = 0
+            start = time.perf_counter()
+            pages = crawl_cached(web_crawler, start_url, max_pages)
+            elapsed = time.perf_counter() - start
+            results[name] = {
+                "pages": pages,
+                "requests": site.request_count,
+                "not_modified": site.not_modified_count,
+                "seconds": round(elapsed, 4),
+                "pages_per_second": round(pages / elapsed, 2),
+            }
+        web_crawler.close()
+        page_cache.close()
+    return results
+
+
+def run(num_pages, max_pages, latency, workers):
+    config.web_crawler.max_workers = workers
+    config.web_crawler.min_delay_per_host = 0.0
+    config.web_crawler.verbose = False
+    results = {}
+    with FixtureSite(generate_pages(num_pages), latency=latency) as site:
+        start_url = f"{site.base_url}/page/0"
+        for name, crawl in [("sequential", crawl_sequential),
+                            ("concurrent", lambda url, n: crawl_concurrent(WebCrawler(), url, n))]:
+            site.request_count = 0
+            start = time.perf_counter()
+            pages = crawl(start_url, max_pages)
+            elapsed = time.perf_counter() - start
+            results[name] = {
+                "pages": pages,
+                "requests": site.request_count,
+                "seconds": round(elapsed, 4),
+                "pages_per_second": round(pages / elapsed, 2),
+            }
+        results.update(run_recrawls(site, start_url, max_pages))
+    results["speedup"] = round(results["sequential"]["seconds"] / results["concurrent"]["seconds"], 2)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the crawler against a local HTTP fixture site.")
+    parser.add_argument("--num-pages", type=int, default=200)
+    parser.add_argument("--max-pages", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.05, help="Simulated server latency in seconds")
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args()
+
+    print(json.dumps(run(args.num_pages, args.max_pages, args.latency, args.workers), indent=2))
@@ -0,0 +1,115 @@
+import hashlib
+import random
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from pathlib import Path
+
+WORDS = (
+    "python language programming interpreter library module package syntax function class object "
+    "type dynamic memory garbage collection standard release version community developer software "
+    "design philosophy readability indentation expression statement exception iterator generator "
+    "network server request response document index search query model data science machine learning"
+).split()
+
+
+def make_term(rng):
+    """Made-up word that appears nowhere else in the corpus (with high probability)."""
+    return "".join(rng.choice("bdfgklmnprstvz") + rng.choice("aeiou") for _ in range(4))
+
+
+def generate_pages(num_pages, paragraphs_per_page=20, links_per_page=10, seed=0, terms_per_paragraph=0):
+    """Generate a deterministic, Wikipedia-like set of linked HTML pages.
+
+    With `terms_per_paragraph`, each paragraph also mentions a few made-up terms of its own, so questions about
+    a paragraph have a single right answer.
+    """
+    rng = random.Random(seed)
+    pages = {}
+    for page_index in range(num_pages):
+        paragraphs = []
+        for _ in range(paragraphs_per_page):
+            sentence_count = rng.randint(2, 5)
+            terms = [make_term(rng) for _ in range(terms_per_paragraph)]
+            sentences = [" ".join(rng.choices(WORDS + terms * 3, k=rng.randint(8, 20))).capitalize() + "."
+                         for _ in range(sentence_count)]
+            paragraphs.append(f"<p>{' '.join(sentences)}</p>")
+        links = [f'<li><a href="/page/{rng.randrange(num_pages)}">{" ".join(rng.choices(WORDS, k=2))}</a></li>'
+                 for _ in range(links_per_page)]
+        pages[f"/page/{page_index}"] = (
+            f"<html><head><title>Page {page_index}</title></head><body>"
+            f"<h1>Page {page_index}</h1>{''.join(paragraphs)}<ul>{''.join(links)}</ul>"
+            f"</body></html>"
+        ).encode("utf-8")
+    return pages
+
+
+def load_pages(corpus_dir):
+    """Load recorded HTML pages from a directory, served under /<relative path>."""
+    corpus_dir = Path(corpus_dir)
+    return {"/" + path.relative_to(corpus_dir).as_posix(): path.read_bytes()
+            for path in sorted(corpus_dir.rglob("*.html"))}
+
+
+class FixtureSite:
+    """Serve an in-memory set of pages from a local HTTP server with optional per-request latency.
+
+    Pages carry an ETag and conditional requests for unchanged pages get an empty 304 response.
+    """
+
+    def __init__(self, pages, latency=0.0, host="127.0.0.1", port=0):
+        self.pages = pages
+        self.latency = latency
+        self.request_count = 0
+        self.not_modified_count = 0
+        self.server = ThreadingHTTPServer((host, port), self.create_handler())
+        self.thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def create_handler(self):
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                site.request_count += 1
+                if site.latency:
+                    time.sleep(site.latency)
+                body = site.pages.get(self.path.split("?")[0].split("#")[0])
+                if body is None:
+                    self.send_response(404)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                etag = f'"{hashlib.sha1(body).hexdigest()}"'
+                if self.headers.get("If-None-Match") == etag:
+                    site.not_modified_count += 1
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def __enter__(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,84 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+
+def profile_import(module):
+    """Import `module` in a fresh interpreter with `-X importtime` and summarize the cost per top-level package."""
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=BASE_DIR, capture_output=True, text=True)
+    wall_time = time.perf_counter() - start
+
+    packages = defaultdict(int)
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        packages[name.split(".")[0]] += int(self_us)
+
+    top_packages = sorted(packages.items(), key=lambda item: item[1], reverse=True)[:15]
+    return {
+        "module": module,
+        "ok": result.returncode == 0,
+        "wall_seconds": round(wall_time, 3),
+        "import_seconds": round(sum(packages.values()) / 1e6, 3),
+        "top_packages_seconds": {name: round(us / 1e6, 3) for name, us in top_packages},
+    }
+
+
+def wait_for(url, timeout):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=1) as response:
+                if response.status == 200:
+                    return True
+        except (urllib.error.URLError, ConnectionError, OSError):
+            pass
+        time.sleep(0.1)
+    return False
+
+
+def profile_startup(port, timeout):
+    """Start the app and measure the time until the port answers /healthz and until /readyz succeeds."""
+    env = dict(os.environ, GRADIO_SERVER_NAME="127.0.0.1", GRADIO_SERVER_PORT=str(port))
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, "-m", "app"], cwd=BASE_DIR, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        live = wait_for(f"http://127.0.0.1:{port}/healthz", timeout)
+        live_seconds = time.perf_counter() - start
+        ready = live and wait_for(f"http://127.0.0.1:{port}/readyz", timeout)
+        ready_seconds = time.perf_counter() - start
+    finally:
+        process.terminate()
+        process.wait()
+    return {
+        "seconds_to_live": round(live_seconds, 3) if live else None,
+        "seconds_to_ready": round(ready_seconds, 3) if ready else None,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Profile import time and startup time of the app.")
+    parser.add_argument("--modules", nargs="+",
+                        default=["app", "src.web_interface", "src.document_extractor", "src.chatbot"])
+    parser.add_argument("--startup", action="store_true", help="Also start the app and time /healthz and /readyz")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--timeout", type=float, default=600)
+    args = parser.parse_args()
+
+    results = {"imports": [profile_import(module) for module in args.modules]}
+    if args.startup:
+        results["startup"] = profile_startup(args.port, args.timeout)
+    print(json.dumps(results, indent=2))
@@ -0,0 +1,95 @@
+import argparse
+import json
+import random
+import tempfile
+import threading
+import time
+from pathlib import Path
+from src.utils import config, get_resident_memory, prefetch
+from src.document_loader import DocumentLoader
+from src.vector_store_manager import VectorStoreManager
+from benchmarks.fixture_site import WORDS
+from benchmarks.stubs import HashEmbeddings
+
+
+def generate_corpus(documents_dir, num_files, file_size, seed=0):
+    rng = random.Random(seed)
+    for file_index in range(num_files):
+        paragraphs, size = [], 0
+        while size < file_size:
+            paragraph = " ".join(rng.choices(WORDS, k=rng.randint(30, 120))).capitalize() + "."
+            paragraphs.append(paragraph)
+            size += len(paragraph) + 2
+        (documents_dir / f"document_{file_index:05d}.txt").write_text("\n\n".join(paragraphs), encoding="utf-8")
+
+
+class MemorySampler:
+    """Sample the resident memory in the background and keep the peak."""
+
+    def __init__(self, interval=0.05):
+        self.interval = interval
+        self.peak = 0
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def run(self):
+        while not self.stopped.is_set():
+            self.peak = max(self.peak, get_resident_memory() or 0)
+            time.sleep(self.interval)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stopped.set()
+        self.thread.join()
+
+
+def ingest(mode, documents_dir, vector_store_dir):
+    document_loader = DocumentLoader()
+    vector_store_manager = VectorStoreManager()
+    vector_store_manager.load_vector_store(HashEmbeddings(), vector_store_dir)
+    vector_store_manager.reset_vector_store()
+    file_paths = sorted(str(path) for path in documents_dir.iterdir())
+
+    with MemorySampler() as sampler:
+        start_time = time.perf_counter()
+        if mode == "eager":
+            documents = document_loader.load_and_split_documents(str(documents_dir))
+        else:
+            documents = prefetch(document_loader.iter_split_files(file_paths), config.document_loader.prefetch_chunks)
+        summary = vector_store_manager.update_vector_store(documents)
+        elapsed = time.perf_counter() - start_time
+
+    first_searchable = summary.seconds_to_first_searchable_chunk
+    if mode == "eager" and first_searchable is not None:
+        # Loading and splitting happened before the update started
+        first_searchable += elapsed - summary.seconds
+    return {
+        "chunks": summary.added,
+        "seconds": round(elapsed, 3),
+        "chunks_per_second": round(summary.added / elapsed, 1),
+        "seconds_to_first_searchable_chunk": round(first_searchable, 3) if first_searchable is not None else None,
+        "peak_resident_memory_mb": round(sampler.peak / 2 ** 20, 1),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark eager versus streaming document ingestion.")
+    parser.add_argument("--num-files", type=int, default=50)
+    parser.add_argument("--file-size", type=int, default=200_000, help="Approximate bytes per file")
+    parser.add_argument("--num-workers", type=int, default=1)
+    parser.add_argument("--modes", nargs="+", default=["eager", "streaming"], choices=["eager", "streaming"])
+    args = parser.parse_args()
+
+    config.vector_store.persist = False
+    config.document_loader.num_workers = args.num_workers
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        documents_dir = Path(tmp_dir) / "documents"
+        documents_dir.mkdir()
+        generate_corpus(documents_dir, args.num_files, args.file_size)
+        # The peak memory of a later mode includes what earlier modes left allocated; pass a single
+        # --modes value per run to compare peaks
+        results = {mode: ingest(mode, documents_dir, Path(tmp_dir) / "vector_store") for mode in args.modes}
+    print(json.dumps(results, indent=2))
@@ -0,0 +1,53 @@
+import argparse
+import json
+import random
+import time
+from src.keyword_extractor import KeywordExtractor
+from benchmarks.fixture_site import WORDS
+
+
+def make_texts(count, min_words, max_words, rng):
+    return [" ".join(rng.choices(WORDS, k=rng.randint(min_words, max_words))).capitalize() + "."
+            for _ in range(count)]
+
+
+def rate(count, run):
+    start_time = time.perf_counter()
+    run()
+    elapsed = time.perf_counter() - start_time
+    return {"seconds": round(elapsed, 4), "per_second": round(count / elapsed, 1)}
+
+
+def run(num_queries, num_paragraphs, seed=0):
+    rng = random.Random(seed)
+    queries = make_texts(num_queries, 5, 15, rng)
+    paragraphs = make_texts(num_paragraphs, 40, 120, rng)
+    keyword_extractor = KeywordExtractor()
+    results = {"queries": {}, "paragraphs": {}}
+
+    # Query keywords: one call per query (the previous behaviour), one batch, then the same queries again
+    keyword_extractor.cache.clear()
+    results["queries"]["single"] = rate(num_queries, lambda: [keyword_extractor.extract_keywords(query)
+                                                              for query in queries])
+    keyword_extractor.cache.clear()
+    results["queries"]["batch"] = rate(num_queries, lambda: keyword_extractor.extract_keywords_batch(queries))
+    results["queries"]["cached"] = rate(num_queries, lambda: [keyword_extractor.extract_keywords(query)
+                                                              for query in queries])
+
+    # Paragraph vectors: the full keyword pipeline (textrank included) versus the vectors-only pipeline
+    batch_size = 256
+    results["paragraphs"]["full_pipeline"] = rate(
+        num_paragraphs, lambda: [doc.vector for doc in keyword_extractor.nlp.pipe(paragraphs, batch_size=batch_size)])
+    results["paragraphs"]["vector_pipeline"] = rate(
+        num_paragraphs, lambda: [doc.vector for doc in keyword_extractor.vector_nlp.pipe(paragraphs,
+                                                                                        batch_size=batch_size)])
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark keyword extraction and paragraph vectors.")
+    parser.add_argument("--num-queries", type=int, default=200)
+    parser.add_argument("--num-paragraphs", type=int, default=2000)
+    args = parser.parse_args()
+
+    print(json.dumps(run(args.num_queries, args.num_paragraphs), indent=2))
@@ -0,0 +1,70 @@
+import argparse
+import json
+import multiprocessing
+import resource
+import time
+import tracemalloc
+from src.html_parser import create_html_parser
+from benchmarks.fixture_site import generate_pages, load_pages
+
+BACKENDS = ["html.parser", "strainer", "lxml", "selectolax"]
+
+
+def measure(backend, pages, repeat):
+    """Parse throughput and memory of one backend, run in a fresh process so peak RSS is its own."""
+    html_parser = create_html_parser(backend)
+    baseline_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    start_time = time.perf_counter()
+    for _ in range(repeat):
+        for content in pages:
+            html_parser.parse(content)
+    elapsed = time.perf_counter() - start_time
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # Python objects alive while parsing the largest page (allocations made inside C parsers are not traced)
+    tracemalloc.start()
+    html_parser.parse(max(pages, key=len))
+    _, traced_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    megabytes = repeat * sum(len(content) for content in pages) / 1e6
+    return {
+        "seconds": round(elapsed, 4),
+        "mb_per_second": round(megabytes / elapsed, 2),
+        "pages_per_second": round(repeat * len(pages) / elapsed, 1),
+        # ru_maxrss is in kilobytes on Linux
+        "peak_rss_growth_mb": round((peak_rss - baseline_rss) / 1024, 1),
+        "traced_peak_mb": round(traced_peak / 1e6, 2),
+    }
+
+
+def run(pages, backends, repeat):
+    results = {"pages": len(pages), "mb": round(sum(len(content) for content in pages) / 1e6, 2), "backends": {}}
+    context = multiprocessing.get_context("spawn")
+    for backend in backends:
+        try:
+            create_html_parser(backend)
+        except ImportError as e:
+            results["backends"][backend] = {"skipped": str(e)}
+            continue
+        with context.Pool(1) as pool:
+            results["backends"][backend] = pool.apply(measure, (backend, pages, repeat))
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the HTML parser backends on saved or generated pages.")
+    parser.add_argument("--corpus-dir", help="Saved HTML pages (*.html) to parse instead of generated ones")
+    parser.add_argument("--num-pages", type=int, default=20)
+    parser.add_argument("--paragraphs-per-page", type=int, default=300, help="Generated page size")
+    parser.add_argument("--links-per-page", type=int, default=1000, help="Generated page size")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--backends", nargs="+", default=BACKENDS, choices=BACKENDS)
+    args = parser.parse_args()
+
+    if args.corpus_dir:
+        pages = list(load_pages(args.corpus_dir).values())
+    else:
+        pages = list(generate_pages(args.num_pages, args.paragraphs_per_page, args.links_per_page).values())
+    print(json.dumps(run(pages, args.backends, args.repeat), indent=2))
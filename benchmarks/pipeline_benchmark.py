@@ -0,0 +1,315 @@
+import argparse
+import json
+import platform
+import random
+import re
+import subprocess
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+import numpy as np
+from bs4 import BeautifulSoup
+from src.utils import config
+from src.metrics import metrics
+from src.web_crawler import WebCrawler
+from benchmarks.fixture_site import FixtureSite, generate_pages, load_pages
+from benchmarks.stubs import HashEmbeddings, StubLLM
+
+STAGES = ("crawl", "extract", "ingest", "retrieve", "answer", "condense")
+CONDENSE_MODES = ("llm", "skip", "heuristic", "embedding", "parallel")
+
+
+def summarize_latencies(latencies):
+    return {
+        "count": len(latencies),
+        "p50_ms": round(float(np.percentile(latencies, 50)) * 1e3, 2),
+        "p95_ms": round(float(np.percentile(latencies, 95)) * 1e3, 2),
+        "mean_ms": round(float(np.mean(latencies)) * 1e3, 2),
+    }
+
+
+def summarize_stage_metrics():
+    """Total seconds and count per traced stage since the last call, from the metrics registry."""
+    stages = {}
+    for key, series in metrics.drain()['histograms'].get("knownetqa_stage_seconds", {}).items():
+        stages[dict(key)['stage']] = {"seconds": round(series[-2], 4), "count": series[-1]}
+    return dict(sorted(stages.items()))
+
+
+def summarize_generation():
+    """Mean answer generation speed and draft acceptance rate recorded so far, from the metrics registry."""
+    snapshot = metrics.snapshot()
+    summary = {}
+    speeds = snapshot['histograms'].get("knownetqa_llm_tokens_per_second", {}).get((("call", "answer"),))
+    if speeds and speeds[-1]:
+        summary["tokens_per_second"] = round(speeds[-2] / speeds[-1], 1)
+    drafts = {dict(key)['result']: value
+              for key, value in snapshot['counters'].get("knownetqa_llm_draft_tokens_total", {}).items()}
+    if sum(drafts.values()):
+        summary["draft_acceptance_rate"] = round(drafts.get("accepted", 0) / sum(drafts.values()), 3)
+    return summary
+
+
+def get_paragraphs(pages):
+    return [paragraph.get_text(" ", strip=True) for body in pages.values()
+            for paragraph in BeautifulSoup(body, 'html.parser').find_all('p')]
+
+
+def make_questions(paragraphs, count, rng):
+    """(question, follow-up, target paragraph) triples; the follow-up only makes sense after the question.
+
+    Questions name the rarest words of their paragraph; follow-ups only use common words and refer back with "it".
+    """
+    frequencies = Counter(word for paragraph in paragraphs for word in re.findall(r'\w+', paragraph.lower()))
+    questions = []
+    for paragraph in rng.sample(paragraphs, min(count, len(paragraphs))):
+        words = sorted(set(re.findall(r'\w+', paragraph.lower())), key=lambda word: (frequencies[word], word))
+        question = "What does the text say about " + " ".join(words[:3]) + "?"
+        follow_up = "And how does it relate to " + " ".join(rng.sample(words[3:], min(2, len(words) - 3))) + "?"
+        questions.append((question, follow_up, paragraph))
+    return questions
+
+
+def is_hit(documents, paragraph):
+    return any(document.page_content.strip() and document.page_content.strip() in paragraph for document in documents)
+
+
+def bench_crawl(site, max_pages):
+    web_crawler = WebCrawler()
+    visited = set()
+    pages_to_visit = {f"{site.base_url}/page/0"}
+
+    def process_page(url, response):
+        soup = BeautifulSoup(response.content, 'html.parser')
+        pages_to_visit.update(f"{site.base_url}{link['href']}" for link in soup.find_all('a', href=True)
+                              if link['href'].startswith('/'))
+        return True
+
+    start_time = time.perf_counter()
+    web_crawler.crawl(pages_to_visit, visited, process_page, max_pages)
+    elapsed = time.perf_counter() - start_time
+    web_crawler.close()
+    return {"pages": len(visited), "seconds": round(elapsed, 4), "pages_per_second": round(len(visited) / elapsed, 2)}
+
+
+def bench_extract(site, documents_dir, page_cache_dir, max_pages, query):
+    from src.document_extractor import DocumentExtractor
+
+    config.document_extraction.max_pages = max_pages
+    config.document_extraction.max_docs = 10 ** 6
+    # A fresh page cache, so every run downloads and parses the pages and the real cache/ is left alone
+    document_extractor = DocumentExtractor(page_cache_dir=page_cache_dir)
+    start_time = time.perf_counter()
+    file_path = document_extractor.crawl_and_extract(str(documents_dir), f"{site.base_url}/page/0", query)
+    elapsed = time.perf_counter() - start_time
+    document_extractor.web_crawler.close()
+    if document_extractor.page_cache is not None:
+        document_extractor.page_cache.close()
+    paragraphs = file_path.read_text(encoding='utf-8').count("\n\n") + 1 if file_path else 0
+    return {"paragraphs": paragraphs, "seconds": round(elapsed, 4),
+            "paragraphs_per_second": round(paragraphs / elapsed, 2)}
+
+
+def write_page_documents(paragraphs, documents_dir, paragraphs_per_file=20):
+    """Documents straight from the corpus paragraphs, for runs without the extract stage."""
+    for start in range(0, len(paragraphs), paragraphs_per_file):
+        (documents_dir / f"page_{start // paragraphs_per_file:05d}.txt").write_text(
+            "\n\n".join(paragraphs[start:start + paragraphs_per_file]), encoding='utf-8')
+
+
+def create_chatbot(args, llm):
+    from src.chatbot import ChatBot
+
+    chatbot = ChatBot()
+    if args.embeddings == "hash":
+        chatbot.embeddings_manager.embeddings = HashEmbeddings()
+    chatbot.llm = llm
+    if args.llm_name and config.chatbot.llm_params.prompt_cache.warmup:
+        chatbot.warm_up_prompt_cache()
+    return chatbot
+
+
+def bench_ingest(chatbot, documents_dir, vector_store_dir):
+    chatbot.vector_store_manager.load_vector_store(chatbot.embeddings_manager.get_embeddings(), str(vector_store_dir))
+    start_time = time.perf_counter()
+    summary = chatbot.update_documents(str(documents_dir))
+    elapsed = time.perf_counter() - start_time
+    return {"chunks": summary.added, "seconds": round(elapsed, 4),
+            "chunks_per_second": round(summary.added / elapsed, 2),
+            "seconds_to_first_searchable_chunk": summary.seconds_to_first_searchable_chunk}
+
+
+def bench_retrieve(chatbot, questions):
+    retriever = chatbot.create_retriever()
+    latencies, hits = [], 0
+    for question, _, paragraph in questions:
+        start_time = time.perf_counter()
+        documents = retriever.invoke(question)
+        latencies.append(time.perf_counter() - start_time)
+        hits += is_hit(documents, paragraph)
+    return {**summarize_latencies(latencies), "hit_rate": round(hits / len(questions), 3)}
+
+
+def bench_answer(chatbot, questions):
+    latencies, first_token_latencies = [], []
+    for question, _, _ in questions:
+        # A fresh chain per question: first turns, so no condensing
+        retrieval_chain = chatbot.create_retrieval_chain()
+        start_time = time.perf_counter()
+        for partial_answer in chatbot.stream_question(question, retrieval_chain):
+            if len(first_token_latencies) < len(latencies) + 1:
+                first_token_latencies.append(time.perf_counter() - start_time)
+        latencies.append(time.perf_counter() - start_time)
+    return {**summarize_latencies(latencies),
+            "time_to_first_token": summarize_latencies(first_token_latencies),
+            **summarize_generation()}
+
+
+def bench_condense(chatbot, questions, modes):
+    """Answer a follow-up after each question with every condense mode; the hit rate measures retrieval quality."""
+    results = {}
+    for mode in modes:
+        chatbot.config.condense_params.mode = mode
+        latencies, hits = [], 0
+        for question, follow_up, paragraph in questions:
+            retrieval_chain = chatbot.create_retrieval_chain(chat_history=[(question, "")])
+            start_time = time.perf_counter()
+            response = retrieval_chain.invoke({"question": follow_up})
+            latencies.append(time.perf_counter() - start_time)
+            hits += is_hit(response["source_documents"], paragraph)
+        results[mode] = {**summarize_latencies(latencies), "hit_rate": round(hits / len(questions), 3)}
+    return results
+
+
+def run_size(args, pages, stages, rng):
+    result = {"pages": len(pages)}
+    paragraphs = get_paragraphs(pages)
+    questions = make_questions(paragraphs, args.num_questions, rng)
+    llm = StubLLM(prompt_tokens_per_second=args.prompt_tokens_per_second, tokens_per_second=args.tokens_per_second)
+    if args.llm_name:
+        from src.model_registry import model_registry
+        llm = model_registry.get_llm(args.llm_name, config.chatbot.llm_params)
+
+    with tempfile.TemporaryDirectory() as tmp_dir, FixtureSite(pages, latency=args.latency) as site:
+        documents_dir = Path(tmp_dir) / "documents"
+        documents_dir.mkdir()
+        summarize_stage_metrics()
+
+        if "crawl" in stages:
+            result["crawl"] = bench_crawl(site, len(pages))
+        if "extract" in stages:
+            result["extract"] = bench_extract(site, documents_dir, Path(tmp_dir) / "page_cache", len(pages),
+                                              questions[0][0])
+        else:
+            write_page_documents(paragraphs, documents_dir)
+
+        if stages & {"ingest", "retrieve", "answer", "condense"}:
+            chatbot = create_chatbot(args, llm)
+            result["ingest"] = bench_ingest(chatbot, documents_dir, Path(tmp_dir) / "vector_store")
+            if "retrieve" in stages:
+                result["retrieve"] = bench_retrieve(chatbot, questions)
+            if "answer" in stages:
+                result["answer"] = bench_answer(chatbot, questions)
+            if "condense" in stages:
+                result["condense"] = bench_condense(chatbot, questions, args.condense_modes)
+        result["stages"] = summarize_stage_metrics()
+    return result
+
+
+def get_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def flatten(results, prefix=""):
+    """Numeric leaves as {"size/stage/metric": value}, for comparing two result files."""
+    values = {}
+    for key, value in results.items():
+        name = f"{prefix}/{key}" if prefix else str(key)
+        if isinstance(value, dict):
+            values.update(flatten(value, name))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            values[name] = value
+    return values
+
+
+def compare(baseline_path, current_path, threshold):
+    """Print the relative change of every metric shared by two result files, flagging latency regressions."""
+    baseline = flatten(json.loads(Path(baseline_path).read_text())["results"])
+    current = flatten(json.loads(Path(current_path).read_text())["results"])
+    for name in sorted(baseline.keys() & current.keys()):
+        metric = name.rsplit("/", 1)[-1]
+        if not baseline[name] or metric == "count":
+            continue
+        change = (current[name] - baseline[name]) / baseline[name]
+        # Latencies and durations should go down, throughputs and hit rates up
+        lower_is_better = metric.endswith("_ms") or ("seconds" in metric and "per_second" not in metric)
+        regression = change > threshold if lower_is_better else change < -threshold
+        print(f"{'REGRESSION ' if regression else ''}{name}: {baseline[name]} -> {current[name]} ({change:+.1%})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline benchmark of the full QA pipeline.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[20, 100], help="Corpus sizes in pages")
+    parser.add_argument("--corpus-dir", help="Recorded HTML pages to serve instead of generated ones "
+                                             "(sizes then select the first N pages)")
+    parser.add_argument("--stages", nargs="+", default=list(STAGES), choices=STAGES)
+    parser.add_argument("--num-questions", type=int, default=10)
+    parser.add_argument("--condense-modes", nargs="+", default=list(CONDENSE_MODES), choices=CONDENSE_MODES)
+    parser.add_argument("--embeddings", choices=["hash", "model"], default="hash",
+                        help="Hashed bag of words, or the configured sentence-transformers model")
+    parser.add_argument("--backend", choices=["chroma", "exact", "hnsw"], default=config.vector_store.backend,
+                        help="Vector store backend")
+    parser.add_argument("--llm-name", help="GGUF file in models/ to use instead of the stub LLM")
+    parser.add_argument("--speculative", choices=["none", "prompt_lookup", "draft_model"],
+                        default=config.chatbot.llm_params.speculative.mode,
+                        help="Speculative decoding mode of the --llm-name model")
+    parser.add_argument("--prompt-tokens-per-second", type=float, default=500.0, help="Stub LLM prompt speed")
+    parser.add_argument("--tokens-per-second", type=float, default=50.0, help="Stub LLM generation speed")
+    parser.add_argument("--latency", type=float, default=0.0, help="Simulated server latency in seconds")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    parser.add_argument("--compare", nargs=2, metavar=("BASELINE", "CURRENT"),
+                        help="Compare two result files instead of running")
+    parser.add_argument("--threshold", type=float, default=0.1, help="Relative change reported as a regression")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare, args.threshold)
+        raise SystemExit
+
+    # Nothing may leak between runs or into the real vector store
+    config.vector_store.persist = False
+    config.vector_store.backend = args.backend
+    config.answer_cache.enabled = False
+    config.document_embeddings.cache.enabled = False
+    config.web_crawler.min_delay_per_host = 0.0
+    config.web_crawler.verbose = False
+    config.document_extraction.verbose = False
+    config.chatbot.llm_params.speculative.mode = args.speculative
+
+    recorded_pages = load_pages(args.corpus_dir) if args.corpus_dir else None
+    results = {}
+    for size in args.sizes:
+        if recorded_pages:
+            pages = dict(list(recorded_pages.items())[:size])
+            # The crawl starts at /page/0
+            pages.setdefault("/page/0", next(iter(pages.values())))
+        else:
+            pages = generate_pages(size, seed=args.seed, terms_per_paragraph=3)
+        results[size] = run_size(args, pages, set(args.stages), random.Random(args.seed))
+        print(json.dumps({size: results[size]}, indent=2))
+
+    report = {
+        "commit": get_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "arguments": {key: value for key, value in vars(args).items() if key != "compare"},
+        "results": results,
+    }
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2))
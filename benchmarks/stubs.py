@@ -0,0 +1,71 @@
+import hashlib
+import re
+import time
+from typing import Any, List, Optional
+import numpy as np
+from langchain_core.callbacks import CallbackManagerForLLMRun
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.llms import LLM
+
+
+class HashEmbeddings(Embeddings):
+    """Deterministic, model-free embeddings: L2-normalized hashed bag of words.
+
+    Texts sharing words get similar vectors, which is enough to exercise retrieval offline.
+    """
+
+    def __init__(self, dimensions=384):
+        self.dimensions = dimensions
+
+    def embed(self, text):
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        for token in re.findall(r'\w+', text.lower()):
+            digest = int.from_bytes(hashlib.blake2b(token.encode('utf-8'), digest_size=8).digest(), 'little')
+            vector[digest % self.dimensions] += 1.0 if digest & (1 << 63) else -1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts):
+        return [self.embed(text) for text in texts]
+
+    def embed_query(self, text):
+        return self.embed(text)
+
+
+class StubLLM(LLM):
+    """Model-free stand-in for LlamaCpp with a simulated CPU cost.
+
+    Condensing prompts are answered with the previous question followed by the follow-up (a perfect rewrite),
+    other prompts with the first words of their context. Prompt evaluation and token generation sleep according
+    to the configured speeds, and tokens are streamed through the callbacks like LlamaCpp does.
+    """
+
+    prompt_tokens_per_second: float = 500.0
+    tokens_per_second: float = 50.0
+    answer_tokens: int = 32
+
+    @property
+    def _llm_type(self):
+        return "stub"
+
+    def get_num_tokens(self, text):
+        # Llama tokenizers produce roughly 4 tokens per 3 English words
+        return len(text.split()) * 4 // 3 + 1
+
+    def respond(self, prompt):
+        if "Follow Up Input:" in prompt:
+            follow_up = prompt.split("Follow Up Input:")[-1].split("Standalone question:")[0].strip()
+            questions = re.findall(r"HumanMessage\(content=['\"](.*?)['\"]", prompt) or re.findall(r"Human: (.*)", prompt)
+            return f"{questions[-1]} {follow_up}" if questions else follow_up
+        context = prompt.split("Question:")[0]
+        return " ".join(context.split()[-self.answer_tokens * 3 // 4:])
+
+    def _call(self, prompt: str, stop: Optional[List[str]] = None,
+              run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> str:
+        time.sleep(self.get_num_tokens(prompt) / self.prompt_tokens_per_second)
+        response = self.respond(prompt)
+        for index, word in enumerate(response.split()):
+            time.sleep(1 / self.tokens_per_second)
+            if run_manager:
+                run_manager.on_llm_new_token(word if index == 0 else " " + word)
+        return response
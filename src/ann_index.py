@@ -0,0 +1,190 @@
+import numpy as np
+
+
+class ExactIndex:
+    """Brute-force inner-product index over a NumPy matrix, in float32 or int8 with one scale per vector.
+
+    Exact (or, for int8, near-exact) search at the cost of a full scan, which is the fastest option for small corpora.
+    Searches may run concurrently, but `add` and `remove` must not overlap them: `LocalVectorStore` serializes them
+    with its write lock.
+    """
+
+    def __init__(self, dimensions, dtype="float32", block_rows=4096):
+        if dtype not in ("float32", "int8"):
+            raise ValueError(f"Unsupported dtype: {dtype}")
+        self.dimensions = dimensions
+        self.dtype = dtype
+        # int8 rows are converted to float32 for the dot product one block at a time, not the whole matrix at once
+        self.block_rows = block_rows
+        self.matrix = np.zeros((0, dimensions), dtype=np.int8 if dtype == "int8" else np.float32)
+        self.scales = np.zeros(0, dtype=np.float32)
+        self.ids = []
+        self.rows = {}
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def quantize(self, vectors):
+        if self.dtype == "float32":
+            return vectors, np.ones(len(vectors), dtype=np.float32)
+        scales = np.abs(vectors).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        return np.round(vectors / scales[:, None]).astype(np.int8), scales.astype(np.float32)
+
+    def reserve(self, capacity):
+        if capacity <= len(self.matrix):
+            return
+        capacity = max(capacity, 2 * len(self.matrix), 1024)
+        matrix = np.zeros((capacity, self.dimensions), dtype=self.matrix.dtype)
+        matrix[:self.size] = self.matrix[:self.size]
+        scales = np.zeros(capacity, dtype=np.float32)
+        scales[:self.size] = self.scales[:self.size]
+        self.matrix, self.scales = matrix, scales
+
+    def add(self, ids, vectors):
+        self.remove([vector_id for vector_id in ids if vector_id in self.rows])
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(len(ids), self.dimensions)
+        quantized, scales = self.quantize(vectors)
+        self.reserve(self.size + len(ids))
+        self.matrix[self.size:self.size + len(ids)] = quantized
+        self.scales[self.size:self.size + len(ids)] = scales
+        for vector_id in ids:
+            self.rows[vector_id] = self.size
+            self.ids.append(vector_id)
+            self.size += 1
+
+    def remove(self, ids):
+        # Move the last row into each freed slot to keep the matrix dense
+        for vector_id in ids:
+            row = self.rows.pop(vector_id, None)
+            if row is None:
+                continue
+            last = self.size - 1
+            if row != last:
+                self.matrix[row] = self.matrix[last]
+                self.scales[row] = self.scales[last]
+                self.ids[row] = self.ids[last]
+                self.rows[self.ids[row]] = row
+            self.ids.pop()
+            self.size -= 1
+
+    def search(self, query, k):
+        """Return up to `k` (id, inner product) pairs, best first."""
+        if not self.size:
+            return []
+        query = np.asarray(query, dtype=np.float32)
+        if self.dtype == "float32":
+            scores = self.matrix[:self.size] @ query
+        else:
+            scores = np.empty(self.size, dtype=np.float32)
+            for start in range(0, self.size, self.block_rows):
+                end = min(start + self.block_rows, self.size)
+                scores[start:end] = self.matrix[start:end].astype(np.float32) @ query
+        scores *= self.scales[:self.size]
+        k = min(k, self.size)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(self.ids[row], float(scores[row])) for row in top]
+
+    def estimate_memory_bytes(self):
+        """Size of the stored vectors and scales, without the ID bookkeeping or unused capacity."""
+        return self.size * (self.matrix.itemsize * self.dimensions + self.scales.itemsize)
+
+    def save(self, path):
+        np.savez(path, matrix=self.matrix[:self.size], scales=self.scales[:self.size], ids=np.array(self.ids))
+
+    def load(self, path):
+        state = np.load(path)
+        self.matrix, self.scales = state["matrix"], state["scales"]
+        self.ids = state["ids"].tolist()
+        self.rows = {vector_id: row for row, vector_id in enumerate(self.ids)}
+        self.size = len(self.ids)
+
+
+class HnswIndex:
+    """Approximate inner-product index backed by hnswlib, for corpora too large to scan.
+
+    Like `ExactIndex`, searches may run concurrently but `add` (which may resize the graph) and `remove` need the
+    caller's write lock. Removed vectors are only marked deleted, and added vectors take over their slots, so the
+    graph does not grow with updates. Labels are never reused: hnswlib forgets a label when its slot is taken over.
+    """
+
+    def __init__(self, dimensions, M=16, ef_construction=200, ef_search=64, initial_capacity=1024):
+        import hnswlib
+
+        self.dimensions = dimensions
+        self.M = M
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        self.index = hnswlib.Index(space="ip", dim=dimensions)
+        self.index.init_index(max_elements=initial_capacity, ef_construction=ef_construction, M=M,
+                              allow_replace_deleted=True)
+        self.index.set_ef(ef_search)
+        self.labels = {}
+        self.ids = {}
+        self.next_label = 0
+
+    def __len__(self):
+        return len(self.labels)
+
+    def add(self, ids, vectors):
+        self.remove([vector_id for vector_id in ids if vector_id in self.labels])
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(len(ids), self.dimensions)
+        # Slots of deleted vectors are filled first
+        required = max(self.index.get_current_count(), len(self.labels) + len(ids))
+        if required > self.index.get_max_elements():
+            self.index.resize_index(max(required, 2 * self.index.get_max_elements()))
+        labels = np.arange(self.next_label, self.next_label + len(ids))
+        self.index.add_items(vectors, labels, replace_deleted=True)
+        for vector_id, label in zip(ids, labels.tolist()):
+            self.labels[vector_id] = label
+            self.ids[label] = vector_id
+        self.next_label += len(ids)
+
+    def remove(self, ids):
+        for vector_id in ids:
+            label = self.labels.pop(vector_id, None)
+            if label is not None:
+                self.index.mark_deleted(label)
+                del self.ids[label]
+
+    def search(self, query, k):
+        """Return up to `k` (id, inner product) pairs, best first."""
+        if not self.labels:
+            return []
+        # hnswlib searches with max(ef, k) candidates, so concurrent searches need not change ef
+        k = min(k, len(self.labels))
+        labels, distances = self.index.knn_query(np.asarray(query, dtype=np.float32), k=k)
+        # hnswlib's "ip" distance is 1 - inner product
+        return [(self.ids[label], 1.0 - float(distance)) for label, distance in zip(labels[0], distances[0])]
+
+    def estimate_memory_bytes(self):
+        """Rough size from hnswlib's layout: vectors plus the level-0 links (2 * M neighbors of 4 bytes), label and
+        link-count overhead. Upper layers, deleted elements and unused capacity are not counted."""
+        return len(self.labels) * (4 * self.dimensions + 8 * self.M + 16)
+
+    def save(self, path):
+        self.index.save_index(str(path))
+        np.savez(f"{path}.labels.npz", ids=np.array(list(self.labels)), labels=np.array(list(self.labels.values())),
+                 next_label=self.next_label)
+
+    def load(self, path):
+        import hnswlib
+
+        state = np.load(f"{path}.labels.npz")
+        self.labels = dict(zip(state["ids"].tolist(), state["labels"].tolist()))
+        self.ids = {label: vector_id for vector_id, label in self.labels.items()}
+        self.next_label = int(state["next_label"])
+        self.index = hnswlib.Index(space="ip", dim=self.dimensions)
+        self.index.load_index(str(path), allow_replace_deleted=True)
+        self.index.set_ef(self.ef_search)
+
+
+def create_index(backend, dimensions, params):
+    """Create an empty index for the configured backend ("exact" or "hnsw")."""
+    if backend == "exact":
+        return ExactIndex(dimensions, dtype=params.dtype)
+    if backend == "hnsw":
+        return HnswIndex(dimensions, M=params.M, ef_construction=params.ef_construction, ef_search=params.ef_search)
+    raise ValueError(f"Unknown vector store backend: {backend}")
@@ -0,0 +1,136 @@
+import atexit
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+from box import Box
+from src.utils import logger, config
+from src import dirs
+
+
+class AnswerCache:
+    """Cache answers by question embedding, scoped to the version of the index they were answered from."""
+
+    def __init__(self):
+        self.config = config.answer_cache
+        self.entries = OrderedDict()
+        self.index_version = None
+        self.embedding_matrix = None
+        self.lock = threading.Lock()
+        self.save_lock = threading.Lock()
+        self.dirty = False
+        self.cache_path = dirs.VECTOR_STORE_DIR / self.config.file_name
+        self.load()
+        # Written in the background and on exit, never while answering
+        self.stop_event = threading.Event()
+        if self.config.persist:
+            threading.Thread(target=self.save_periodically, name="answer-cache-saver", daemon=True).start()
+            atexit.register(self.close)
+
+    @staticmethod
+    def normalize_question(question):
+        return " ".join(question.lower().split())
+
+    def invalidate(self, index_version=None):
+        """Drop every entry, e.g. because the vector store changed."""
+        self.entries.clear()
+        self.embedding_matrix = None
+        self.index_version = index_version
+        self.dirty = True
+
+    def evict_expired(self):
+        deadline = time.time() - self.config.ttl
+        expired = [key for key, entry in self.entries.items() if entry.created < deadline]
+        for key in expired:
+            del self.entries[key]
+        if expired:
+            self.embedding_matrix = None
+
+    def lookup(self, question, query_embedding, index_version):
+        """Return the cached answer for the same or a near-duplicate question, or None."""
+        with self.lock:
+            if index_version != self.index_version:
+                self.invalidate(index_version)
+                return None
+            self.evict_expired()
+            if not self.entries:
+                return None
+
+            key = self.normalize_question(question)
+            if key not in self.entries:
+                if self.embedding_matrix is None:
+                    self.embedding_matrix = np.stack([entry.embedding for entry in self.entries.values()])
+                similarities = self.embedding_matrix @ self.normalize_embedding(query_embedding)
+                best = int(np.argmax(similarities))
+                if similarities[best] < self.config.similarity_threshold:
+                    return None
+                key = list(self.entries)[best]
+                logger.info(f"Answer cache hit for a similar question (similarity {similarities[best]:.3f}).")
+            else:
+                logger.info("Answer cache hit for the same question.")
+
+            self.entries.move_to_end(key)
+            self.embedding_matrix = None
+            return self.entries[key].answer
+
+    def put(self, question, query_embedding, answer, index_version):
+        with self.lock:
+            if index_version != self.index_version:
+                self.invalidate(index_version)
+            key = self.normalize_question(question)
+            self.entries[key] = Box({
+                'embedding': self.normalize_embedding(query_embedding),
+                'answer': answer,
+                'created': time.time(),
+            })
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.config.max_entries:
+                self.entries.popitem(last=False)
+            self.embedding_matrix = None
+            self.dirty = True
+
+    @staticmethod
+    def normalize_embedding(embedding):
+        embedding = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(embedding)
+        return embedding / norm if norm else embedding
+
+    def load(self):
+        if not self.config.persist or not self.cache_path.exists():
+            return
+        try:
+            with self.cache_path.open('rb') as file:
+                state = pickle.load(file)
+            self.index_version = state['index_version']
+            self.entries = OrderedDict((key, Box(entry)) for key, entry in state['entries'].items())
+            logger.info(f"Loaded {len(self.entries)} cached answers.")
+        except (OSError, pickle.UnpicklingError, KeyError, EOFError) as e:
+            logger.error(f"Could not load the answer cache: {e}")
+
+    def save(self):
+        """Write the cache to disk if it changed since the last save."""
+        if not self.config.persist:
+            return
+        with self.save_lock:
+            with self.lock:
+                if not self.dirty:
+                    return
+                state = {
+                    'index_version': self.index_version,
+                    'entries': {key: entry.to_dict() for key, entry in self.entries.items()},
+                }
+                self.dirty = False
+            tmp_path = self.cache_path.with_suffix('.tmp')
+            with tmp_path.open('wb') as file:
+                pickle.dump(state, file)
+            os.replace(tmp_path, self.cache_path)
+
+    def save_periodically(self):
+        while not self.stop_event.wait(self.config.save_interval):
+            self.save()
+
+    def close(self):
+        self.stop_event.set()
+        self.save()
@@ -1,18 +1,61 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
 from pathlib import Path
-from src.utils import logger, config
+from src.utils import logger, config, prefetch
 from src.document_loader import DocumentLoader
 from src.embeddings_manager import EmbeddingsManager
 from src.vector_store_manager import VectorStoreManager
-from huggingface_hub import hf_hub_download
-from langchain.callbacks.manager import CallbackManager
-from langchain.callbacks.streaming_stdout import StreamingStdOutCallbackHandler
-from langchain_community.llms import LlamaCpp
-from langchain.memory import ConversationSummaryBufferMemory
-from langchain.chains import ConversationalRetrievalChain
+from src.model_registry import model_registry
+from src.answer_cache import AnswerCache
+from src.hybrid_retriever import DenseRetriever, HybridRetriever
+from src.context_budgeter import ContextBudgeter
+from src.condensing_chain import CondensingRetrievalChain, ANSWER_TAG
+from src.metrics import metrics, trace, profiled, LlmMetricsHandler
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain.memory import (ConversationSummaryBufferMemory, ConversationTokenBufferMemory,
+                              ConversationBufferWindowMemory)
+from langchain.retrievers import ContextualCompressionRetriever
+from langchain.prompts import PromptTemplate
 # from langchain.prompts import (ChatPromptTemplate, HumanMessagePromptTemplate, MessagesPlaceholder,
 #                                SystemMessagePromptTemplate, PromptTemplate)
 from src import dirs
 
+# Static instructions first, then what changes least between calls (context, chat history), then the question:
+# calls sharing a prefix start from its cached llama.cpp state instead of evaluating it again
+QA_PROMPT = PromptTemplate.from_template(
+    "Use the following pieces of context to answer the question at the end. If you don't know the answer, just say "
+    "that you don't know, don't try to make up an answer.\n\n{context}\n\nQuestion: {question}\nHelpful Answer:"
+)
+CONDENSE_QUESTION_PROMPT = PromptTemplate.from_template(
+    "Given the following conversation and a follow up question, rephrase the follow up question to be a standalone "
+    "question, in its original language.\n\nChat History:\n{chat_history}\nFollow Up Input: {question}\n"
+    "Standalone question:"
+)
+
+
+def get_static_prefix(prompt):
+    """The part of a prompt template before its first variable."""
+    return prompt.template.split("{", 1)[0]
+
+
+class AnswerStreamHandler(BaseCallbackHandler):
+    """Collect the tokens of the answer generation, skipping the question-condensing and memory LLM calls."""
+
+    def __init__(self):
+        self.tokens = queue.Queue()
+        self.answer_run_id = None
+
+    def on_llm_start(self, serialized, prompts, *, run_id, tags=None, **kwargs):
+        # The answer generation is tagged by the chain; condensing may run concurrently with retrieval
+        if ANSWER_TAG in (tags or []) and self.answer_run_id is None:
+            self.answer_run_id = run_id
+
+    def on_llm_new_token(self, token, *, run_id, **kwargs):
+        if run_id == self.answer_run_id:
+            self.tokens.put(token)
+
 
 class ChatBot:
     def __init__(self):
@@ -23,81 +66,238 @@ class ChatBot:
         self.llm = None
         self.llm_params = self.config.llm_params
         self.retrieval_chain = None
+        self.answer_cache = AnswerCache() if config.answer_cache.enabled else None
+        self.reranker = None
+        # Serializes index updates; questions keep being answered from the index while it is updated
+        self.index_lock = threading.Lock()
 
     def setup_language_model(self):
         logger.info("Initializing the language model...")
-        llm_name = self.config.llm_name
-        llm_path = dirs.MODELS_DIR / llm_name
-        if not llm_path.exists():
-            hf_hub_download(
-                repo_id=self.config.hf_repo_id,
-                filename=llm_name,
-                cache_dir=str(dirs.MODELS_DIR),
-            )
-        self.llm = LlamaCpp(
-            model_path=str(llm_path),
-            temperature=self.llm_params.temperature,
-            max_tokens=self.llm_params.max_tokens,
-            top_p=self.llm_params.top_p,
-            n_gpu_layers=self.llm_params.n_gpu_layers,
-            n_batch=self.llm_params.n_batch,
-            n_ctx=self.llm_params.n_ctx,
-            callback_manager=CallbackManager([StreamingStdOutCallbackHandler()]),
-            verbose=self.llm_params.verbose,
-        )
+        self.llm = model_registry.get_llm(self.config.llm_name, self.llm_params, self.config.hf_repo_id)
+        if self.llm_params.prompt_cache.warmup:
+            self.warm_up_prompt_cache()
 
-    def setup_retrieval_chain(self):
-        logger.info("Configuring the Conversational Retrieval chain...")
+    def warm_up_prompt_cache(self):
+        prefixes = [get_static_prefix(prompt) for prompt in (QA_PROMPT, CONDENSE_QUESTION_PROMPT)]
+        model_registry.warm_up(self.llm, prefixes)
+
+    def get_reranker(self):
+        """Cross-encoder used to rerank the hybrid candidates, loaded once on CPU."""
+        if self.reranker is None:
+            from sentence_transformers import CrossEncoder
 
-        retriever = self.vector_store_manager.get_vector_store().as_retriever(
-            search_kwargs=self.config.retriever_params.search_kwargs
+            logger.info("Loading the cross-encoder reranker...")
+            self.reranker = CrossEncoder(self.config.retriever_params.reranker.model_name, device="cpu")
+        return self.reranker
+
+    def create_retriever(self):
+        retriever_params = self.config.retriever_params
+        context_budget = config.context_budget
+        vector_store = self.vector_store_manager.get_vector_store()
+        # With a context budget, retrieve more candidates and let the budgeter decide what fits in the prompt
+        k = context_budget.retrieve_k if context_budget.enabled else retriever_params.search_kwargs.k
+
+        if retriever_params.mode == "dense":
+            retriever = DenseRetriever(vector_store=vector_store,
+                                       search_kwargs={**retriever_params.search_kwargs, "k": k})
+        else:
+            retriever = HybridRetriever(
+                vector_store=vector_store,
+                bm25_index=self.vector_store_manager.bm25_index,
+                compute_document_id=self.vector_store_manager.compute_document_id,
+                k=k,
+                fetch_k=retriever_params.fetch_k,
+                rrf_k=retriever_params.rrf_k,
+                reranker=self.get_reranker() if retriever_params.reranker.enabled else None,
+                rerank_top_n=retriever_params.reranker.top_n,
+            )
+
+        if not context_budget.enabled:
+            return retriever
+        # Count tokens with the model's own tokenizer
+        return ContextualCompressionRetriever(
+            base_compressor=ContextBudgeter.from_config(count_tokens=self.llm.get_num_tokens),
+            base_retriever=retriever,
         )
 
-        memory = ConversationSummaryBufferMemory(
-            llm=self.llm,
-            memory_key=self.config.memory_params.memory_key,
-            return_messages=self.config.memory_params.return_messages,
-            max_token_limit=self.config.memory_params.max_token_limit,
-            output_key=self.config.memory_params.output_key,
+    def create_memory(self):
+        """Conversation memory; only the "summary" policy spends LLM calls on the history."""
+        memory_params = self.config.memory_params
+        common_params = dict(
+            memory_key=memory_params.memory_key,
+            return_messages=memory_params.return_messages,
+            output_key=memory_params.output_key,
         )
+        if memory_params.policy == "summary":
+            return ConversationSummaryBufferMemory(llm=self.llm, max_token_limit=memory_params.max_token_limit,
+                                                   **common_params)
+        if memory_params.policy == "truncate":
+            return ConversationTokenBufferMemory(llm=self.llm, max_token_limit=memory_params.max_token_limit,
+                                                 **common_params)
+        if memory_params.policy == "window":
+            return ConversationBufferWindowMemory(k=memory_params.window_size, **common_params)
+        raise ValueError(f"Unknown memory policy: {memory_params.policy}")
+
+    def create_retrieval_chain(self, chat_history=None):
+        """Create a retrieval chain with its own conversation memory, optionally seeded with (question, answer) pairs."""
+        retriever = self.create_retriever()
 
-        self.retrieval_chain = ConversationalRetrievalChain.from_llm(
+        memory = self.create_memory()
+        for question, answer in chat_history or []:
+            memory.chat_memory.add_user_message(question)
+            memory.chat_memory.add_ai_message(answer)
+
+        return CondensingRetrievalChain.from_llm(
             llm=self.llm,
             retriever=retriever,
             chain_type=self.config.chain_type,
+            combine_docs_chain_kwargs={"prompt": QA_PROMPT} if self.config.chain_type == "stuff" else None,
+            condense_question_prompt=CONDENSE_QUESTION_PROMPT,
             memory=memory,
             return_source_documents=self.config.return_source_documents,
             return_generated_question=self.config.return_generated_question,
             verbose=self.config.verbose,
             get_chat_history=lambda h: h,
+            condense_mode=self.config.condense_params.mode,
+            embed_query=self.embeddings_manager.get_embeddings().embed_query,
+            embedding_threshold=self.config.condense_params.embedding_threshold,
         )
 
+    def setup_retrieval_chain(self):
+        logger.info("Configuring the Conversational Retrieval chain...")
+        self.retrieval_chain = self.create_retrieval_chain()
+
+    def get_index_params(self):
+        """Parameters that change the content of the vector store; a mismatch invalidates the persisted index."""
+        return {
+            'embedding_model_name': config.document_embeddings.model_name,
+            'normalize_embeddings': config.document_embeddings.encode_kwargs.normalize_embeddings,
+            'chunk_size': config.document_loader.chunk_size,
+            'chunk_overlap': config.document_loader.chunk_overlap,
+            'vector_store_backend': config.vector_store.backend,
+        }
+
     def setup_chatbot(self, documents_dir=str(dirs.DOCUMENTS_DIR)):
-        # Load and process documents
-        documents = self.document_loader.load_and_split_documents(documents_dir)
         # Initialize embeddings
         embeddings = self.embeddings_manager.get_embeddings()
-        # Initialize vector store
-        self.vector_store_manager.create_vector_store(documents, embeddings, str(dirs.VECTOR_STORE_DIR))
+        # Open the vector store, reusing the persisted index when possible
+        self.vector_store_manager.load_vector_store(embeddings, str(dirs.VECTOR_STORE_DIR))
+        # Index new or changed documents only
+        self.update_documents(documents_dir)
         # Setup language model
         self.setup_language_model()
         # Setup retrieval chain
         self.setup_retrieval_chain()
 
-    def ask_question(self, question):
+    def prepare_documents(self, documents_dir=str(dirs.DOCUMENTS_DIR)):
+        """Embed the chunks of new or changed documents into the embedding cache ahead of `update_documents`.
+
+        This is the slow part of an update and needs no lock, so `update_documents` then only applies cached vectors.
+        """
+        if not config.document_embeddings.cache.enabled:
+            return
+        plan = self.vector_store_manager.plan_update(self.get_index_params(),
+                                                     self.document_loader.hash_documents(documents_dir))
+        embeddings = self.embeddings_manager.get_embeddings()
+        documents = self.document_loader.iter_split_files(plan.changed_sources)
+        while batch := list(islice(documents, config.document_embeddings.batch_size)):
+            embeddings.embed_documents([document.page_content for document in batch])
+
+    def update_documents(self, documents_dir=str(dirs.DOCUMENTS_DIR)):
+        """Re-index the documents directory into the existing vector store, embedding only changed chunks.
+
+        New chunks are added before stale ones are deleted, so concurrent questions never see a partial index.
+        """
+        with self.index_lock:
+            index_params = self.get_index_params()
+            document_hashes = self.document_loader.hash_documents(documents_dir)
+            plan = self.vector_store_manager.plan_update(index_params, document_hashes)
+
+            if plan.rebuild:
+                self.vector_store_manager.reset_vector_store()
+            elif not plan.changed_sources and not plan.deleted_sources:
+                logger.info("Vector store is up to date with the documents directory.")
+                return None
+
+            # Stream chunks into the vector store, parsing files while earlier chunks are being embedded
+            documents = prefetch(self.document_loader.iter_split_files(plan.changed_sources),
+                                 maxsize=config.document_loader.prefetch_chunks)
+            summary = self.vector_store_manager.update_vector_store(
+                documents, sources=None if plan.rebuild else plan.changed_sources + plan.deleted_sources)
+            self.vector_store_manager.write_manifest(index_params, document_hashes)
+            return summary
+
+    def has_chat_history(self, retrieval_chain):
+        # Also covers history that the memory has already folded into a summary
+        return bool(retrieval_chain.memory.load_memory_variables({})[self.config.memory_params.memory_key])
+
+    def ask_question(self, question, retrieval_chain=None, callbacks=None):
+        with profiled("ask_question"), trace("question"):
+            return self.answer_question(question, retrieval_chain, callbacks)
+
+    def answer_question(self, question, retrieval_chain=None, callbacks=None):
+        retrieval_chain = retrieval_chain or self.retrieval_chain
+
+        # Only standalone questions (first turn of a conversation) are answered from the cache
+        query_embedding = None
+        index_version = self.vector_store_manager.get_index_version()
+        if self.answer_cache and index_version and not self.has_chat_history(retrieval_chain):
+            query_embedding = self.embeddings_manager.get_embeddings().embed_query(question)
+            answer = self.answer_cache.lookup(question, query_embedding, index_version)
+            if answer is not None:
+                metrics.increment("knownetqa_events_total", event="answer_cache_hit")
+                retrieval_chain.memory.chat_memory.add_user_message(question)
+                retrieval_chain.memory.chat_memory.add_ai_message(answer)
+                return answer
+
         logger.info("Invoking the chain for question-answering...")
-        response = self.retrieval_chain.invoke(
+        if config.metrics.enabled:
+            callbacks = list(callbacks or []) + [LlmMetricsHandler(count_tokens=self.llm.get_num_tokens)]
+        response = retrieval_chain.invoke(
             {
                 "question": question,
                 # "chat_history": chat_history,
             },
+            config={"callbacks": callbacks},
         )
 
         # print(f"- response.keys() = {response.keys()}")
         # print(f"- response['chat_history'] = {response['chat_history']}")
 
+        if query_embedding is not None:
+            self.answer_cache.put(question, query_embedding, response["answer"], index_version)
+
         return response["answer"]
 
+    def stream_question(self, question, retrieval_chain=None, submit=None):
+        """Yield the partial answer after each generated token, then the final answer.
+
+        `submit` schedules a callable and returns its future; by default the chain runs in a background thread.
+        """
+        handler = AnswerStreamHandler()
+
+        def run():
+            return self.ask_question(question, retrieval_chain, callbacks=[handler])
+
+        if submit is None:
+            executor = ThreadPoolExecutor(max_workers=1)
+            future = executor.submit(run)
+            executor.shutdown(wait=False)
+        else:
+            future = submit(run)
+
+        answer = ""
+        while not (future.done() and handler.tokens.empty()):
+            try:
+                answer += handler.tokens.get(timeout=0.05)
+            except queue.Empty:
+                continue
+            yield answer
+
+        response = future.result()
+        if response != answer:
+            yield response
+
 
 # Usage example
 if __name__ == "__main__":
@@ -0,0 +1,178 @@
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+import numpy as np
+from langchain.chains import ConversationalRetrievalChain
+from langchain.chains.conversational_retrieval.base import _get_chat_history
+from langchain_core.callbacks import CallbackManagerForChainRun
+from langchain_core.messages import HumanMessage
+from src.utils import logger
+from src.metrics import observe_stage
+
+CONDENSE_MODES = ("llm", "skip", "heuristic", "embedding", "parallel")
+# Tag of the answer generation, so streaming callbacks can tell it apart from the condensing call
+ANSWER_TAG = "answer"
+# Words that usually refer back to an earlier turn
+REFERENCE_PATTERN = re.compile(
+    r"\b(it|its|this|that|these|those|they|them|their|he|she|him|her|his|there|above|previous|former|latter|"
+    r"same|else|more|one|ones)\b|^\s*(and|or|but|also|what about|how about|why not)\b",
+    re.IGNORECASE,
+)
+
+
+class CondensingRetrievalChain(ConversationalRetrievalChain):
+    """Conversational retrieval chain with a configurable strategy for condensing follow-up questions.
+
+    - "llm": rewrite every follow-up with the LLM (the stock behavior).
+    - "skip": never rewrite; retrieve with the question as asked.
+    - "heuristic": keep self-contained questions, otherwise prefix the previous question.
+    - "embedding": prefix the previous question when both questions are about the same topic.
+    - "parallel": retrieve with the heuristic query while the LLM rewrites, then merge both results.
+    """
+
+    condense_mode: str = "llm"
+    embed_query: Optional[Callable[[str], List[float]]] = None
+    embedding_threshold: float = 0.5
+    min_self_contained_words: int = 4
+    last_timings: Dict[str, Any] = {}
+
+    @staticmethod
+    def get_previous_question(chat_history):
+        if isinstance(chat_history, str):
+            questions = re.findall(r'^Human: (.*)$', chat_history, re.MULTILINE)
+            return questions[-1] if questions else None
+        for message in reversed(chat_history):
+            if isinstance(message, HumanMessage):
+                return message.content
+        return None
+
+    def is_self_contained(self, question):
+        return len(question.split()) >= self.min_self_contained_words and not REFERENCE_PATTERN.search(question)
+
+    def is_same_topic(self, question, previous_question):
+        vectors = np.array([self.embed_query(question), self.embed_query(previous_question)], dtype=np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-12
+        return float(vectors[0] @ vectors[1]) >= self.embedding_threshold
+
+    def rewrite_with_llm(self, question, chat_history, run_manager):
+        return self.question_generator.run(question=question, chat_history=chat_history,
+                                           callbacks=run_manager.get_child())
+
+    def rewrite_cheaply(self, question, chat_history):
+        """Standalone query without an LLM call; the previous question supplies the missing context."""
+        previous_question = self.get_previous_question(chat_history)
+        if not previous_question:
+            return question
+        if self.condense_mode == "embedding":
+            if self.embed_query is None:
+                raise ValueError('The "embedding" condense mode requires `embed_query`.')
+            needs_context = self.is_same_topic(question, previous_question)
+        else:
+            needs_context = not self.is_self_contained(question)
+        return f"{previous_question} {question}" if needs_context else question
+
+    @staticmethod
+    def merge_documents(primary, secondary):
+        """Documents of both searches, primary first, without duplicates and no longer than the longer list."""
+        merged, seen = [], set()
+        for document in primary + secondary:
+            if document.page_content not in seen:
+                seen.add(document.page_content)
+                merged.append(document)
+        return merged[:max(len(primary), len(secondary))]
+
+    def condense_and_retrieve(self, question, chat_history, inputs, run_manager):
+        timings = {}
+        start = time.perf_counter()
+        if not chat_history or self.condense_mode == "skip":
+            new_question = question
+        elif self.condense_mode == "llm":
+            new_question = self.rewrite_with_llm(question, chat_history, run_manager)
+        elif self.condense_mode in ("heuristic", "embedding"):
+            new_question = self.rewrite_cheaply(question, chat_history)
+        elif self.condense_mode == "parallel":
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                rewrite = executor.submit(self.rewrite_with_llm, question, chat_history, run_manager)
+                retrieval_start = time.perf_counter()
+                early_documents = self._get_docs(self.rewrite_cheaply(question, chat_history), inputs,
+                                                 run_manager=run_manager)
+                timings['early_retrieve'] = time.perf_counter() - retrieval_start
+                new_question = rewrite.result()
+            timings['condense'] = time.perf_counter() - start
+            start = time.perf_counter()
+            documents = self.merge_documents(self._get_docs(new_question, inputs, run_manager=run_manager),
+                                             early_documents)
+            timings['retrieve'] = time.perf_counter() - start
+            return new_question, documents, timings
+        else:
+            raise ValueError(f"Unknown condense mode: {self.condense_mode}")
+        timings['condense'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        documents = self._get_docs(new_question, inputs, run_manager=run_manager)
+        timings['retrieve'] = time.perf_counter() - start
+        return new_question, documents, timings
+
+    def _call(
+        self,
+        inputs: Dict[str, Any],
+        run_manager: Optional[CallbackManagerForChainRun] = None,
+    ) -> Dict[str, Any]:
+        _run_manager = run_manager or CallbackManagerForChainRun.get_noop_manager()
+        question = inputs["question"]
+        chat_history = (self.get_chat_history or _get_chat_history)(inputs["chat_history"])
+
+        new_question, documents, timings = self.condense_and_retrieve(question, chat_history, inputs,
+                                                                      _run_manager)
+
+        output: Dict[str, Any] = {}
+        start = time.perf_counter()
+        if self.response_if_no_docs_found is not None and len(documents) == 0:
+            output[self.output_key] = self.response_if_no_docs_found
+        else:
+            new_inputs = inputs.copy()
+            if self.rephrase_question:
+                new_inputs["question"] = new_question
+            new_inputs["chat_history"] = chat_history
+            output[self.output_key] = self.combine_docs_chain.run(
+                input_documents=documents, callbacks=_run_manager.get_child(), tags=[ANSWER_TAG], **new_inputs
+            )
+        timings['answer'] = time.perf_counter() - start
+
+        self.last_timings = {'mode': self.condense_mode, **timings}
+        for stage, seconds in timings.items():
+            observe_stage(f"chain_{stage}", seconds)
+        logger.info(f"Chain timings ({self.condense_mode}): "
+                    + ", ".join(f"{stage}={seconds:.3f}s" for stage, seconds in timings.items()))
+
+        if self.return_source_documents:
+            output["source_documents"] = documents
+        if self.return_generated_question:
+            output["generated_question"] = new_question
+        return output
+
+
+# Usage example
+if __name__ == "__main__":
+    from langchain_community.embeddings import DeterministicFakeEmbedding
+    from langchain_community.llms import FakeListLLM
+    from box import Box
+    from src.local_vector_store import LocalVectorStore
+
+    embeddings = DeterministicFakeEmbedding(size=64)
+    vector_store = LocalVectorStore.from_texts(
+        ["Python frees memory with reference counting.", "A cycle detector collects reference cycles."],
+        embeddings, backend="exact", index_params=Box(dtype="float32"),
+    )
+    chat_history = [HumanMessage(content="What is the Python garbage collector?")]
+    for condense_mode in CONDENSE_MODES:
+        chain = CondensingRetrievalChain.from_llm(
+            llm=FakeListLLM(responses=["How does the Python garbage collector handle cycles?", "An answer."]),
+            retriever=vector_store.as_retriever(search_kwargs={"k": 1}),
+            condense_mode=condense_mode,
+            embed_query=embeddings.embed_query,
+            return_generated_question=True,
+        )
+        response = chain.invoke({"question": "How does it handle cycles?", "chat_history": chat_history})
+        print(f"{condense_mode}: {response['generated_question']!r} {chain.last_timings}")
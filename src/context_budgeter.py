@@ -0,0 +1,113 @@
+import re
+from typing import Any, Callable, Optional, Sequence
+from langchain_core.callbacks import Callbacks
+from langchain_core.documents import BaseDocumentCompressor, Document
+from src.redundancy_filter import RedundancyFilter
+from src.utils import logger, config
+from src.metrics import trace
+
+SENTENCE_PATTERN = re.compile(r'(?<=[.!?])\s+')
+
+
+class ContextBudgeter(BaseDocumentCompressor):
+    """Pack the most relevant retrieved sentences into a fixed prompt token budget.
+
+    Documents are taken in retrieval order: near-duplicates are dropped, each remaining document is reduced to
+    the sentences that share a term with the query, and sentences are added until the budget is spent. If not even
+    the first sentence fits, the best-ranked document is cut to the budget, so the context is never empty.
+    """
+
+    count_tokens: Callable[[str], int]
+    max_context_tokens: int = 400
+    similarity_threshold: float = 0.8
+    extract_sentences: bool = True
+    min_term_length: int = 3
+
+    def get_query_terms(self, query):
+        return {term for term in re.findall(r'\w+', query.lower()) if len(term) >= self.min_term_length}
+
+    def select_sentences(self, text, query_terms):
+        """Query-relevant sentences of a chunk, in their original order; the whole chunk if none match."""
+        sentences = [sentence for sentence in SENTENCE_PATTERN.split(text.strip()) if sentence]
+        if not self.extract_sentences or not query_terms:
+            return sentences
+        relevant = [sentence for sentence in sentences if query_terms & set(re.findall(r'\w+', sentence.lower()))]
+        return relevant or sentences
+
+    def truncate(self, text):
+        """Longest prefix of whole words within the budget."""
+        words = text.split()
+        low, high = 0, len(words)
+        while low < high:
+            middle = (low + high + 1) // 2
+            if self.count_tokens(" ".join(words[:middle])) <= self.max_context_tokens:
+                low = middle
+            else:
+                high = middle - 1
+        return " ".join(words[:low])
+
+    def compress_documents(
+        self,
+        documents: Sequence[Document],
+        query: str,
+        callbacks: Optional[Callbacks] = None,
+        **kwargs: Any,
+    ) -> Sequence[Document]:
+        with trace("context_budget"):
+            return self.pack_documents(documents, query)
+
+    def pack_documents(self, documents, query):
+        redundancy_filter = RedundancyFilter(similarity_threshold=self.similarity_threshold)
+        unique_texts = set(redundancy_filter.filter([document.page_content for document in documents]))
+        query_terms = self.get_query_terms(query)
+
+        packed, used_tokens = [], 0
+        for document in documents:
+            if document.page_content not in unique_texts:
+                continue
+            unique_texts.discard(document.page_content)
+
+            selected = []
+            for sentence in self.select_sentences(document.page_content, query_terms):
+                sentence_tokens = self.count_tokens(sentence)
+                if used_tokens + sentence_tokens > self.max_context_tokens:
+                    break
+                selected.append(sentence)
+                used_tokens += sentence_tokens
+            if selected:
+                packed.append(Document(page_content=" ".join(selected), metadata=document.metadata))
+            if used_tokens >= self.max_context_tokens:
+                break
+
+        if not packed and documents:
+            document = documents[0]
+            text = self.truncate(" ".join(self.select_sentences(document.page_content, query_terms)))
+            if text:
+                packed.append(Document(page_content=text, metadata=document.metadata))
+                used_tokens = self.count_tokens(text)
+
+        logger.info(f"Context budget: kept {len(packed)}/{len(documents)} documents, "
+                    f"{used_tokens}/{self.max_context_tokens} tokens.")
+        return packed
+
+    @classmethod
+    def from_config(cls, count_tokens):
+        context_config = config.context_budget
+        return cls(
+            count_tokens=count_tokens,
+            max_context_tokens=context_config.max_context_tokens,
+            similarity_threshold=context_config.similarity_threshold,
+            extract_sentences=context_config.extract_sentences,
+        )
+
+
+# Usage example
+if __name__ == "__main__":
+    budgeter = ContextBudgeter(count_tokens=lambda text: len(text.split()), max_context_tokens=30)
+    documents = [
+        Document(page_content="Python was created by Guido van Rossum. It was first released in 1991."),
+        Document(page_content="Python was created by Guido van Rossum! It was first released in 1991."),
+        Document(page_content="The garbage collector uses reference counting. Cycles are detected separately."),
+    ]
+    for document in budgeter.compress_documents(documents, "Who created Python?"):
+        print(document.page_content)
@@ -0,0 +1,100 @@
+import heapq
+import itertools
+import posixpath
+import re
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+# Click-tracking parameters added by analytics and ad platforms. Parameters such as `oldid`, `action` or
+# `printable` are kept, since on wikis and other sites they select a different page or revision.
+TRACKING_PARAMETERS = re.compile(r'^(utm_\w+|fbclid|gclid|mc_\w+)$')
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+def canonicalize_url(url):
+    """Normalize a URL so equivalent links compare equal: lowercase scheme and host, no default port, fragment,
+    tracking parameters or dot segments, and sorted query parameters."""
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').lower()
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+    path = posixpath.normpath(parts.path) if parts.path else '/'
+    if parts.path.endswith('/') and path != '/':
+        path += '/'
+    query = urlencode(sorted((key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+                             if not TRACKING_PARAMETERS.match(key)))
+    return urlunsplit((scheme, host, path, query, ''))
+
+
+class CrawlFrontier:
+    """Best-first crawl frontier: `pop()` returns the most promising unvisited URL.
+
+    Links are scored by the keywords in their anchor text, URL and surrounding text, plus a bonus for links found
+    on pages that had relevant paragraphs. Links deeper than `max_depth` are dropped; ties are broken in
+    discovery order. Supports the `pop()` / truthiness protocol `WebCrawler.crawl` uses for its frontier.
+    """
+
+    def __init__(self, keyword_matcher, max_depth=None, anchor_weight=3.0, url_weight=2.0, context_weight=1.0,
+                 page_weight=0.5):
+        self.keyword_matcher = keyword_matcher
+        self.max_depth = max_depth
+        self.anchor_weight = anchor_weight
+        self.url_weight = url_weight
+        self.context_weight = context_weight
+        self.page_weight = page_weight
+        self.heap = []
+        self.order = itertools.count()
+        self.seen = set()
+        self.depths = {}
+
+    def __len__(self):
+        return len(self.heap)
+
+    def __bool__(self):
+        return bool(self.heap)
+
+    def score_link(self, url, anchor_text, context, page_relevance=0):
+        url_text = re.sub(r'[/_\-.?=&+%:]+', ' ', urlsplit(url).path + ' ' + urlsplit(url).query)
+        return (self.anchor_weight * self.keyword_matcher.count(anchor_text)
+                + self.url_weight * self.keyword_matcher.count(url_text)
+                + self.context_weight * self.keyword_matcher.count(context)
+                + self.page_weight * min(page_relevance, 10))
+
+    def add(self, url, depth=0, score=0.0):
+        """Queue a URL once; returns False for duplicates and URLs beyond the depth limit."""
+        url = canonicalize_url(url)
+        if url in self.seen or (self.max_depth is not None and depth > self.max_depth):
+            return False
+        self.seen.add(url)
+        self.depths[url] = depth
+        heapq.heappush(self.heap, (-score, next(self.order), url))
+        return True
+
+    def add_links(self, links, depth, page_relevance=0):
+        """Queue (url, anchor text, context) links found on a page at `depth - 1`."""
+        for url, anchor_text, context in links:
+            self.add(url, depth, self.score_link(url, anchor_text, context, page_relevance))
+
+    def pop(self):
+        return heapq.heappop(self.heap)[2]
+
+    def get_depth(self, url):
+        return self.depths.get(canonicalize_url(url), 0)
+
+
+# Usage example
+if __name__ == "__main__":
+    from src.keyword_matcher import KeywordMatcher
+
+    frontier = CrawlFrontier(KeywordMatcher(["python", "garbage collection"]), max_depth=2)
+    frontier.add("https://en.wikipedia.org/wiki/Python_(programming_language)")
+    print(frontier.pop())
+    frontier.add_links([
+        ("https://en.wikipedia.org/wiki/Main_Page", "Main page", "Navigation"),
+        ("https://EN.wikipedia.org:443/wiki/Garbage_collection_(computer_science)#History", "garbage collection",
+         "Python uses reference counting and a cycle-detecting garbage collection."),
+        ("https://en.wikipedia.org/wiki/Garbage_collection_(computer_science)?utm_source=x", "GC", ""),
+    ], depth=1, page_relevance=4)
+    while frontier:
+        url = frontier.pop()
+        print(frontier.get_depth(url), url)
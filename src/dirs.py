@@ -10,6 +10,7 @@ VECTOR_STORE_DIR = BASE_DIR / "vector_store"
 MODELS_DIR = BASE_DIR / "models"
 LOGS_DIR = BASE_DIR / "logs"
 ARTIFACTS_DIR = BASE_DIR / "artifacts"
+CACHE_DIR = BASE_DIR / "cache"
 
 
 def create_dirs():
@@ -18,6 +19,7 @@ def create_dirs():
     VECTOR_STORE_DIR.mkdir(parents=True, exist_ok=True)
     MODELS_DIR.mkdir(parents=True, exist_ok=True)
     LOGS_DIR.mkdir(parents=True, exist_ok=True)
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
     # ARTIFACTS_DIR.mkdir(parents=True, exist_ok=True)
 
 
@@ -1,157 +1,202 @@
+import hashlib
+import os
+import re
+from collections import deque
 from pathlib import Path
-import requests
-from bs4 import BeautifulSoup
 from urllib.parse import urljoin, urlparse
 from src.utils import logger, config
 from src import dirs
 from src.keyword_extractor import KeywordExtractor
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+from src.web_crawler import WebCrawler
+from src.page_cache import PageCache
+from src.html_parser import create_html_parser
+from src.redundancy_filter import RedundancyFilter
+from src.keyword_matcher import KeywordMatcher
+from src.metrics import metrics, trace
+from src.crawl_frontier import CrawlFrontier, canonicalize_url
 import numpy as np
-from scipy.sparse import vstack
 
 
 class DocumentExtractor:
-    def __init__(self):
+    def __init__(self, page_cache_dir=None):
         self.config = config.document_extraction
         self.keyword_extractor = KeywordExtractor()
-        self.tfidf_vectorizer = TfidfVectorizer()
-        self.paragraphs_vectorized = None
+        self.page_cache = PageCache(page_cache_dir) if config.page_cache.enabled else None
+        self.web_crawler = WebCrawler(page_cache=self.page_cache)
+        self.html_parser = create_html_parser(self.config.html_parser)
+        self.redundancy_filter = RedundancyFilter(
+            similarity_threshold=self.config.redundancy_similarity_threshold,
+            num_perm=self.config.redundancy_num_perm,
+            bands=self.config.redundancy_bands,
+            shingle_size=self.config.redundancy_shingle_size,
+        )
 
     @staticmethod
     def is_internal_url(found_url, base_url):
         """Check if the URL is internal to the base URL."""
         return urlparse(found_url).netloc == urlparse(base_url).netloc
 
-    def fetch_internal_links(self, url, visited):
-        """Fetch all internal links from a given webpage."""
-        internal_links = set()
-        try:
-            response = requests.get(url)
-            response.raise_for_status()
-            soup = BeautifulSoup(response.content, 'html.parser')
-            for link in soup.find_all('a', href=True):
-                href = link['href']
-                full_url = urljoin(url, href)
-                if self.is_internal_url(full_url, url) and full_url not in visited:
-                    internal_links.add(full_url)
-        except Exception as e:
-            logger.error(f"Error fetching {url}: {e}")
+    def parse_page(self, page):
+        """Paragraph texts and (href, anchor text, surrounding text) links of a fetched page.
+
+        The result only depends on the page body, its HTTP charset and the parser backend, so it is cached under
+        these and unchanged pages are not parsed again.
+        """
+        parser_name = self.html_parser.name
+        parsed = self.page_cache.get_parsed(page.body_hash, parser_name, page.encoding) if page.body_hash else None
+        if parsed is not None:
+            return parsed
+
+        with trace("html_parse"):
+            parsed = self.html_parser.parse(page.content, page.encoding)
+
+        if page.body_hash:
+            self.page_cache.put_parsed(page.body_hash, parser_name, page.encoding, parsed.to_dict())
+        return parsed
+
+    def extract_internal_links(self, links, url, visited):
+        """Resolve the parsed links of a page and keep the unvisited internal ones."""
+        internal_links = []
+        for href, anchor_text, context in links:
+            full_url = urljoin(url, href)
+            if self.is_internal_url(full_url, url) and canonicalize_url(full_url) not in visited:
+                internal_links.append((full_url, anchor_text, context))
         return internal_links
 
-    def is_redundant(self, new_paragraph):
-        """Check if the new paragraph is too similar to any of the already added paragraphs."""
-        if self.paragraphs_vectorized is None:
-            return False
-
-        new_vec = self.tfidf_vectorizer.transform([new_paragraph])
-        similarity_scores = cosine_similarity(new_vec, self.paragraphs_vectorized)
-        return np.max(similarity_scores) > self.config.redundancy_similarity_threshold
-
-    def add_paragraph_vectorized(self, paragraph):
-        """Add the new paragraph to the vectorized matrix for future similarity checks."""
-        if self.paragraphs_vectorized is None:
-            self.paragraphs_vectorized = self.tfidf_vectorizer.fit_transform([paragraph])
-        else:
-            new_vec = self.tfidf_vectorizer.transform([paragraph])
-            self.paragraphs_vectorized = vstack([self.paragraphs_vectorized, new_vec])
-
-    def extract_relevant_text(self, soup, keywords, max_docs, use_similarity=False):
-        """Extract relevant text from a BeautifulSoup object based on keywords."""
-        keyword_docs = None
-        if use_similarity:
-            keyword_docs = [self.keyword_extractor.nlp(keyword) for keyword in keywords]
-
-        relevant_texts = []
-        for p in soup.find_all('p'):
-            paragraph_text = p.get_text(strip=True)
-
+    def compute_text_vectors(self, texts):
+        """L2-normalized spaCy document vectors, computed in batches with the vectors-only pipeline."""
+        docs = self.keyword_extractor.vector_nlp.pipe(texts, batch_size=self.config.similarity_batch_size,
+                                                      n_process=self.config.similarity_n_process)
+        vectors = np.array([doc.vector for doc in docs], dtype=np.float32).reshape(len(texts), -1)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        # Texts without a vector keep a zero vector, i.e. a similarity of 0 like `Doc.similarity`
+        return np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
+
+    def select_relevant(self, paragraphs, keyword_matcher, keyword_vectors=None):
+        """The paragraphs that mention a keyword, or whose vector is close to a keyword's when `keyword_vectors`."""
+        candidates, keyword_hits = [], []
+        for paragraph_text in paragraphs:
             # Skip short paragraphs
             if len(paragraph_text) < self.config.min_length_threshold:
                 continue
 
             # Skip paragraphs with too high keyword density
-            keyword_occurrences = sum(keyword.lower() in paragraph_text.lower() for keyword in keywords)
+            keyword_occurrences = keyword_matcher.count(paragraph_text)
             keyword_density = keyword_occurrences / (len(paragraph_text.split()) + 1)
             if keyword_density > self.config.keyword_density_threshold:
                 continue
 
-            # Skip redundant paragraphs
-            if self.is_redundant(paragraph_text):
-                continue
+            candidates.append(paragraph_text)
+            keyword_hits.append(keyword_occurrences > 0)
+
+        # Paragraphs without any keyword may still be relevant when their vector is close to a keyword's
+        relevant = keyword_hits
+        if keyword_vectors is not None and not all(keyword_hits):
+            others = [text for text, hit in zip(candidates, keyword_hits) if not hit]
+            similarities = self.compute_text_vectors(others) @ keyword_vectors.T
+            similar = iter((similarities > self.config.keyword_similarity_threshold).any(axis=1))
+            relevant = [hit or next(similar) for hit in keyword_hits]
+
+        return [text for text, is_relevant in zip(candidates, relevant) if is_relevant]
+
+    def extract_relevant_text(self, paragraphs, keyword_matcher, max_docs, use_similarity=False):
+        """Extract relevant text from the paragraphs of a page based on keywords.
 
-            if any(keyword.lower() in paragraph_text.lower() for keyword in keywords):
-                relevant_texts.append(paragraph_text)
-                self.add_paragraph_vectorized(paragraph_text)
-                if len(relevant_texts) >= max_docs:
-                    break
-
-            elif use_similarity:
-                paragraph_doc = self.keyword_extractor.nlp(paragraph_text)
-                if paragraph_doc.has_vector:
-                    if any(paragraph_doc.similarity(keyword_doc) > self.config.keyword_similarity_threshold for
-                           keyword_doc in keyword_docs):
-                        relevant_texts.append(paragraph_text)
-                        self.add_paragraph_vectorized(paragraph_text)
-                        if len(relevant_texts) >= max_docs:
-                            break
+        Paragraphs are scored and deduplicated in batches, and the rest of the page is skipped once `max_docs`
+        paragraphs were accepted.
+        """
+        keyword_vectors = None
+        if use_similarity and keyword_matcher.keywords:
+            keyword_vectors = self.compute_text_vectors(keyword_matcher.keywords)
 
+        relevant_texts = []
+        start = 0
+        while start < len(paragraphs) and len(relevant_texts) < max_docs:
+            # Batches no larger than needed, but large enough to vectorize scoring and deduplication
+            batch_size = max(max_docs - len(relevant_texts), self.config.min_scoring_batch_size)
+            relevant = self.select_relevant(paragraphs[start:start + batch_size], keyword_matcher, keyword_vectors)
+            start += batch_size
+
+            # Skip redundant paragraphs
+            with trace("redundancy_filter"):
+                relevant_texts += self.redundancy_filter.filter(relevant, limit=max_docs - len(relevant_texts))
         return relevant_texts
 
-    def crawl_and_extract(self, documents_dir, url, query, user_keywords=None):
-        """Crawl from the given URL and extract relevant text based on keywords."""
+    @staticmethod
+    def get_source_file_name(url):
+        """Readable, collision-free file name for the documents extracted from a start URL."""
+        parsed = urlparse(url)
+        name = re.sub(r'[^\w.-]+', '_', f"{parsed.netloc.replace('www.', '')}{parsed.path}").strip('_')[:80]
+        return f"{name}_{hashlib.sha1(url.encode('utf-8')).hexdigest()[:8]}.txt"
+
+    def crawl_and_extract(self, documents_dir, url, query, user_keywords=None, progress=None):
+        """Crawl from the given URL and extract relevant text based on keywords.
+
+        The text is written to a file of its own per start URL, and `progress(pages_visited, relevant_texts)` is
+        called after each page. Returns the path of the written file, or None when nothing relevant was found.
+        """
         if user_keywords is None:
             user_keywords = []
 
         visited = set()
-        pages_to_visit = {url}
         all_relevant_texts = []
+        # Relevant paragraphs found on the last pages, to stop once the crawl stops finding any
+        recent_yields = deque(maxlen=self.config.early_stop_pages or None)
+        self.redundancy_filter.reset()
 
         # Use KeywordExtractor to augment user-defined keywords
-        extracted_keywords = self.keyword_extractor.extract_keywords(query)
+        with trace("keyword_extraction"):
+            extracted_keywords = self.keyword_extractor.extract_keywords(query)
         keywords = list(set(user_keywords + extracted_keywords.combined))
+        keyword_matcher = KeywordMatcher(keywords)
+        pages_to_visit = CrawlFrontier(keyword_matcher, max_depth=self.config.max_depth)
+        pages_to_visit.add(url)
 
-        while (pages_to_visit and len(visited) < self.config.max_pages and len(
-                all_relevant_texts) < self.config.max_docs):
-            current_url = pages_to_visit.pop()
-            if current_url in visited:
-                continue
-            if self.config.verbose:
-                logger.info(f"Visiting: {current_url}")
-            visited.add(current_url)
-
-            try:
-                response = requests.get(current_url)
-                response.raise_for_status()
-                soup = BeautifulSoup(response.content, 'html.parser')
+        def process_page(current_url, page):
+            # Parse each page once and reuse the result for text extraction and link discovery
+            parsed = self.parse_page(page)
 
-                relevant_texts = self.extract_relevant_text(soup, keywords,
+            with trace("text_extraction"):
+                relevant_texts = self.extract_relevant_text(parsed.paragraphs, keyword_matcher,
                                                             self.config.max_docs - len(all_relevant_texts))
-                all_relevant_texts.extend(relevant_texts)
+            all_relevant_texts.extend(relevant_texts)
+            if progress is not None:
+                progress(len(visited), len(all_relevant_texts))
+
+            if len(all_relevant_texts) >= self.config.max_docs:
+                return False
 
-                if len(all_relevant_texts) >= self.config.max_docs:
-                    break
+            recent_yields.append(len(relevant_texts))
+            if self.config.early_stop_pages and len(recent_yields) == recent_yields.maxlen and not any(recent_yields):
+                logger.info(f"No relevant text on the last {recent_yields.maxlen} pages, stopping the crawl.")
+                return False
 
-                # Fetch internal links and add them to the pages to visit
-                internal_links = self.fetch_internal_links(current_url, visited)
-                pages_to_visit.update(internal_links)
+            # Queue internal links, most relevant first
+            pages_to_visit.add_links(self.extract_internal_links(parsed.links, current_url, visited),
+                                     depth=pages_to_visit.get_depth(current_url) + 1,
+                                     page_relevance=len(relevant_texts))
+            return True
 
-            except requests.RequestException as e:
-                if self.config.verbose:
-                    logger.error(f"Error fetching content from {current_url}: {e}")
+        self.web_crawler.crawl(pages_to_visit, visited, process_page, self.config.max_pages)
 
         if not all_relevant_texts:
             logger.info("No relevant documents found based on the provided keywords.")
-            return
+            return None
 
-        # file_name = urlparse(url).netloc.replace("www.", "") + "_extracted.txt"
-        file_name = "extracted.txt"
-        file_path = Path(documents_dir) / file_name
+        pages_per_paragraph = len(visited) / len(all_relevant_texts)
+        metrics.observe("knownetqa_crawl_pages_per_relevant_paragraph", pages_per_paragraph)
+        logger.info(f"Crawled {len(visited)} pages for {len(all_relevant_texts)} relevant paragraphs "
+                    f"({pages_per_paragraph:.2f} pages per relevant paragraph)")
 
-        with open(file_path, 'w', encoding='utf-8') as file:
+        file_path = Path(documents_dir) / self.get_source_file_name(url)
+        # Write next to the target and rename, so the indexer never reads a half-written file
+        temporary_path = file_path.with_name(f".{file_path.name}.{os.getpid()}.tmp")
+        with open(temporary_path, 'w', encoding='utf-8') as file:
             file.write("\n\n".join(all_relevant_texts))
+        os.replace(temporary_path, file_path)
 
         logger.info(f"Document containing {len(all_relevant_texts)} relevant sections saved to {file_path}")
+        return file_path
 
 
 # Usage example
@@ -1,13 +1,27 @@
+import hashlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from src.utils import logger, config
-from langchain_community.document_loaders import DirectoryLoader
+from src.metrics import metrics, trace, run_with_metrics
+from langchain_community.document_loaders import DirectoryLoader, UnstructuredFileLoader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from src import dirs
 
 
+def load_file(file_path):
+    """Load a single file with the same loader `DirectoryLoader` uses; runs in worker processes."""
+    with trace("document_load"):
+        return UnstructuredFileLoader(str(file_path)).load()
+
+
 class DocumentLoader:
     def __init__(self):
         self.config = config.document_loader
+        self.text_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=self.config.chunk_size,
+            chunk_overlap=self.config.chunk_overlap
+        )
 
     def load_and_split_documents(self, documents_dir):
         logger.info("Loading documents from directory...")
@@ -22,13 +36,52 @@ class DocumentLoader:
         documents = loader.load()
 
         logger.info("Splitting loaded documents into manageable chunks...")
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=self.config.chunk_size,
-            chunk_overlap=self.config.chunk_overlap
-        )
-        split_documents = text_splitter.split_documents(documents)
+        return self.split_documents(documents)
+
+    def load_and_split_files(self, file_paths):
+        """Load and split only the given files, using the same loader as `DirectoryLoader`."""
+        return list(self.iter_split_files(file_paths))
+
+    def iter_split_files(self, file_paths):
+        """Yield the chunks of the given files one file at a time, so memory holds only a few parsed files.
+
+        With `num_workers` > 1 files are parsed in worker processes, at most `max_pending_files` ahead.
+        """
+        logger.info("Loading and splitting documents...")
+        if self.config.num_workers <= 1:
+            for file_path in file_paths:
+                yield from self.split_documents(load_file(file_path))
+            return
+
+        file_paths = iter(file_paths)
+        with ProcessPoolExecutor(max_workers=self.config.num_workers) as executor:
+            pending = deque(executor.submit(run_with_metrics, load_file, file_path)
+                            for file_path, _ in zip(file_paths, range(self.config.max_pending_files)))
+            while pending:
+                documents, worker_metrics = pending.popleft().result()
+                metrics.merge(worker_metrics)
+                for file_path in file_paths:
+                    pending.append(executor.submit(run_with_metrics, load_file, file_path))
+                    break
+                yield from self.split_documents(documents)
+
+    def split_documents(self, documents):
+        with trace("document_split"):
+            return self.text_splitter.split_documents(documents)
 
-        return split_documents
+    @staticmethod
+    def hash_documents(documents_dir):
+        """Map each document path (as stored in the chunks' `source` metadata) to the SHA-256 of its content."""
+        document_hashes = {}
+        for file_path in sorted(Path(documents_dir).glob("**/[!.]*")):
+            if not file_path.is_file():
+                continue
+            file_hash = hashlib.sha256()
+            with open(file_path, 'rb') as file:
+                for block in iter(lambda: file.read(1 << 20), b''):
+                    file_hash.update(block)
+            document_hashes[str(file_path)] = file_hash.hexdigest()
+        return document_hashes
 
 
 # Usage example
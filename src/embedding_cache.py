@@ -0,0 +1,170 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from src.utils import logger, config
+from src.metrics import trace
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS shards (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    rows INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS vectors (
+    key TEXT PRIMARY KEY,
+    shard INTEGER NOT NULL,
+    row INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS vectors_shard ON vectors (shard);
+"""
+
+
+class EmbeddingCache:
+    """Content-addressed, on-disk embedding cache for one model and its encode parameters.
+
+    Vectors are appended in immutable `.npy` shards, and an SQLite index maps the SHA-256 of each text to its shard
+    and row, so a flush only inserts its own rows. Once more than `max_small_shards` shards hold fewer than
+    `merge_shard_rows` vectors, they are merged into one. At most `max_open_shards` shards stay memory-mapped.
+    """
+
+    def __init__(self, cache_dir, model_name, encode_params=None):
+        self.config = config.document_embeddings.cache
+        # Vectors encoded with other parameters (e.g. normalized or not) must not be served from the same cache
+        params_hash = hashlib.sha256(json.dumps(encode_params or {}, sort_keys=True).encode('utf-8')).hexdigest()
+        self.cache_dir = cache_dir / f"{re.sub(r'[^A-Za-z0-9_.-]+', '_', model_name)}-{params_hash[:12]}"
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.pending = {}
+        # shard id -> memory-mapped array, least recently used first
+        self.open_shards = OrderedDict()
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(self.cache_dir / 'index.sqlite', check_same_thread=False)
+        self.connection.executescript(SCHEMA)
+        count = self.connection.execute('SELECT COUNT(*) FROM vectors').fetchone()[0]
+        logger.info(f"Found {count} cached embeddings in {self.cache_dir}.")
+
+    @staticmethod
+    def hash_text(text):
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+    def get_shard_path(self, shard_id):
+        return self.cache_dir / f'shard_{shard_id:05d}.npy'
+
+    def get_shard(self, shard_id):
+        """Memory-map a shard, unmapping the least recently used one beyond `max_open_shards`."""
+        if shard_id in self.open_shards:
+            self.open_shards.move_to_end(shard_id)
+        else:
+            self.open_shards[shard_id] = np.load(self.get_shard_path(shard_id), mmap_mode='r')
+            while len(self.open_shards) > self.config.max_open_shards:
+                # Vectors are returned as copies, so nothing else references the mapping
+                self.open_shards.popitem(last=False)
+        return self.open_shards[shard_id]
+
+    def get(self, key):
+        with self.lock:
+            if key in self.pending:
+                return self.pending[key]
+            location = self.connection.execute('SELECT shard, row FROM vectors WHERE key = ?', (key,)).fetchone()
+            if location is None:
+                return None
+            shard_id, row = location
+            return np.array(self.get_shard(shard_id)[row])
+
+    def put(self, key, vector):
+        with self.lock:
+            self.pending[key] = np.asarray(vector, dtype=np.float32)
+
+    def write_shard(self, vectors):
+        """Save vectors to a new shard file and return its id."""
+        shard_id = self.connection.execute('INSERT INTO shards (rows) VALUES (?)', (len(vectors),)).lastrowid
+        temporary_path = self.get_shard_path(shard_id).with_suffix('.tmp')
+        with temporary_path.open('wb') as file:
+            np.save(file, vectors)
+        os.replace(temporary_path, self.get_shard_path(shard_id))
+        return shard_id
+
+    def flush(self):
+        """Write pending vectors to a new shard and append their rows to the index."""
+        with self.lock:
+            if not self.pending:
+                return
+            keys = list(self.pending)
+            with self.connection:
+                shard_id = self.write_shard(np.stack([self.pending[key] for key in keys]))
+                self.connection.executemany('INSERT OR REPLACE INTO vectors (key, shard, row) VALUES (?, ?, ?)',
+                                            [(key, shard_id, row) for row, key in enumerate(keys)])
+            self.pending.clear()
+            self.merge_small_shards()
+
+    def merge_small_shards(self):
+        small_shard_ids = [shard_id for shard_id, in self.connection.execute(
+            'SELECT id FROM shards WHERE rows < ? ORDER BY id', (self.config.merge_shard_rows,))]
+        if len(small_shard_ids) <= self.config.max_small_shards:
+            return
+        placeholders = ', '.join('?' * len(small_shard_ids))
+        locations = self.connection.execute(f'SELECT key, shard, row FROM vectors WHERE shard IN ({placeholders}) '
+                                            'ORDER BY shard, row', small_shard_ids).fetchall()
+        # Rows replaced by a later flush are dropped
+        vectors = np.stack([self.get_shard(shard_id)[row] for _, shard_id, row in locations])
+        with self.connection:
+            merged_shard_id = self.write_shard(vectors)
+            self.connection.executemany('UPDATE vectors SET shard = ?, row = ? WHERE key = ?',
+                                        [(merged_shard_id, row, key) for row, (key, _, _) in enumerate(locations)])
+            self.connection.execute(f'DELETE FROM shards WHERE id IN ({placeholders})', small_shard_ids)
+        for shard_id in small_shard_ids:
+            self.open_shards.pop(shard_id, None)
+            self.get_shard_path(shard_id).unlink(missing_ok=True)
+        logger.info(f"Merged {len(small_shard_ids)} embedding cache shards into one of {len(vectors)} vectors.")
+
+    def close(self):
+        with self.lock:
+            self.open_shards.clear()
+            self.connection.close()
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings that serve known texts from an `EmbeddingCache` and encode the misses in batches."""
+
+    def __init__(self, embeddings, cache, batch_size, encode=None):
+        self.embeddings = embeddings
+        self.cache = cache
+        self.batch_size = batch_size
+        self.encode = encode or embeddings.embed_documents
+
+    def embed_documents(self, texts):
+        keys = [self.cache.hash_text(text) for text in texts]
+        vectors = [self.cache.get(key) for key in keys]
+
+        # Encode each distinct missing text once
+        misses = {}
+        for key, text, vector in zip(keys, texts, vectors):
+            if vector is None:
+                misses.setdefault(key, text)
+
+        if misses:
+            start_time = time.perf_counter()
+            miss_keys = list(misses)
+            for start in range(0, len(miss_keys), self.batch_size):
+                batch_keys = miss_keys[start:start + self.batch_size]
+                with trace("embedding"):
+                    batch_vectors = self.encode([misses[key] for key in batch_keys])
+                for key, vector in zip(batch_keys, batch_vectors):
+                    self.cache.put(key, vector)
+            self.cache.flush()
+            elapsed = time.perf_counter() - start_time
+            logger.info(f"Embedded {len(misses)} chunks in {elapsed:.2f}s "
+                        f"({len(misses) / elapsed if elapsed else float('inf'):.1f} chunks/sec), "
+                        f"{len(texts) - sum(vector is None for vector in vectors)} served from the cache.")
+            vectors = [self.cache.get(key) if vector is None else vector for key, vector in zip(keys, vectors)]
+
+        return [np.asarray(vector, dtype=np.float32).tolist() for vector in vectors]
+
+    def embed_query(self, text):
+        with trace("query_embedding"):
+            return self.embeddings.embed_query(text)
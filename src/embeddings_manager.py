@@ -1,12 +1,16 @@
+import numpy as np
 from src.utils import logger, config
+from src.embedding_cache import EmbeddingCache, CachedEmbeddings
 from langchain_community.embeddings import HuggingFaceEmbeddings
+from src import dirs
 
 
 class EmbeddingsManager:
     def __init__(self):
         self.config = config.document_embeddings
+        # The embedding model is loaded on first use by `get_embeddings`
         self.embeddings = None
-        self.initialize_embeddings()
+        self.encode_pool = None
 
     def initialize_embeddings(self):
         logger.info("Initializing Hugging Face embeddings...")
@@ -16,6 +20,35 @@ class EmbeddingsManager:
             encode_kwargs=self.config.encode_kwargs,
         )
 
+        if self.config.cache.enabled:
+            encode = None
+            if self.config.num_processes > 1:
+                encode = self.encode_multi_process
+            self.embeddings = CachedEmbeddings(
+                embeddings=self.embeddings,
+                cache=EmbeddingCache(dirs.VECTOR_STORE_DIR / self.config.cache.dir_name, self.config.model_name,
+                                     encode_params=self.get_encode_params()),
+                batch_size=self.config.batch_size,
+                encode=encode,
+            )
+
+    def get_encode_params(self):
+        """Encode parameters that change the vectors, part of the embedding cache key."""
+        return {key: value for key, value in self.config.encode_kwargs.items()
+                if key not in ("batch_size", "show_progress_bar")}
+
+    def encode_multi_process(self, texts):
+        """Encode on a pool of CPU worker processes that is started once and reused."""
+        client = self.embeddings.embeddings.client
+        if self.encode_pool is None:
+            logger.info(f"Starting {self.config.num_processes} embedding worker processes...")
+            self.encode_pool = client.start_multi_process_pool(target_devices=["cpu"] * self.config.num_processes)
+        vectors = client.encode_multi_process(texts, self.encode_pool,
+                                              batch_size=self.config.encode_kwargs.get("batch_size", 32))
+        if self.config.encode_kwargs.get("normalize_embeddings"):
+            vectors = vectors / np.linalg.norm(vectors, axis=1, keepdims=True).clip(min=1e-12)
+        return vectors
+
     def get_embeddings(self):
         if not self.embeddings:
             self.initialize_embeddings()
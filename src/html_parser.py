@@ -0,0 +1,168 @@
+"""Paragraph and link extraction from HTML pages, with interchangeable parser backends.
+
+The backends agree on well-formed pages, but repair broken markup differently:
+
+- "html.parser" and "strainer" (BeautifulSoup) keep elements open until their end tag, so in
+  `<p>outer <p>inner</p> tail</p>` the outer paragraph is "outerinnertail" and the inner one is also listed, and the
+  context of a link in an unclosed `<li>` runs on to the following items.
+- "lxml" and "selectolax" close a paragraph when a block element starts and an `<li>` at the next `<li>`, as browsers
+  do, so the same markup gives "outer" and "inner", and each link keeps its own item as context.
+
+Empty paragraphs (e.g. from a stray `</p>`) are dropped by every backend.
+"""
+import codecs
+from bs4 import BeautifulSoup, SoupStrainer
+from bs4.dammit import EncodingDetector, UnicodeDammit
+from box import Box
+
+# Elements whose text describes the links they contain
+LINK_CONTEXT_TAGS = ['p', 'li', 'dd', 'td', 'caption', 'figcaption']
+MAX_CONTEXT_LENGTH = 300
+
+
+def get_encoding(content, http_encoding=None):
+    """Encoding of a page: its byte order mark, the HTTP charset, the document's own declaration, UTF-8 when the
+    bytes are valid UTF-8, and otherwise the encoding UnicodeDammit detects (windows-1252 at worst)."""
+    _, bom_encoding = EncodingDetector.strip_byte_order_mark(content)
+    for encoding in (bom_encoding, http_encoding, EncodingDetector.find_declared_encoding(content, is_html=True)):
+        if not encoding:
+            continue
+        try:
+            return codecs.lookup(encoding).name
+        except LookupError:
+            continue
+    try:
+        content.decode('utf-8')
+        return 'utf-8'
+    except UnicodeDecodeError:
+        return codecs.lookup(UnicodeDammit(content, is_html=True).original_encoding or 'windows-1252').name
+
+
+def join_text(strings, separator=""):
+    """Text of an element like BeautifulSoup's `get_text(separator, strip=True)`."""
+    return separator.join(text for text in (string.strip() for string in strings) if text)
+
+
+class SoupParser:
+    """BeautifulSoup parser. With `targeted`, a SoupStrainer only builds the paragraphs, links and link context
+    elements instead of the whole document tree."""
+
+    def __init__(self, features="html.parser", targeted=False):
+        self.name = "strainer" if targeted else features
+        self.features = features
+        self.parse_only = SoupStrainer(['p', 'a'] + LINK_CONTEXT_TAGS) if targeted else None
+
+    def parse(self, content, encoding=None):
+        soup = BeautifulSoup(content, self.features, parse_only=self.parse_only,
+                             from_encoding=get_encoding(content, encoding))
+        links = []
+        for link in soup.find_all('a', href=True):
+            block = link.find_parent(LINK_CONTEXT_TAGS)
+            context = block.get_text(" ", strip=True)[:MAX_CONTEXT_LENGTH] if block else ""
+            links.append((link['href'], link.get_text(" ", strip=True), context))
+        paragraphs = [text for text in (p.get_text(strip=True) for p in soup.find_all('p')) if text]
+        return Box(paragraphs=paragraphs, links=links)
+
+
+class LxmlParser:
+    """libxml2 parser fed the raw bytes, which only creates Python objects for paragraphs and links."""
+
+    name = "lxml"
+
+    def __init__(self):
+        from lxml import etree
+
+        self.etree = etree
+        self.find_elements = etree.XPath('//p | //a[@href]')
+        # Comments and processing instructions are not part of the text, as in BeautifulSoup
+        self.find_strings = etree.XPath('.//text()[not(parent::script or parent::style)]')
+
+    def parse(self, content, encoding=None):
+        # Decode inside libxml2, or in Python for the codecs libxml2 knows under another name
+        encoding = get_encoding(content, encoding)
+        try:
+            parser = self.etree.HTMLParser(encoding=encoding)
+        except LookupError:
+            content, parser = content.decode(encoding, errors='replace'), self.etree.HTMLParser()
+        root = self.etree.fromstring(content, parser)
+        paragraphs, links = [], []
+        if root is None:
+            return Box(paragraphs=paragraphs, links=links)
+
+        for element in self.find_elements(root):
+            if element.tag == 'p':
+                if text := join_text(self.find_strings(element)):
+                    paragraphs.append(text)
+            if element.tag == 'a':
+                block = next((ancestor for ancestor in element.iterancestors(*LINK_CONTEXT_TAGS)), None)
+                context = join_text(self.find_strings(block), " ")[:MAX_CONTEXT_LENGTH] if block is not None else ""
+                links.append((element.get('href'), join_text(self.find_strings(element), " "), context))
+        return Box(paragraphs=paragraphs, links=links)
+
+
+class SelectolaxParser:
+    """Lexbor parser from selectolax, the fastest backend when it is installed."""
+
+    name = "selectolax"
+
+    def __init__(self):
+        from selectolax.lexbor import LexborHTMLParser
+
+        self.parser_class = LexborHTMLParser
+
+    @staticmethod
+    def get_text(node, separator=""):
+        return join_text((child.text_content or "" for child in node.traverse(include_text=True)
+                          if child.tag == '-text' and child.parent.tag not in ('script', 'style')), separator)
+
+    def parse(self, content, encoding=None):
+        # Lexbor reads bytes as UTF-8, other encodings are decoded first
+        encoding = get_encoding(content, encoding)
+        if encoding != 'utf-8':
+            content = content.decode(encoding, errors='replace')
+        tree = self.parser_class(content)
+        paragraphs, links = [], []
+        for node in tree.css('p, a[href]'):
+            if node.tag == 'p':
+                if text := self.get_text(node):
+                    paragraphs.append(text)
+            else:
+                block = node.parent
+                while block is not None and block.tag not in LINK_CONTEXT_TAGS:
+                    block = block.parent
+                context = self.get_text(block, " ")[:MAX_CONTEXT_LENGTH] if block is not None else ""
+                links.append((node.attributes['href'], self.get_text(node, " "), context))
+        return Box(paragraphs=paragraphs, links=links)
+
+
+def create_html_parser(backend="auto"):
+    """Create the parser for a backend: "selectolax", "lxml", "strainer" (targeted BeautifulSoup),
+    "html.parser" (full BeautifulSoup tree) or "auto", the fastest one installed."""
+    if backend == "auto":
+        for candidate in (SelectolaxParser, LxmlParser):
+            try:
+                return candidate()
+            except ImportError:
+                continue
+        return SoupParser(targeted=True)
+    if backend == "selectolax":
+        return SelectolaxParser()
+    if backend == "lxml":
+        return LxmlParser()
+    if backend == "strainer":
+        return SoupParser(targeted=True)
+    if backend == "html.parser":
+        return SoupParser()
+    raise ValueError(f"Unknown HTML parser backend: {backend}")
+
+
+# Usage example
+if __name__ == "__main__":
+    html = ('<html><body><p>Python is a <b>programming</b> language.</p>'
+            '<ul><li>See <a href="/wiki/CPython">CPython</a>, the reference implementation</li></ul></body></html>')
+    for backend in ("html.parser", "strainer", "lxml", "auto"):
+        print(backend, create_html_parser(backend).parse(html.encode("utf-8")))
+    # Undeclared Latin-1, with the charset from the HTTP Content-Type header or detected
+    latin1 = "<p>crème brûlée naïve</p>".encode("latin-1")
+    html_parser = create_html_parser()
+    print(html_parser.parse(latin1, encoding="iso-8859-1").paragraphs, html_parser.parse(latin1).paragraphs)
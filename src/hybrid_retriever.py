@@ -0,0 +1,146 @@
+import math
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from typing import Any, Dict, List, Optional
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from src.utils import logger
+from src.metrics import observe_stage, trace
+
+
+class BM25Index:
+    """Inverted index with Okapi BM25 scoring, updated incrementally alongside the vector store."""
+
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings = defaultdict(dict)
+        self.documents = {}
+        self.document_lengths = {}
+        self.total_length = 0
+        self.lock = threading.RLock()
+
+    @staticmethod
+    def tokenize(text):
+        return re.findall(r'\w+', text.lower())
+
+    def __len__(self):
+        return len(self.documents)
+
+    def add(self, document_id, text, metadata):
+        with self.lock:
+            self.remove(document_id)
+            term_frequencies = Counter(self.tokenize(text))
+            for term, frequency in term_frequencies.items():
+                self.postings[term][document_id] = frequency
+            self.documents[document_id] = (text, metadata)
+            self.document_lengths[document_id] = sum(term_frequencies.values())
+            self.total_length += self.document_lengths[document_id]
+
+    def remove(self, document_id):
+        with self.lock:
+            if document_id not in self.documents:
+                return
+            text, _ = self.documents.pop(document_id)
+            for term in set(self.tokenize(text)):
+                self.postings[term].pop(document_id, None)
+                if not self.postings[term]:
+                    del self.postings[term]
+            self.total_length -= self.document_lengths.pop(document_id)
+
+    def clear(self):
+        with self.lock:
+            self.postings.clear()
+            self.documents.clear()
+            self.document_lengths.clear()
+            self.total_length = 0
+
+    def search(self, query, k):
+        """Return up to `k` (document ID, score) pairs, best first."""
+        with self.lock:
+            if not self.documents:
+                return []
+            average_length = self.total_length / len(self.documents)
+            scores = defaultdict(float)
+            for term in set(self.tokenize(query)):
+                postings = self.postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (len(self.documents) - len(postings) + 0.5) / (len(postings) + 0.5))
+                for document_id, frequency in postings.items():
+                    length_norm = 1 - self.b + self.b * self.document_lengths[document_id] / average_length
+                    scores[document_id] += idf * frequency * (self.k1 + 1) / (frequency + self.k1 * length_norm)
+            return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+
+    def get_document(self, document_id):
+        text, metadata = self.documents[document_id]
+        return Document(page_content=text, metadata=metadata)
+
+
+class DenseRetriever(BaseRetriever):
+    """Vector search alone, recorded under the same stage as the dense search of `HybridRetriever`."""
+
+    vector_store: Any
+    search_kwargs: Dict[str, Any] = {}
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        with trace("retrieval_dense_search"):
+            return self.vector_store.similarity_search(query, **self.search_kwargs)
+
+
+class HybridRetriever(BaseRetriever):
+    """Fuse dense vector search and BM25 with reciprocal rank fusion, then optionally rerank with a cross-encoder."""
+
+    vector_store: Any
+    bm25_index: Any
+    compute_document_id: Any
+    k: int = 4
+    fetch_k: int = 20
+    rrf_k: int = 60
+    reranker: Optional[Any] = None
+    rerank_top_n: int = 10
+    last_timings: Dict[str, float] = {}
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        timings = {}
+
+        start_time = time.perf_counter()
+        dense_documents = self.vector_store.similarity_search(query, k=self.fetch_k)
+        timings['dense_search'] = time.perf_counter() - start_time
+
+        start_time = time.perf_counter()
+        sparse_results = self.bm25_index.search(query, self.fetch_k)
+        timings['bm25_search'] = time.perf_counter() - start_time
+
+        # Reciprocal rank fusion: documents ranked high by either search come first
+        start_time = time.perf_counter()
+        fused_scores = defaultdict(float)
+        documents = {}
+        for rank, document in enumerate(dense_documents):
+            document_id = self.compute_document_id(document)
+            documents[document_id] = document
+            fused_scores[document_id] += 1 / (self.rrf_k + rank + 1)
+        for rank, (document_id, _) in enumerate(sparse_results):
+            documents.setdefault(document_id, self.bm25_index.get_document(document_id))
+            fused_scores[document_id] += 1 / (self.rrf_k + rank + 1)
+        ranked_ids = sorted(fused_scores, key=fused_scores.get, reverse=True)
+        timings['fusion'] = time.perf_counter() - start_time
+
+        if self.reranker is not None:
+            start_time = time.perf_counter()
+            # Never rerank fewer candidates than the k documents to return
+            candidate_ids = ranked_ids[:max(self.k, self.rerank_top_n)]
+            scores = self.reranker.predict([(query, documents[document_id].page_content)
+                                            for document_id in candidate_ids])
+            ranked_ids = [document_id for _, document_id in sorted(zip(scores, candidate_ids), reverse=True)]
+            timings['rerank'] = time.perf_counter() - start_time
+
+        self.last_timings = timings
+        for stage, seconds in timings.items():
+            observe_stage(f"retrieval_{stage}", seconds)
+        logger.info("Hybrid retrieval timings: " + ", ".join(f"{stage} {seconds * 1e3:.1f}ms"
+                                                             for stage, seconds in timings.items()))
+        return [documents[document_id] for document_id in ranked_ids[:self.k]]
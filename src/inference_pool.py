@@ -0,0 +1,30 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from src.utils import config
+
+
+class InferenceQueueFullError(RuntimeError):
+    pass
+
+
+class InferencePool:
+    """Bounded worker pool for chat requests; requests beyond the queue size are rejected instead of piling up."""
+
+    def __init__(self):
+        self.config = config.web_interface
+        self.executor = ThreadPoolExecutor(max_workers=self.config.inference_workers, thread_name_prefix="inference")
+        self.slots = threading.BoundedSemaphore(self.config.inference_workers + self.config.max_queue_size)
+
+    def submit(self, fn, *args, **kwargs):
+        if not self.slots.acquire(blocking=False):
+            raise InferenceQueueFullError("Too many pending requests.")
+        try:
+            future = self.executor.submit(fn, *args, **kwargs)
+        except Exception:
+            self.slots.release()
+            raise
+        future.add_done_callback(lambda _: self.slots.release())
+        return future
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
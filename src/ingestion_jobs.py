@@ -0,0 +1,176 @@
+import multiprocessing
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from box import Box
+from src.utils import logger, config
+from src.metrics import metrics, profiled
+
+ACTIVE_STATES = ("queued", "crawling", "indexing")
+
+# State of a crawl worker process, set up once by `init_crawl_worker`
+worker_extractor = None
+worker_progress_queue = None
+
+
+def init_crawl_worker(progress_queue):
+    global worker_extractor, worker_progress_queue
+    from src.document_extractor import DocumentExtractor
+
+    worker_extractor = DocumentExtractor()
+    worker_progress_queue = progress_queue
+
+
+def run_crawl_job(job_id, documents_dir, url, query, user_keywords):
+    """Crawl and extract in a worker process; returns the path of the written document (or None) and the metrics
+    recorded while crawling."""
+    def progress(pages_visited, paragraphs):
+        worker_progress_queue.put((job_id, pages_visited, paragraphs))
+
+    progress(0, 0)
+    with profiled("crawl_job"):
+        file_path = worker_extractor.crawl_and_extract(documents_dir, url, query, user_keywords, progress=progress)
+    return str(file_path) if file_path else None, metrics.drain()
+
+
+class IngestionJobManager:
+    """Crawl submitted URLs in worker processes and index the results without blocking chat requests.
+
+    A job goes through queued -> crawling -> indexing -> done (or failed). Crawls run in parallel, each writing
+    its own document file; index updates are applied one at a time by a single indexer thread.
+    """
+
+    def __init__(self, chatbot, documents_dir):
+        self.config = config.ingestion
+        self.chatbot = chatbot
+        self.documents_dir = documents_dir
+        self.jobs = {}
+        self.lock = threading.Lock()
+        # Spawn instead of fork: the serving process runs threads and holds the LLM
+        self.context = multiprocessing.get_context("spawn")
+        self.progress_queue = self.context.Queue()
+        self.crawl_pool = self.create_crawl_pool()
+        self.indexer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="indexer")
+        threading.Thread(target=self.collect_progress, name="ingestion-progress", daemon=True).start()
+
+    def create_crawl_pool(self):
+        return ProcessPoolExecutor(
+            max_workers=self.config.max_workers,
+            mp_context=self.context,
+            initializer=init_crawl_worker,
+            initargs=(self.progress_queue,),
+        )
+
+    def submit(self, url, query, user_keywords=None):
+        """Queue a crawl of `url`; a URL that is already being ingested returns the running job."""
+        with self.lock:
+            for job in self.jobs.values():
+                if job.url == url and job.status in ACTIVE_STATES:
+                    return Box(job)
+            job = Box({
+                'job_id': uuid.uuid4().hex[:8],
+                'url': url,
+                'status': "queued",
+                'pages_visited': 0,
+                'paragraphs': 0,
+                'chunks_added': 0,
+                'error': None,
+                'submitted_at': time.time(),
+                'finished_at': None,
+            })
+            self.jobs[job.job_id] = job
+            self.evict_finished_jobs()
+
+        logger.info(f"Ingestion job {job.job_id} queued for {url}")
+        crawl_arguments = (run_crawl_job, job.job_id, self.documents_dir, url, query, user_keywords or [])
+        try:
+            future = self.crawl_pool.submit(*crawl_arguments)
+        except BrokenProcessPool:
+            # A worker died (e.g. killed while crawling); start a fresh pool for the following jobs
+            logger.warning("Crawl worker pool is broken, restarting it.")
+            self.crawl_pool = self.create_crawl_pool()
+            future = self.crawl_pool.submit(*crawl_arguments)
+        future.add_done_callback(lambda crawl: self.on_crawled(job, crawl))
+        return Box(job)
+
+    def collect_progress(self):
+        while (message := self.progress_queue.get()) is not None:
+            job_id, pages_visited, paragraphs = message
+            with self.lock:
+                job = self.jobs.get(job_id)
+                if job is not None and job.status in ("queued", "crawling"):
+                    job.update(status="crawling", pages_visited=pages_visited, paragraphs=paragraphs)
+
+    def on_crawled(self, job, crawl):
+        try:
+            file_path, worker_metrics = crawl.result()
+            metrics.merge(worker_metrics)
+        except Exception as e:
+            self.finish(job, error=e)
+            return
+        if file_path is None:
+            self.finish(job)
+            return
+        with self.lock:
+            job.status = "indexing"
+        self.indexer.submit(self.index, job)
+
+    def index(self, job):
+        try:
+            # Embed outside the index lock, then apply the cached vectors in one short update
+            with profiled("ingestion_index"):
+                self.chatbot.prepare_documents(self.documents_dir)
+                summary = self.chatbot.update_documents(self.documents_dir)
+            with self.lock:
+                job.chunks_added = summary.added if summary else 0
+            self.finish(job)
+        except Exception as e:
+            self.finish(job, error=e)
+
+    def finish(self, job, error=None):
+        with self.lock:
+            job.update(status="failed" if error else "done", error=repr(error) if error else None,
+                       finished_at=time.time())
+        metrics.increment("knownetqa_events_total", event="ingestion_job_failed" if error else "ingestion_job_done")
+        if error:
+            logger.error(f"Ingestion job {job.job_id} for {job.url} failed: {error!r}")
+        else:
+            logger.info(f"Ingestion job {job.job_id} for {job.url} finished in "
+                        f"{job.finished_at - job.submitted_at:.1f}s ({job.chunks_added} chunks added)")
+
+    def evict_finished_jobs(self):
+        finished = [job_id for job_id, job in self.jobs.items() if job.status not in ACTIVE_STATES]
+        for job_id in finished[:max(len(finished) - self.config.max_finished_jobs, 0)]:
+            del self.jobs[job_id]
+
+    def get_job(self, job_id):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            return Box(job) if job is not None else None
+
+    def list_jobs(self):
+        """Snapshot of all jobs, most recent first."""
+        with self.lock:
+            return [Box(job) for job in reversed(self.jobs.values())]
+
+    def shutdown(self):
+        self.crawl_pool.shutdown(wait=False, cancel_futures=True)
+        self.indexer.shutdown(wait=False, cancel_futures=True)
+        self.progress_queue.put(None)
+
+
+# Usage example
+if __name__ == "__main__":
+    from src.chatbot import ChatBot
+    from src import dirs
+
+    chatbot = ChatBot()
+    chatbot.setup_chatbot(dirs.DOCUMENTS_DIR)
+    ingestion_jobs = IngestionJobManager(chatbot, str(dirs.DOCUMENTS_DIR))
+    job = ingestion_jobs.submit("https://en.wikipedia.org/wiki/Python_(programming_language)", "What is Python ?")
+    while ingestion_jobs.get_job(job.job_id).status in ACTIVE_STATES:
+        time.sleep(1)
+        print(ingestion_jobs.get_job(job.job_id))
+    ingestion_jobs.shutdown()
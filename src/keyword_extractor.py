@@ -1,4 +1,7 @@
-from src.utils import config
+import threading
+import time
+from collections import OrderedDict
+from src.utils import logger, config
 from box import Box
 import spacy
 import pytextrank
@@ -8,22 +11,30 @@ class KeywordExtractor:
     def __init__(self):
         self.config = config.keyword_extraction
 
-        # Load SpaCy model
-        self.nlp = spacy.load(self.config.model_name)
+        # Load SpaCy model, without the components keyword extraction does not use
+        self.nlp = spacy.load(self.config.model_name, exclude=self.config.exclude_pipes)
 
         # Add PyTextRank to the spaCy pipeline
         self.nlp.add_pipe("textrank")
 
-    def extract_keywords_fallback(self, text):
+        # Tokenizer and word vectors only, for paragraph similarity; the vocab (and its vectors) is shared
+        model_components = [name for name in self.nlp.component_names if name != "textrank"]
+        self.vector_nlp = spacy.load(self.config.model_name, vocab=self.nlp.vocab,
+                                     exclude=model_components + list(self.config.exclude_pipes))
+
+        self.cache = OrderedDict()
+        self.cache_lock = threading.Lock()
+
+    @staticmethod
+    def normalize_text(text):
+        return " ".join(text.split())
+
+    def extract_keywords_fallback(self, doc):
         """Fallback method to use query words as keywords."""
-        doc = self.nlp(text)
-        print(doc)
         return [token.text for token in doc if not token.is_stop and not token.is_punct]
 
-    def extract_keywords(self, text):
-        """Process text and extract keywords using NER, POS tagging, and TextRank."""
-        doc = self.nlp(text)
-
+    def get_keywords(self, doc):
+        """Extract keywords from a processed doc using NER, POS tagging, and TextRank."""
         # NER Keywords
         keywords_ner = [ent.text for ent in doc.ents]
 
@@ -42,7 +53,7 @@ class KeywordExtractor:
         combined_keywords = list(dict.fromkeys(keywords_textrank + keywords_pos + keywords_ner))
 
         if not combined_keywords:
-            combined_keywords = self.extract_keywords_fallback(text)
+            combined_keywords = self.extract_keywords_fallback(doc)
 
         return Box({
             'ner': list(set(keywords_ner)),
@@ -51,6 +62,46 @@ class KeywordExtractor:
             'combined': combined_keywords
         })
 
+    def get_cached(self, text):
+        with self.cache_lock:
+            keywords = self.cache.get(text)
+            if keywords is not None:
+                self.cache.move_to_end(text)
+                return Box(keywords)
+            return None
+
+    def put_cached(self, text, keywords):
+        with self.cache_lock:
+            self.cache[text] = keywords
+            self.cache.move_to_end(text)
+            while len(self.cache) > self.config.cache_size:
+                self.cache.popitem(last=False)
+
+    def extract_keywords(self, text):
+        """Process text and extract keywords using NER, POS tagging, and TextRank; repeated texts are cached."""
+        return self.extract_keywords_batch([text])[0]
+
+    def extract_keywords_batch(self, texts):
+        """Keywords of each text, processing the uncached texts together with `nlp.pipe`."""
+        texts = [self.normalize_text(text) for text in texts]
+        results = [self.get_cached(text) for text in texts]
+        misses = list(dict.fromkeys(text for text, keywords in zip(texts, results) if keywords is None))
+
+        if misses:
+            start_time = time.perf_counter()
+            extracted = {text: self.get_keywords(doc)
+                         for text, doc in zip(misses, self.nlp.pipe(misses, batch_size=self.config.batch_size))}
+            for text, keywords in extracted.items():
+                self.put_cached(text, keywords)
+            if len(misses) > 1:
+                elapsed = time.perf_counter() - start_time
+                logger.info(f"Extracted keywords of {len(misses)} texts in {elapsed:.2f}s "
+                            f"({len(misses) / elapsed:.1f} texts/sec), {len(texts) - len(misses)} cached.")
+            results = [Box(extracted[text]) if keywords is None else keywords
+                       for text, keywords in zip(texts, results)]
+
+        return results
+
 
 # Usage example
 if __name__ == "__main__":
@@ -64,4 +115,3 @@ if __name__ == "__main__":
     print(f"POS Keywords: {extracted_keywords.pos}")
     print(f"TextRank Keywords: {extracted_keywords.textrank}")
     print(f"Combined Keywords: {extracted_keywords.combined}")
-
@@ -0,0 +1,46 @@
+import re
+from collections import Counter
+
+
+class KeywordMatcher:
+    """Find which keywords occur in a text, as case-insensitive substrings, with one compiled pattern.
+
+    The keywords are compiled into a trie-shaped regular expression inside a lookahead, so a single scan finds
+    the longest keyword starting at every position; keywords contained in a matched one are then implied.
+    """
+
+    def __init__(self, keywords):
+        self.keywords = [keyword for keyword in keywords if keyword]
+        self.weights = Counter(keyword.lower() for keyword in self.keywords)
+        self.contained = {keyword: {other for other in self.weights if other in keyword} for keyword in self.weights}
+        self.pattern = None
+        if self.weights:
+            trie = {}
+            for keyword in self.weights:
+                node = trie
+                for char in keyword:
+                    node = node.setdefault(char, {})
+                node[''] = {}
+            self.pattern = re.compile(f"(?=({self.trie_to_regex(trie)}))")
+
+    @classmethod
+    def trie_to_regex(cls, node):
+        branches = [re.escape(char) + cls.trie_to_regex(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else f"(?:{'|'.join(branches)})"
+        # Greedy optional group: prefer the longer keyword when a shorter one also ends here
+        return f"(?:{body})?" if '' in node else body
+
+    def find(self, text):
+        """Return the set of (lowercased) keywords that occur in `text`."""
+        if self.pattern is None:
+            return set()
+        present = set()
+        for matched in {match.group(1) for match in self.pattern.finditer(text.lower())}:
+            present |= self.contained[matched]
+        return present
+
+    def count(self, text):
+        """Number of keywords occurring in `text`, counting keywords that only differ by case separately."""
+        return sum(self.weights[keyword] for keyword in self.find(text))
@@ -0,0 +1,200 @@
+import json
+import shutil
+import sqlite3
+import threading
+import uuid
+from collections import defaultdict
+from contextlib import closing
+from pathlib import Path
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
+from src.ann_index import create_index
+from src.utils import ReadWriteLock
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    id TEXT PRIMARY KEY,
+    text TEXT NOT NULL,
+    metadata TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS settings (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+class LocalVectorStore(VectorStore):
+    """In-process LangChain vector store over an `ExactIndex` or `HnswIndex`, optionally saved to a directory.
+
+    It mirrors the parts of the Chroma API that `VectorStoreManager` relies on (`get`, `delete`,
+    `delete_collection`), so both can be used interchangeably. Documents are saved to an SQLite table, and
+    `save_local` only writes those added or deleted since the last save. `get` accepts Chroma's `where` filter on
+    the "source" metadata key, answered from an index of the IDs of each source.
+
+    Searches share a read lock and updates take the write lock, so questions can be answered while documents are
+    indexed and always see the index and the documents in the same state. `save_local` only needs the read lock.
+    """
+
+    def __init__(self, embedding_function, backend, index_params, persist_directory=None):
+        self.embedding_function = embedding_function
+        self.backend = backend
+        self.index_params = index_params
+        self.persist_directory = Path(persist_directory) if persist_directory else None
+        self.lock = ReadWriteLock()
+        self.save_lock = threading.Lock()
+        self.index = None
+        self.documents = {}
+        self.source_ids = defaultdict(set)
+        # Documents changed since the last save, None for deleted ones
+        self.unsaved_documents = {}
+        if self.persist_directory and self.get_documents_path().exists():
+            self.load_local()
+
+    @property
+    def embeddings(self):
+        return self.embedding_function
+
+    def get_documents_path(self):
+        return self.persist_directory / "documents.sqlite"
+
+    def get_index_path(self):
+        return self.persist_directory / ("index.npz" if self.backend == "exact" else "index.bin")
+
+    def add_texts(self, texts, metadatas=None, ids=None, **kwargs):
+        texts = list(texts)
+        metadatas = metadatas or [{} for _ in texts]
+        ids = ids or [str(uuid.uuid4()) for _ in texts]
+        # Embedding is the slow part and needs no lock
+        vectors = np.asarray(self.embedding_function.embed_documents(texts), dtype=np.float32)
+        with self.lock.write():
+            if self.index is None:
+                self.index = create_index(self.backend, vectors.shape[1], self.index_params)
+            self.index.add(ids, vectors)
+            for document_id, text, metadata in zip(ids, texts, metadatas):
+                self.remove_source_id(document_id)
+                self.documents[document_id] = self.unsaved_documents[document_id] = (text, metadata)
+                self.source_ids[metadata.get("source")].add(document_id)
+        return ids
+
+    def delete(self, ids=None, **kwargs):
+        with self.lock.write():
+            if self.index is not None:
+                self.index.remove(ids)
+            for document_id in ids:
+                self.remove_source_id(document_id)
+                self.documents.pop(document_id, None)
+                self.unsaved_documents[document_id] = None
+        return True
+
+    def remove_source_id(self, document_id):
+        if document_id in self.documents:
+            source = self.documents[document_id][1].get("source")
+            self.source_ids[source].discard(document_id)
+            if not self.source_ids[source]:
+                del self.source_ids[source]
+
+    def get(self, ids=None, where=None, include=None, **kwargs):
+        """Chroma-style `get`: IDs plus the requested "documents" and "metadatas".
+
+        `where` may only filter on "source", either `{"source": value}` or `{"source": {"$in": values}}`.
+        """
+        include = ["documents", "metadatas"] if include is None else include
+        if where is not None:
+            if set(where) != {"source"}:
+                raise ValueError(f"Unsupported where filter: {where}")
+            sources = where["source"]["$in"] if isinstance(where["source"], dict) else [where["source"]]
+        with self.lock.read():
+            if where is not None:
+                requested_ids = None if ids is None else set(ids)
+                ids = [document_id for source in sources for document_id in self.source_ids.get(source, ())
+                       if requested_ids is None or document_id in requested_ids]
+            elif ids is None:
+                ids = list(self.documents)
+            else:
+                ids = [document_id for document_id in ids if document_id in self.documents]
+            documents = [self.documents[document_id] for document_id in ids]
+        return {
+            "ids": ids,
+            "documents": [text for text, _ in documents] if "documents" in include else None,
+            "metadatas": [metadata for _, metadata in documents] if "metadatas" in include else None,
+        }
+
+    def delete_collection(self):
+        with self.save_lock, self.lock.write():
+            self.index = None
+            self.documents = {}
+            self.source_ids = defaultdict(set)
+            self.unsaved_documents = {}
+            if self.persist_directory and self.persist_directory.exists():
+                shutil.rmtree(self.persist_directory)
+
+    def similarity_search_with_score_by_vector(self, embedding, k=4, **kwargs):
+        with self.lock.read():
+            if self.index is None:
+                return []
+            return [(Document(page_content=self.documents[document_id][0], metadata=self.documents[document_id][1]),
+                     score) for document_id, score in self.index.search(embedding, k)]
+
+    def similarity_search_with_score(self, query, k=4, **kwargs):
+        return self.similarity_search_with_score_by_vector(self.embedding_function.embed_query(query), k, **kwargs)
+
+    def similarity_search_by_vector(self, embedding, k=4, **kwargs):
+        return [document for document, _ in self.similarity_search_with_score_by_vector(embedding, k, **kwargs)]
+
+    def similarity_search(self, query, k=4, **kwargs):
+        return [document for document, _ in self.similarity_search_with_score(query, k, **kwargs)]
+
+    def _select_relevance_score_fn(self):
+        # Scores are inner products of normalized embeddings, i.e. cosine similarities
+        return lambda score: score
+
+    def save_local(self):
+        if self.persist_directory is None:
+            return
+        self.persist_directory.mkdir(parents=True, exist_ok=True)
+        with self.save_lock:
+            # Searches go on while the index is written; only updates wait
+            with self.lock.read():
+                unsaved_documents, self.unsaved_documents = self.unsaved_documents, {}
+                dimensions = self.index.dimensions if self.index is not None else None
+                if self.index is not None:
+                    self.index.save(self.get_index_path())
+            try:
+                with closing(sqlite3.connect(self.get_documents_path())) as connection:
+                    with connection:
+                        connection.executescript(SCHEMA)
+                        connection.executemany('DELETE FROM documents WHERE id = ?',
+                                               [(document_id,) for document_id, document in unsaved_documents.items()
+                                                if document is None])
+                        connection.executemany('INSERT OR REPLACE INTO documents VALUES (?, ?, ?)',
+                                               [(document_id, document[0], json.dumps(document[1]))
+                                                for document_id, document in unsaved_documents.items()
+                                                if document is not None])
+                        connection.execute('INSERT OR REPLACE INTO settings VALUES (?, ?)', ('dimensions', dimensions))
+            except Exception:
+                # Retried by the next save; changes made since then take precedence
+                with self.lock.write():
+                    self.unsaved_documents = {**unsaved_documents, **self.unsaved_documents}
+                raise
+
+    def load_local(self):
+        with self.lock.write(), closing(sqlite3.connect(self.get_documents_path())) as connection:
+            self.documents = {document_id: (text, json.loads(metadata)) for document_id, text, metadata
+                              in connection.execute('SELECT id, text, metadata FROM documents')}
+            self.source_ids = defaultdict(set)
+            for document_id, (_, metadata) in self.documents.items():
+                self.source_ids[metadata.get("source")].add(document_id)
+            self.unsaved_documents = {}
+            row = connection.execute("SELECT value FROM settings WHERE key = 'dimensions'").fetchone()
+            if row and row[0] is not None:
+                self.index = create_index(self.backend, int(row[0]), self.index_params)
+                self.index.load(self.get_index_path())
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, ids=None, backend="exact", index_params=None, **kwargs):
+        vector_store = cls(embedding, backend, index_params, kwargs.get("persist_directory"))
+        vector_store.add_texts(texts, metadatas, ids)
+        return vector_store
@@ -0,0 +1,252 @@
+import cProfile
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from langchain_core.callbacks import BaseCallbackHandler
+from src.utils import logger, config
+from src import dirs
+
+# Seconds, from a fast in-memory search to a long CPU generation
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+RATE_BUCKETS = (0.5, 1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+COUNT_BUCKETS = (1, 8, 32, 64, 128, 256, 512, 1024, 2048, 4096)
+
+
+class MetricsRegistry:
+    """Thread-safe histograms, counters and gauges, exported in the Prometheus text format.
+
+    Worker processes record into their own registry and ship `drain()` snapshots back for `merge()`. Gauges describe
+    the state of this process: collectors set them right before each `render()`, and they are never drained.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.descriptions = {}
+        self.buckets = {}
+        # name -> labels (sorted tuple of pairs) -> [bucket counts..., sum, count]
+        self.histograms = defaultdict(dict)
+        self.counters = defaultdict(lambda: defaultdict(float))
+        self.gauges = defaultdict(dict)
+        self.collectors = []
+
+    def describe(self, name, description, buckets=None):
+        self.descriptions[name] = description
+        if buckets is not None:
+            self.buckets[name] = tuple(buckets)
+
+    def observe(self, name, value, **labels):
+        buckets = self.buckets.get(name, LATENCY_BUCKETS)
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            series = self.histograms[name].setdefault(key, [0] * (len(buckets) + 2))
+            for index, bound in enumerate(buckets):
+                if value <= bound:
+                    series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def increment(self, name, amount=1, **labels):
+        with self.lock:
+            self.counters[name][tuple(sorted(labels.items()))] += amount
+
+    def set_gauge(self, name, value, **labels):
+        with self.lock:
+            self.gauges[name][tuple(sorted(labels.items()))] = value
+
+    def add_collector(self, collector):
+        """Call `collector()` before each render, to update gauges that are cheaper to read than to track."""
+        self.collectors.append(collector)
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'histograms': {name: {key: list(series) for key, series in all_series.items()}
+                               for name, all_series in self.histograms.items()},
+                'counters': {name: dict(all_series) for name, all_series in self.counters.items()},
+                'gauges': {name: dict(all_series) for name, all_series in self.gauges.items()},
+            }
+
+    def drain(self):
+        """Snapshot and reset, so the same observations are never merged twice."""
+        with self.lock:
+            snapshot = {'histograms': dict(self.histograms), 'counters': {name: dict(all_series) for name, all_series
+                                                                          in self.counters.items()}}
+            self.histograms = defaultdict(dict)
+            self.counters = defaultdict(lambda: defaultdict(float))
+            return snapshot
+
+    def merge(self, snapshot):
+        with self.lock:
+            for name, all_series in snapshot['histograms'].items():
+                for key, series in all_series.items():
+                    current = self.histograms[name].setdefault(key, [0] * len(series))
+                    for index, value in enumerate(series):
+                        current[index] += value
+            for name, all_series in snapshot['counters'].items():
+                for key, value in all_series.items():
+                    self.counters[name][key] += value
+
+    @staticmethod
+    def format_labels(key, **extra):
+        labels = list(key) + list(extra.items())
+        if not labels:
+            return ""
+        return "{" + ",".join(f'{name}="{value}"' for name, value in labels) + "}"
+
+    def render(self):
+        """Prometheus text exposition format (version 0.0.4)."""
+        for collector in self.collectors:
+            collector()
+        snapshot = self.snapshot()
+        lines = []
+        for name, all_series in sorted(snapshot['histograms'].items()):
+            buckets = self.buckets.get(name, LATENCY_BUCKETS)
+            lines += [f"# HELP {name} {self.descriptions.get(name, name)}", f"# TYPE {name} histogram"]
+            for key, series in sorted(all_series.items()):
+                for bound, count in zip(buckets, series):
+                    lines.append(f"{name}_bucket{self.format_labels(key, le=bound)} {count}")
+                lines.append(f"{name}_bucket{self.format_labels(key, le='+Inf')} {series[-1]}")
+                lines.append(f"{name}_sum{self.format_labels(key)} {series[-2]}")
+                lines.append(f"{name}_count{self.format_labels(key)} {series[-1]}")
+        for name, all_series in sorted(snapshot['counters'].items()):
+            lines += [f"# HELP {name} {self.descriptions.get(name, name)}", f"# TYPE {name} counter"]
+            for key, value in sorted(all_series.items()):
+                lines.append(f"{name}{self.format_labels(key)} {value}")
+        for name, all_series in sorted(snapshot['gauges'].items()):
+            lines += [f"# HELP {name} {self.descriptions.get(name, name)}", f"# TYPE {name} gauge"]
+            for key, value in sorted(all_series.items()):
+                lines.append(f"{name}{self.format_labels(key)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+metrics.describe("knownetqa_stage_seconds", "Duration of each pipeline stage in seconds.")
+metrics.describe("knownetqa_llm_time_to_first_token_seconds",
+                 "Time from the start of a generation to its first token (prompt evaluation).")
+metrics.describe("knownetqa_llm_prompt_tokens", "Prompt tokens per generation.", COUNT_BUCKETS)
+metrics.describe("knownetqa_llm_prompt_tokens_per_second", "Prompt evaluation speed.", RATE_BUCKETS)
+metrics.describe("knownetqa_llm_generated_tokens", "Generated tokens per generation.", COUNT_BUCKETS)
+metrics.describe("knownetqa_llm_tokens_per_second", "Token generation speed after the first token.",
+                 RATE_BUCKETS)
+metrics.describe("knownetqa_llm_draft_tokens_total",
+                 "Speculative decoding draft tokens accepted or rejected by the model.")
+metrics.describe("knownetqa_crawl_pages_per_relevant_paragraph", "Pages fetched per relevant paragraph kept.",
+                 (0.02, 0.05, 0.1, 0.2, 0.5, 1, 2, 5, 10))
+metrics.describe("knownetqa_events_total", "Count of notable events (cache hits, failed jobs...).")
+metrics.describe("knownetqa_llm_load_seconds", "Time taken to load each model.")
+metrics.describe("knownetqa_llm_model_size_bytes", "Size of each model file.")
+metrics.describe("knownetqa_llm_resident_memory_bytes",
+                 "Resident memory of the process right after loading each model (mmap-ed weights count once touched).")
+metrics.describe("knownetqa_llm_draft_acceptance_ratio", "Share of speculative decoding draft tokens accepted.")
+
+
+def observe_stage(stage, seconds):
+    metrics.observe("knownetqa_stage_seconds", seconds, stage=stage)
+
+
+@contextmanager
+def trace(stage):
+    """Time a block as one pipeline stage."""
+    start_time = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - start_time)
+
+
+def run_with_metrics(fn, *args, **kwargs):
+    """Run `fn` in a worker process and return its result with the metrics it recorded there."""
+    return fn(*args, **kwargs), metrics.drain()
+
+
+@contextmanager
+def profiled(name):
+    """Profile the calling thread with cProfile when `metrics.profiling` is enabled.
+
+    The stats are written to logs/profiles/ as `.prof` files (readable with pstats or snakeviz). For sampling
+    profilers such as `py-spy record --pid <pid>`, no toggle is needed.
+    """
+    if not config.metrics.profiling:
+        yield
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiles_dir = dirs.LOGS_DIR / "profiles"
+        profiles_dir.mkdir(parents=True, exist_ok=True)
+        profile_path = profiles_dir / f"{name}_{time.strftime('%Y%m%d-%H%M%S')}_{os.getpid()}_{threading.get_native_id()}.prof"
+        profiler.dump_stats(profile_path)
+        logger.info(f"Profile of {name} written to {profile_path}")
+
+
+class LlmMetricsHandler(BaseCallbackHandler):
+    """Record time-to-first-token, prompt size and generation speed of each LLM call.
+
+    `count_tokens` should be the model's own tokenizer; without it prompt tokens are not recorded.
+    """
+
+    def __init__(self, count_tokens=None):
+        # Imported here, as the chain module imports this one
+        from src.condensing_chain import ANSWER_TAG
+
+        self.answer_tag = ANSWER_TAG
+        self.count_tokens = count_tokens
+        self.runs = {}
+
+    def on_llm_start(self, serialized, prompts, *, run_id, tags=None, **kwargs):
+        # The answer generation carries the chain's ANSWER_TAG; anything else (condensing, summaries) is "auxiliary"
+        call = "answer" if self.answer_tag in (tags or []) else "auxiliary"
+        prompt_tokens = sum(self.count_tokens(prompt) for prompt in prompts) if self.count_tokens else None
+        self.runs[run_id] = {'call': call, 'start': time.perf_counter(), 'first_token': None, 'tokens': 0,
+                             'prompt_tokens': prompt_tokens}
+
+    def on_llm_new_token(self, token, *, run_id, **kwargs):
+        run = self.runs.get(run_id)
+        if run is None:
+            return
+        if run['first_token'] is None:
+            run['first_token'] = time.perf_counter()
+        run['tokens'] += 1
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        run = self.runs.pop(run_id, None)
+        if run is None:
+            return
+        end_time = time.perf_counter()
+        call = run['call']
+        metrics.observe("knownetqa_stage_seconds", end_time - run['start'], stage=f"llm_{call}")
+        if run['first_token'] is None:
+            return
+        time_to_first_token = run['first_token'] - run['start']
+        metrics.observe("knownetqa_llm_time_to_first_token_seconds", time_to_first_token, call=call)
+        metrics.observe("knownetqa_llm_generated_tokens", run['tokens'], call=call)
+        if run['prompt_tokens'] is not None:
+            metrics.observe("knownetqa_llm_prompt_tokens", run['prompt_tokens'], call=call)
+            if time_to_first_token > 0:
+                metrics.observe("knownetqa_llm_prompt_tokens_per_second",
+                                run['prompt_tokens'] / time_to_first_token, call=call)
+        generation_time = end_time - run['first_token']
+        if run['tokens'] > 1 and generation_time > 0:
+            tokens_per_second = (run['tokens'] - 1) / generation_time
+            metrics.observe("knownetqa_llm_tokens_per_second", tokens_per_second, call=call)
+            logger.info(f"LLM {call}: time to first token {time_to_first_token:.2f}s, "
+                        f"{run['tokens']} tokens at {tokens_per_second:.1f} tokens/sec")
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self.runs.pop(run_id, None)
+        metrics.increment("knownetqa_events_total", event="llm_error")
+
+
+# Usage example
+if __name__ == "__main__":
+    for seconds in (0.002, 0.02, 0.2):
+        with trace("example"):
+            time.sleep(seconds)
+    worker_snapshot = {'histograms': {}, 'counters': {"knownetqa_events_total": {(("event", "example"),): 2.0}}}
+    metrics.merge(worker_snapshot)
+    print(metrics.render())
@@ -0,0 +1,180 @@
+import json
+import threading
+import time
+from pathlib import Path
+from box import Box
+from typing import Any
+from huggingface_hub import hf_hub_download
+from langchain.callbacks.manager import CallbackManager
+from langchain_core.pydantic_v1 import Field
+from langchain.callbacks.streaming_stdout import StreamingStdOutCallbackHandler
+from langchain_community.llms import LlamaCpp
+from src.metrics import metrics
+from src.utils import logger, get_resident_memory
+from src import dirs
+
+
+class SharedLlamaCpp(LlamaCpp):
+    """LlamaCpp that serializes generations, so one llama.cpp context can be shared by concurrent sessions."""
+
+    generation_lock: Any = Field(default_factory=threading.RLock, exclude=True)
+
+    def _call(self, *args, **kwargs):
+        with self.generation_lock:
+            return super()._call(*args, **kwargs)
+
+    def _stream(self, *args, **kwargs):
+        with self.generation_lock:
+            yield from super()._stream(*args, **kwargs)
+
+
+class ModelRegistry:
+    """Process-wide registry that loads each model/params combination once and shares the instance."""
+
+    def __init__(self):
+        self.models = {}
+        self.metrics = {}
+        self.draft_models = {}
+        self.warmed_prefixes = set()
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def get_model_key(llm_name, llm_params):
+        return llm_name, json.dumps(Box(llm_params).to_dict(), sort_keys=True)
+
+    @staticmethod
+    def get_model_path(llm_name, hf_repo_id=None):
+        llm_path = dirs.MODELS_DIR / llm_name
+        if llm_path.exists():
+            return llm_path
+        logger.info(f"Downloading {llm_name} from {hf_repo_id}...")
+        return Path(hf_hub_download(repo_id=hf_repo_id, filename=llm_name, local_dir=str(dirs.MODELS_DIR)))
+
+    def get_llm(self, llm_name, llm_params, hf_repo_id=None):
+        """Return the shared LlamaCpp instance for these parameters, loading it on first use."""
+        key = self.get_model_key(llm_name, llm_params)
+        with self.lock:
+            if key not in self.models:
+                self.models[key] = self.load_llm(key, llm_name, llm_params, hf_repo_id)
+            self.metrics[key].requests += 1
+            return self.models[key]
+
+    def load_llm(self, key, llm_name, llm_params, hf_repo_id):
+        logger.info(f"Loading the language model {llm_name}...")
+        resident_memory_before = get_resident_memory()
+        start_time = time.perf_counter()
+
+        llm_path = self.get_model_path(llm_name, hf_repo_id)
+        draft_model = self.create_draft_model(llm_params)
+        llm = SharedLlamaCpp(
+            model_path=str(llm_path),
+            temperature=llm_params.temperature,
+            max_tokens=llm_params.max_tokens,
+            top_p=llm_params.top_p,
+            n_gpu_layers=llm_params.n_gpu_layers,
+            n_batch=llm_params.n_batch,
+            n_ctx=llm_params.n_ctx,
+            use_mmap=llm_params.use_mmap,
+            use_mlock=llm_params.use_mlock,
+            callback_manager=CallbackManager([StreamingStdOutCallbackHandler()]),
+            verbose=llm_params.verbose,
+            # llama.cpp keeps the logits of every position (`logits_all`) when it has a draft model, to verify drafts
+            model_kwargs={"draft_model": draft_model} if draft_model is not None else {},
+        )
+        self.draft_models[key] = draft_model
+        prompt_cache = self.create_prompt_cache(llm_params.prompt_cache)
+        if prompt_cache is not None:
+            llm.client.set_cache(prompt_cache)
+            if draft_model is not None:
+                # Each cached state then also holds n_ctx x n_vocab float32 logits (~128 MB for 1000 x 32000)
+                logger.warning("Speculative decoding keeps the logits of every position, so each prompt cache "
+                               f"state takes up to {llm_params.n_ctx * llm.client.n_vocab() * 4 / 2 ** 20:.0f} MB "
+                               "more; lower prompt_cache.capacity_mb or n_ctx accordingly.")
+
+        load_time = time.perf_counter() - start_time
+        resident_memory_after = get_resident_memory()
+        self.metrics[key] = Box({
+            'llm_name': llm_name,
+            'model_path': str(llm_path),
+            'model_size_bytes': llm_path.stat().st_size,
+            'load_time_seconds': load_time,
+            'resident_memory_bytes': resident_memory_after,
+            'resident_memory_delta_bytes': (resident_memory_after - resident_memory_before
+                                            if resident_memory_after is not None else None),
+            'requests': 0,
+        })
+        logger.info(f"Loaded {llm_name} in {load_time:.2f}s (resident memory: {resident_memory_after} bytes).")
+        return llm
+
+    def create_draft_model(self, llm_params):
+        """Draft model proposing tokens that the model verifies in one batch, per `llm_params.speculative`."""
+        params = llm_params.speculative
+        if params.mode == "none":
+            return None
+        from src.speculative_decoding import create_draft_model
+
+        draft_model_path = None
+        if params.mode == "draft_model":
+            draft_model_path = self.get_model_path(params.draft_model_name, params.draft_hf_repo_id)
+        logger.info(f"Speculative decoding with {params.mode} drafts of {params.num_pred_tokens} tokens.")
+        return create_draft_model(params, n_ctx=llm_params.n_ctx, draft_model_path=draft_model_path)
+
+    @staticmethod
+    def create_prompt_cache(params):
+        """llama.cpp state cache: completions restore the saved state (KV cache and logits) of their longest cached
+        prompt prefix instead of evaluating it again. "disk" keeps the states across restarts.
+
+        Off by default: llama.cpp saves the full state after every completion, while retrieval puts the chunks
+        right after the instructions, so usually only the static prefix of about 40 tokens is shared between
+        questions. Enable it after measuring time to first token with the pipeline benchmark.
+        """
+        from llama_cpp import LlamaRAMCache, LlamaDiskCache
+
+        capacity_bytes = params.capacity_mb * 1024 * 1024
+        if params.backend == "none":
+            return None
+        if params.backend == "ram":
+            return LlamaRAMCache(capacity_bytes=capacity_bytes)
+        if params.backend == "disk":
+            return LlamaDiskCache(cache_dir=str(dirs.CACHE_DIR / params.dir_name), capacity_bytes=capacity_bytes)
+        raise ValueError(f"Unknown prompt cache backend: {params.backend}")
+
+    def warm_up(self, llm, prefixes):
+        """Evaluate the static prompt prefixes once, so even the first questions start from a cached state."""
+        if llm.client.cache is None:
+            return
+        for prefix in prefixes:
+            with self.lock:
+                if (id(llm), prefix) in self.warmed_prefixes:
+                    continue
+                self.warmed_prefixes.add((id(llm), prefix))
+            start_time = time.perf_counter()
+            with llm.generation_lock:
+                # The state is cached after the completion; one generated token is the cheapest completion
+                llm.client.create_completion(prefix, max_tokens=1)
+            logger.info(f"Cached the prompt prefix state of {llm.get_num_tokens(prefix)} tokens "
+                        f"in {time.perf_counter() - start_time:.2f}s.")
+
+    def get_metrics(self):
+        """Load time and memory figures for every loaded model; mmap-ed weights only count once pages are touched."""
+        with self.lock:
+            return [Box(metrics, draft_acceptance_rate=getattr(self.draft_models.get(key), 'acceptance_rate', None))
+                    for key, metrics in self.metrics.items()]
+
+    def export_metrics(self):
+        """Set the /metrics gauges from `get_metrics`."""
+        for model_metrics in self.get_metrics():
+            metrics.set_gauge("knownetqa_llm_load_seconds", model_metrics.load_time_seconds,
+                              llm=model_metrics.llm_name)
+            metrics.set_gauge("knownetqa_llm_model_size_bytes", model_metrics.model_size_bytes,
+                              llm=model_metrics.llm_name)
+            if model_metrics.resident_memory_bytes is not None:
+                metrics.set_gauge("knownetqa_llm_resident_memory_bytes", model_metrics.resident_memory_bytes,
+                                  llm=model_metrics.llm_name)
+            if model_metrics.draft_acceptance_rate is not None:
+                metrics.set_gauge("knownetqa_llm_draft_acceptance_ratio", model_metrics.draft_acceptance_rate,
+                                  llm=model_metrics.llm_name)
+
+
+model_registry = ModelRegistry()
+metrics.add_collector(model_registry.export_metrics)
@@ -0,0 +1,193 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from box import Box
+from src.utils import logger, config
+from src import dirs
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    url TEXT PRIMARY KEY,
+    body_hash TEXT NOT NULL,
+    etag TEXT,
+    last_modified TEXT,
+    validated_at REAL NOT NULL,
+    accessed_at REAL NOT NULL,
+    encoding TEXT
+);
+CREATE INDEX IF NOT EXISTS pages_accessed_at ON pages (accessed_at);
+CREATE TABLE IF NOT EXISTS bodies (
+    body_hash TEXT PRIMARY KEY,
+    size INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS parsed (
+    body_hash TEXT NOT NULL,
+    parser TEXT NOT NULL,
+    encoding TEXT NOT NULL,
+    content TEXT NOT NULL,
+    PRIMARY KEY (body_hash, parser, encoding)
+);
+"""
+
+
+class PageCache:
+    """Content-addressed, on-disk cache of crawled pages.
+
+    Bodies are stored once per SHA-256 under `bodies/`, and an SQLite index maps each URL to its body, its
+    validators (ETag / Last-Modified), its HTTP charset and when it was last validated. What was parsed from a body
+    is cached under the same hash, the parser backend and the charset, so an unchanged page is neither downloaded
+    again while fresh nor parsed again. The least recently used pages are evicted beyond `max_size_mb`.
+    """
+
+    def __init__(self, cache_dir=None):
+        self.config = config.page_cache
+        self.cache_dir = Path(cache_dir or dirs.CACHE_DIR / self.config.dir_name)
+        self.bodies_dir = self.cache_dir / 'bodies'
+        self.bodies_dir.mkdir(parents=True, exist_ok=True)
+        self.lock = threading.Lock()
+        # Shared by the crawler threads; several ingestion processes may open the same index
+        self.connection = sqlite3.connect(self.cache_dir / 'index.sqlite', timeout=30, check_same_thread=False)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.executescript(SCHEMA)
+        # Indexes created before pages had an encoding
+        if 'encoding' not in {row[1] for row in self.connection.execute('PRAGMA table_info(pages)')}:
+            self.connection.execute('ALTER TABLE pages ADD COLUMN encoding TEXT')
+
+    @staticmethod
+    def hash_body(content):
+        return hashlib.sha256(content).hexdigest()
+
+    def get_body_path(self, body_hash):
+        return self.bodies_dir / body_hash[:2] / body_hash
+
+    def lookup(self, url):
+        """The cached entry of a URL, or None when it was never fetched or its body is gone."""
+        with self.lock:
+            row = self.connection.execute('SELECT body_hash, etag, last_modified, validated_at, encoding FROM pages '
+                                          'WHERE url = ?', (url,)).fetchone()
+            if row is None:
+                return None
+            self.connection.execute('UPDATE pages SET accessed_at = ? WHERE url = ?', (time.time(), url))
+            self.connection.commit()
+        entry = Box(zip(('body_hash', 'etag', 'last_modified', 'validated_at', 'encoding'), row))
+        return entry if self.get_body_path(entry.body_hash).exists() else None
+
+    def is_fresh(self, entry):
+        return time.time() - entry.validated_at < self.config.ttl
+
+    @staticmethod
+    def get_conditional_headers(entry):
+        headers = {}
+        if entry.etag:
+            headers['If-None-Match'] = entry.etag
+        if entry.last_modified:
+            headers['If-Modified-Since'] = entry.last_modified
+        return headers
+
+    def read_body(self, body_hash):
+        try:
+            return self.get_body_path(body_hash).read_bytes()
+        except OSError:
+            return None
+
+    def store(self, url, content, encoding=None, etag=None, last_modified=None):
+        """Cache a downloaded page and return the hash of its body."""
+        body_hash = self.hash_body(content)
+        body_path = self.get_body_path(body_hash)
+        if not body_path.exists():
+            body_path.parent.mkdir(exist_ok=True)
+            temporary_path = body_path.with_name(f".{body_hash}.{os.getpid()}.{threading.get_ident()}.tmp")
+            temporary_path.write_bytes(content)
+            os.replace(temporary_path, body_path)
+
+        now = time.time()
+        with self.lock:
+            self.connection.execute('INSERT OR IGNORE INTO bodies (body_hash, size) VALUES (?, ?)',
+                                    (body_hash, len(content)))
+            self.connection.execute('INSERT OR REPLACE INTO pages (url, body_hash, etag, last_modified, validated_at, '
+                                    'accessed_at, encoding) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                                    (url, body_hash, etag, last_modified, now, now, encoding))
+            self.connection.commit()
+            self.evict()
+        return body_hash
+
+    def mark_validated(self, url):
+        """Record that the server confirmed the cached body of a URL is still current."""
+        with self.lock:
+            self.connection.execute('UPDATE pages SET validated_at = ? WHERE url = ?', (time.time(), url))
+            self.connection.commit()
+
+    def get_parsed(self, body_hash, parser, encoding=None):
+        """What `parser` extracted from a body decoded with the HTTP charset `encoding`, or None."""
+        with self.lock:
+            row = self.connection.execute('SELECT content FROM parsed WHERE body_hash = ? AND parser = ? '
+                                          'AND encoding = ?', (body_hash, parser, encoding or '')).fetchone()
+        # Lists are kept as they are: converting every link to a BoxList costs about as much as parsing the page
+        return Box(json.loads(row[0]), box_intact_types=(list,)) if row else None
+
+    def put_parsed(self, body_hash, parser, encoding, parsed):
+        with self.lock:
+            # A body evicted meanwhile gets no parse, which would never be evicted
+            self.connection.execute('INSERT OR REPLACE INTO parsed SELECT ?, ?, ?, ? WHERE EXISTS '
+                                    '(SELECT 1 FROM bodies WHERE body_hash = ?)',
+                                    (body_hash, parser, encoding or '', json.dumps(parsed), body_hash))
+            self.connection.commit()
+
+    def evict(self):
+        """Drop least recently used pages, then the bodies no page refers to, until the cache fits its size."""
+        max_size = self.config.max_size_mb * 1024 * 1024
+        total_size = self.connection.execute('SELECT COALESCE(SUM(size), 0) FROM bodies').fetchone()[0]
+        if total_size <= max_size:
+            return
+
+        pages = self.connection.execute('SELECT url, body_hash FROM pages ORDER BY accessed_at').fetchall()
+        sizes = dict(self.connection.execute('SELECT body_hash, size FROM bodies'))
+        references = dict.fromkeys(sizes, 0)
+        for _, body_hash in pages:
+            references[body_hash] += 1
+
+        # Bodies of pages that have changed since are dropped first
+        evicted_urls, evicted_bodies = [], [body_hash for body_hash, count in references.items() if not count]
+        total_size -= sum(sizes[body_hash] for body_hash in evicted_bodies)
+        for url, body_hash in pages:
+            if total_size <= max_size:
+                break
+            evicted_urls.append(url)
+            references[body_hash] -= 1
+            if not references[body_hash]:
+                evicted_bodies.append(body_hash)
+                total_size -= sizes.get(body_hash, 0)
+
+        self.connection.executemany('DELETE FROM pages WHERE url = ?', [(url,) for url in evicted_urls])
+        self.connection.executemany('DELETE FROM bodies WHERE body_hash = ?',
+                                    [(body_hash,) for body_hash in evicted_bodies])
+        self.connection.executemany('DELETE FROM parsed WHERE body_hash = ?',
+                                    [(body_hash,) for body_hash in evicted_bodies])
+        self.connection.commit()
+        for body_hash in evicted_bodies:
+            self.get_body_path(body_hash).unlink(missing_ok=True)
+        logger.info(f"Evicted {len(evicted_urls)} pages ({len(evicted_bodies)} bodies) from the page cache.")
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+
+# Usage example
+if __name__ == "__main__":
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        page_cache = PageCache(cache_dir)
+        url = "https://example.com/"
+        body_hash = page_cache.store(url, b"<html><p>Hello</p></html>", encoding="utf-8", etag='"v1"')
+        page_cache.put_parsed(body_hash, "lxml", "utf-8", {"paragraphs": ["Hello"], "links": []})
+
+        entry = page_cache.lookup(url)
+        print(f"Fresh: {page_cache.is_fresh(entry)}, headers: {page_cache.get_conditional_headers(entry)}")
+        print(f"Parsed: {page_cache.get_parsed(entry.body_hash, 'lxml', entry.encoding)}")
+        page_cache.close()
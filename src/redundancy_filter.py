@@ -0,0 +1,103 @@
+import re
+import zlib
+from collections import defaultdict
+import numpy as np
+from sklearn.feature_extraction.text import HashingVectorizer
+
+MERSENNE_PRIME = (1 << 31) - 1
+
+
+class RedundancyFilter:
+    """Near-duplicate filter: MinHash LSH proposes candidates, cosine similarity of hashed term vectors confirms them.
+
+    The hashing vectorizer needs no fitting, so every paragraph keeps its full vocabulary, and a lookup only
+    compares against the few paragraphs that share an LSH bucket instead of every accepted paragraph.
+    """
+
+    def __init__(self, similarity_threshold, num_perm=128, bands=32, shingle_size=2, seed=0):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands.")
+        self.similarity_threshold = similarity_threshold
+        self.bands = bands
+        self.rows_per_band = num_perm // bands
+        self.shingle_size = shingle_size
+        rng = np.random.default_rng(seed)
+        self.hash_a = rng.integers(1, MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+        self.hash_b = rng.integers(0, MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+        self.vectorizer = HashingVectorizer(n_features=2 ** 20, alternate_sign=False, norm='l2')
+        self.buckets = None
+        self.vectors = None
+        self.reset()
+
+    def reset(self):
+        """Forget every accepted paragraph."""
+        self.buckets = [defaultdict(list) for _ in range(self.bands)]
+        self.vectors = []
+
+    def hash_shingles(self, text):
+        tokens = re.findall(r'\w+', text.lower())
+        size = min(self.shingle_size, len(tokens)) or 1
+        shingles = {' '.join(tokens[i:i + size]) for i in range(max(len(tokens) - size + 1, 1))}
+        return np.fromiter((zlib.crc32(shingle.encode('utf-8')) for shingle in shingles), dtype=np.uint64)
+
+    def compute_signatures(self, paragraphs, max_shingles_per_block=20000):
+        """MinHash signatures of all paragraphs, computed a block of paragraphs at a time."""
+        shingle_hashes = [self.hash_shingles(paragraph) for paragraph in paragraphs]
+        signatures = []
+        start = 0
+        while start < len(shingle_hashes):
+            end, total = start, 0
+            while end < len(shingle_hashes) and (end == start or total + len(shingle_hashes[end]) <= max_shingles_per_block):
+                total += len(shingle_hashes[end])
+                end += 1
+            block = shingle_hashes[start:end]
+            offsets = np.cumsum([0] + [len(hashes) for hashes in block[:-1]])
+            hashes = np.concatenate(block) % MERSENNE_PRIME
+            permuted = (self.hash_a[:, None] * hashes[None, :] + self.hash_b[:, None]) % MERSENNE_PRIME
+            signatures.append(np.minimum.reduceat(permuted, offsets, axis=1).T)
+            start = end
+        return np.vstack(signatures)
+
+    @staticmethod
+    def cosine_similarity(vector, other):
+        # Both vectors are L2-normalized with sorted, unique feature indices
+        _, positions, other_positions = np.intersect1d(vector[0], other[0], assume_unique=True, return_indices=True)
+        return float(vector[1][positions] @ other[1][other_positions])
+
+    def filter(self, paragraphs, limit=None):
+        """Return the paragraphs that are not near-duplicates of each other or of previously accepted ones.
+
+        Accepted paragraphs are remembered for later calls; at most `limit` paragraphs are accepted.
+        """
+        if not paragraphs:
+            return []
+
+        signatures = self.compute_signatures(paragraphs)
+        vectors = self.vectorizer.transform(paragraphs)
+        vectors.sort_indices()
+
+        accepted = []
+        for i, paragraph in enumerate(paragraphs):
+            if limit is not None and len(accepted) >= limit:
+                break
+
+            band_keys = [signatures[i, band * self.rows_per_band:(band + 1) * self.rows_per_band].tobytes()
+                         for band in range(self.bands)]
+            candidates = set()
+            for buckets, band_key in zip(self.buckets, band_keys):
+                candidates.update(buckets.get(band_key, ()))
+
+            # Keep the row as (indices, values) views; slicing the sparse matrix per row is comparatively slow
+            row = slice(vectors.indptr[i], vectors.indptr[i + 1])
+            vector = (vectors.indices[row], vectors.data[row])
+            if any(self.cosine_similarity(vector, self.vectors[candidate]) > self.similarity_threshold
+                   for candidate in candidates):
+                continue
+
+            vector_id = len(self.vectors)
+            self.vectors.append(vector)
+            for buckets, band_key in zip(self.buckets, band_keys):
+                buckets[band_key].append(vector_id)
+            accepted.append(paragraph)
+
+        return accepted
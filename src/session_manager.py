@@ -0,0 +1,48 @@
+import threading
+import time
+from collections import OrderedDict
+from box import Box
+from src.utils import logger, config
+
+
+class SessionManager:
+    """Keep one retrieval chain per user session, evicting the least recently used and idle sessions."""
+
+    def __init__(self, create_retrieval_chain):
+        self.config = config.web_interface
+        self.create_retrieval_chain = create_retrieval_chain
+        self.sessions = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get_session(self, session_id, history=None):
+        """Return the session for `session_id`, creating it from the Gradio history if it is new or was evicted."""
+        with self.lock:
+            self.evict_expired_sessions()
+            session = self.sessions.get(session_id)
+            if session is not None:
+                self.sessions.move_to_end(session_id)
+                session.last_used = time.monotonic()
+                return session
+
+            session = Box({
+                'retrieval_chain': self.create_retrieval_chain(chat_history=history),
+                'lock': threading.Lock(),
+                'last_used': time.monotonic(),
+            })
+            self.sessions[session_id] = session
+            while len(self.sessions) > self.config.max_sessions:
+                evicted_id, _ = self.sessions.popitem(last=False)
+                logger.info(f"Evicted least recently used session {evicted_id}.")
+            return session
+
+    def evict_expired_sessions(self):
+        deadline = time.monotonic() - self.config.session_ttl
+        while self.sessions:
+            session_id, session = next(iter(self.sessions.items()))
+            if session.last_used >= deadline:
+                break
+            del self.sessions[session_id]
+            logger.info(f"Evicted idle session {session_id}.")
+
+    def __len__(self):
+        return len(self.sessions)
@@ -0,0 +1,87 @@
+import numpy as np
+from llama_cpp import Llama
+from llama_cpp.llama_speculative import LlamaDraftModel, LlamaPromptLookupDecoding
+from src.metrics import metrics
+
+
+class SmallModelDecoding(LlamaDraftModel):
+    """Draft tokens greedily with a small GGUF model that shares the main model's vocabulary."""
+
+    def __init__(self, model_path, num_pred_tokens=10, n_ctx=512, n_gpu_layers=0):
+        self.llama = Llama(model_path=model_path, n_ctx=n_ctx, n_gpu_layers=n_gpu_layers, verbose=False)
+        self.num_pred_tokens = num_pred_tokens
+
+    def __call__(self, input_ids, /, **kwargs):
+        draft = []
+        # `generate` reuses the draft context's longest common prefix with `input_ids`
+        for token in self.llama.generate(input_ids.tolist(), temp=0.0):
+            if token == self.llama.token_eos():
+                break
+            draft.append(token)
+            if len(draft) >= self.num_pred_tokens:
+                break
+        return np.array(draft, dtype=np.intc)
+
+
+class TrackedDraftModel(LlamaDraftModel):
+    """Count how many drafted tokens the main model accepts.
+
+    llama.cpp calls the draft model after each verification step with everything decoded so far, so the tokens
+    that follow the previous call's input tell how much of the previous draft was kept.
+    """
+
+    def __init__(self, draft_model):
+        self.draft_model = draft_model
+        self.previous_input = None
+        self.previous_draft = None
+        self.accepted = 0
+        self.drafted = 0
+
+    @property
+    def acceptance_rate(self):
+        """Accepted share of the drafted tokens, or None before any draft was verified.
+
+        Biased: the last draft of each completion is never counted, because no later call shows how much of it was
+        kept (and llama.cpp's `input_ids` still hold the whole evaluated draft when the completion stops). These
+        drafts end in the rejection or end of text that stopped the answer, so short answers overstate the rate.
+        """
+        return self.accepted / self.drafted if self.drafted else None
+
+    def record_verified(self, input_ids):
+        previous_input, previous_draft = self.previous_input, self.previous_draft
+        if previous_draft is None or not len(previous_draft):
+            return
+        # A new completion: the last draft of the previous one was never verified
+        if len(input_ids) <= len(previous_input) or not np.array_equal(input_ids[:len(previous_input)],
+                                                                        previous_input):
+            return
+        continuation = input_ids[len(previous_input):len(previous_input) + len(previous_draft)]
+        mismatches = np.flatnonzero(continuation != previous_draft[:len(continuation)])
+        accepted = int(mismatches[0]) if len(mismatches) else len(continuation)
+        self.accepted += accepted
+        self.drafted += len(previous_draft)
+        metrics.increment("knownetqa_llm_draft_tokens_total", accepted, result="accepted")
+        metrics.increment("knownetqa_llm_draft_tokens_total", len(previous_draft) - accepted, result="rejected")
+
+    def __call__(self, input_ids, /, **kwargs):
+        self.record_verified(input_ids)
+        draft = self.draft_model(input_ids, **kwargs)
+        self.previous_input, self.previous_draft = input_ids.copy(), draft
+        return draft
+
+
+def create_draft_model(params, n_ctx, draft_model_path=None):
+    """Draft model for the configured mode ("none", "prompt_lookup" or "draft_model"), or None."""
+    if params.mode == "none":
+        return None
+    if params.mode == "prompt_lookup":
+        # RAG answers copy heavily from the retrieved context, which is part of the prompt
+        draft_model = LlamaPromptLookupDecoding(max_ngram_size=params.max_ngram_size,
+                                                num_pred_tokens=params.num_pred_tokens)
+    elif params.mode == "draft_model":
+        draft_model = SmallModelDecoding(str(draft_model_path), num_pred_tokens=params.num_pred_tokens,
+                                         n_ctx=n_ctx, n_gpu_layers=params.draft_n_gpu_layers)
+    else:
+        raise ValueError(f"Unknown speculative decoding mode: {params.mode}")
+    return TrackedDraftModel(draft_model)
+
@@ -1,6 +1,10 @@
 import logging
+import os
+import queue
+import threading
 import yaml
 from box import Box
+from contextlib import contextmanager
 from pathlib import Path
 from src import dirs
 
@@ -39,6 +43,104 @@ def load_config(config_file="config.yaml"):
     return Box(config)
 
 
+def get_resident_memory():
+    """Return the resident set size of the current process in bytes, or None if it cannot be determined."""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    try:
+        with open('/proc/self/statm') as file:
+            return int(file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def prefetch(iterable, maxsize):
+    """Consume `iterable` in a background thread, keeping at most `maxsize` items ready for the caller.
+
+    This overlaps the producer (e.g. file parsing) with the consumer (e.g. embedding) while bounding memory. When
+    the caller stops early, the producer stops too and closes `iterable`, which shuts down any worker pool it holds.
+    """
+    items = queue.Queue(maxsize=maxsize)
+    stop = threading.Event()
+    done = object()
+    errors = []
+
+    def put(item):
+        """Wait for room in the queue, giving up once the caller has stopped."""
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        iterator = iter(iterable)
+        try:
+            for item in iterator:
+                if not put(item):
+                    break
+        except Exception as e:
+            errors.append(e)
+        finally:
+            if hasattr(iterator, 'close'):
+                iterator.close()
+            put(done)
+
+    producer = threading.Thread(target=produce, name="prefetch", daemon=True)
+    producer.start()
+    try:
+        while (item := items.get()) is not done:
+            yield item
+    finally:
+        stop.set()
+        producer.join()
+    if errors:
+        raise errors[0]
+
+
+class ReadWriteLock:
+    """Lock shared by any number of readers or held by one writer. Waiting writers go first, so a steady stream
+    of readers cannot starve them."""
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.readers = 0
+        self.writing = False
+        self.waiting_writers = 0
+
+    @contextmanager
+    def read(self):
+        with self.condition:
+            self.condition.wait_for(lambda: not self.writing and not self.waiting_writers)
+            self.readers += 1
+        try:
+            yield
+        finally:
+            with self.condition:
+                self.readers -= 1
+                if not self.readers:
+                    self.condition.notify_all()
+
+    @contextmanager
+    def write(self):
+        with self.condition:
+            self.waiting_writers += 1
+            self.condition.wait_for(lambda: not self.writing and not self.readers)
+            self.waiting_writers -= 1
+            self.writing = True
+        try:
+            yield
+        finally:
+            with self.condition:
+                self.writing = False
+                self.condition.notify_all()
+
+
 # Setup logger
 logger = setup_logging()
 
@@ -1,22 +1,196 @@
-from src.utils import logger, config
+import hashlib
+import json
+import os
+import time
+from itertools import islice
+from pathlib import Path
+from box import Box
+from src.utils import logger, config, get_resident_memory
 from langchain_community.vectorstores import Chroma
-from src.document_extractor import DocumentExtractor
-from src.document_loader import DocumentLoader
-from src.embeddings_manager import EmbeddingsManager
+from src.local_vector_store import LocalVectorStore
+from src.hybrid_retriever import BM25Index
+from src.metrics import trace
 from src import dirs
 
 
 class VectorStoreManager:
     def __init__(self):
+        self.config = config.vector_store
         self.vector_store = None
+        self.vector_store_dir = None
+        self.manifest = None
+        self.bm25_index = BM25Index()
+
+    @staticmethod
+    def compute_document_id(document):
+        """Hash a chunk's content together with its source so that the ID changes whenever either does."""
+        content = f"{document.metadata.get('source', '')}\n{document.page_content}"
+        return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+    def load_vector_store(self, embeddings, vector_store_dir):
+        """Open the vector store, reusing the on-disk collection in persistent mode without any embedding calls."""
+        logger.info("Loading the vector store...")
+        self.vector_store_dir = Path(vector_store_dir)
+        if self.config.backend == "chroma":
+            self.vector_store = Chroma(
+                collection_name=self.config.collection_name,
+                embedding_function=embeddings,
+                persist_directory=str(vector_store_dir) if self.config.persist else None,
+            )
+        else:
+            self.vector_store = LocalVectorStore(
+                embedding_function=embeddings,
+                backend=self.config.backend,
+                index_params=self.config[self.config.backend],
+                persist_directory=(self.vector_store_dir / f"{self.config.collection_name}_{self.config.backend}"
+                                   if self.config.persist else None),
+            )
+        self.manifest = self.read_manifest()
+        self.build_bm25_index()
+
+    def build_bm25_index(self):
+        """Rebuild the keyword index from the stored chunks; no embedding calls are needed."""
+        self.bm25_index.clear()
+        indexed = self.vector_store.get(include=['documents', 'metadatas'])
+        for document_id, text, metadata in zip(indexed['ids'], indexed['documents'], indexed['metadatas']):
+            self.bm25_index.add(document_id, text, metadata)
 
     def create_vector_store(self, documents, embeddings, vector_store_dir):
         logger.info("Creating a vector store for the documents...")
-        self.vector_store = Chroma.from_documents(
-            documents=documents,
-            embedding=embeddings,
-            # persist_directory=vector_store_dir,
-        )
+        self.load_vector_store(embeddings, vector_store_dir)
+        self.reset_vector_store()
+        self.update_vector_store(documents)
+
+    def reset_vector_store(self):
+        """Drop every indexed chunk, e.g. when the index was built with other embedding or chunking parameters."""
+        vector_store = self.get_vector_store()
+        vector_store.delete_collection()
+        self.get_manifest_path().unlink(missing_ok=True)
+        self.load_vector_store(vector_store.embeddings, self.vector_store_dir)
+
+    def get_manifest_path(self):
+        return self.vector_store_dir / self.config.manifest_name
+
+    def read_manifest(self):
+        manifest_path = self.get_manifest_path()
+        if not self.config.persist or not manifest_path.exists():
+            return None
+        with manifest_path.open('r', encoding='utf-8') as file:
+            return json.load(file)
+
+    def write_manifest(self, index_params, document_hashes):
+        """Record what the index was built from, so a later update or start can detect what changed."""
+        self.manifest = {'index_params': index_params, 'documents': document_hashes}
+        if not self.config.persist:
+            return
+        manifest_path = self.get_manifest_path()
+        tmp_path = manifest_path.with_suffix('.tmp')
+        with tmp_path.open('w', encoding='utf-8') as file:
+            json.dump(self.manifest, file, indent=2)
+        os.replace(tmp_path, manifest_path)
+
+    def get_index_version(self):
+        """Identify the current index content; it changes whenever the manifest does."""
+        if self.manifest is None:
+            return None
+        return hashlib.sha256(json.dumps(self.manifest, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def plan_update(self, index_params, document_hashes):
+        """Compare the manifest with the current documents and decide what has to be (re-)indexed."""
+        manifest = self.manifest
+        if manifest is None or manifest['index_params'] != index_params:
+            if manifest is not None:
+                logger.info("Vector store was built with different parameters and will be rebuilt.")
+            return Box({
+                'rebuild': True,
+                'changed_sources': list(document_hashes),
+                'unchanged_sources': [],
+                'deleted_sources': [],
+            })
+
+        indexed_hashes = manifest['documents']
+        return Box({
+            'rebuild': False,
+            'changed_sources': [source for source, document_hash in document_hashes.items()
+                                if indexed_hashes.get(source) != document_hash],
+            'unchanged_sources': [source for source, document_hash in document_hashes.items()
+                                  if indexed_hashes.get(source) == document_hash],
+            'deleted_sources': [source for source in indexed_hashes if source not in document_hashes],
+        })
+
+    def get_indexed_ids(self, sources=None):
+        """IDs of the indexed chunks of the given sources (of every chunk when `sources` is None)."""
+        vector_store = self.get_vector_store()
+        if sources is None:
+            return set(vector_store.get(include=[])['ids'])
+        sources = list(sources)
+        indexed_ids = set()
+        # Chroma turns `$in` into one SQL parameter per value, so long lists are split
+        for start in range(0, len(sources), self.config.source_filter_batch_size):
+            where = {'source': {'$in': sources[start:start + self.config.source_filter_batch_size]}}
+            indexed_ids.update(vector_store.get(where=where, include=[])['ids'])
+        return indexed_ids
+
+    def update_vector_store(self, documents, sources=None):
+        """Upsert new or changed chunks and delete indexed chunks that are no longer part of the documents.
+
+        Only the indexed chunks of `sources` (the changed and deleted files) are compared with `documents`, so an
+        update costs as much as the files it touches; with `sources=None` every indexed chunk is.
+        `documents` may be a generator: it is consumed and upserted one batch at a time.
+        """
+        start_time = time.perf_counter()
+        first_searchable_time = None
+        peak_resident_memory = get_resident_memory()
+        vector_store = self.get_vector_store()
+        indexed_ids = self.get_indexed_ids(sources)
+        seen_ids = set()
+        added = 0
+
+        documents = iter(documents)
+        while batch := list(islice(documents, self.config.batch_size)):
+            new_documents, new_ids = [], []
+            for document in batch:
+                document_id = self.compute_document_id(document)
+                if document_id in seen_ids:
+                    continue
+                seen_ids.add(document_id)
+                if document_id not in indexed_ids:
+                    new_documents.append(document)
+                    new_ids.append(document_id)
+
+            if new_documents:
+                with trace("index_batch"):
+                    vector_store.add_documents(new_documents, ids=new_ids)
+                for document_id, document in zip(new_ids, new_documents):
+                    self.bm25_index.add(document_id, document.page_content, document.metadata)
+                added += len(new_documents)
+                if first_searchable_time is None:
+                    first_searchable_time = time.perf_counter() - start_time
+            peak_resident_memory = max(peak_resident_memory or 0, get_resident_memory() or 0) or None
+
+        stale_ids = list(indexed_ids - seen_ids)
+        if stale_ids:
+            vector_store.delete(ids=stale_ids)
+            for document_id in stale_ids:
+                self.bm25_index.remove(document_id)
+
+        if isinstance(vector_store, LocalVectorStore):
+            vector_store.save_local()
+
+        summary = Box({
+            'added': added,
+            'deleted': len(stale_ids),
+            'unchanged': len(seen_ids) - added,
+            'seconds': time.perf_counter() - start_time,
+            'seconds_to_first_searchable_chunk': first_searchable_time,
+            'peak_resident_memory_bytes': peak_resident_memory,
+        })
+        first_searchable = (f"{first_searchable_time:.2f}s" if first_searchable_time is not None else "none added")
+        peak_memory = (f"{peak_resident_memory / 1e6:.0f} MB" if peak_resident_memory is not None else "unknown")
+        logger.info(f"Vector store updated in {summary.seconds:.2f}s: {summary.added} chunks added, "
+                    f"{summary.deleted} deleted, {summary.unchanged} unchanged "
+                    f"(first searchable chunk: {first_searchable}, peak resident memory: {peak_memory}).")
+        return summary
 
     def get_vector_store(self):
         if not self.vector_store:
@@ -26,6 +200,10 @@ class VectorStoreManager:
 
 # Usage example
 if __name__ == "__main__":
+    from src.document_extractor import DocumentExtractor
+    from src.document_loader import DocumentLoader
+    from src.embeddings_manager import EmbeddingsManager
+
     # Extract documents
     document_extractor = DocumentExtractor()
     query = "What is Python ?"
@@ -0,0 +1,142 @@
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from email.message import Message
+from urllib.parse import urlparse
+import requests
+from requests.adapters import HTTPAdapter
+from box import Box
+from src.utils import logger, config
+from src.metrics import metrics, trace
+
+
+class WebCrawler:
+    def __init__(self, page_cache=None):
+        self.config = config.web_crawler
+        self.page_cache = page_cache
+        self.session = self.create_session()
+        self.executor = ThreadPoolExecutor(max_workers=self.config.max_workers, thread_name_prefix="crawler")
+        self.host_semaphores = defaultdict(lambda: threading.Semaphore(self.config.max_connections_per_host))
+        self.host_next_request = defaultdict(float)
+        self.host_lock = threading.Lock()
+
+    def create_session(self):
+        """Create a keep-alive session whose connection pool matches the crawl concurrency."""
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=self.config.max_workers,
+            pool_maxsize=self.config.max_workers,
+            max_retries=self.config.max_retries,
+        )
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        session.headers.update({"User-Agent": self.config.user_agent})
+        return session
+
+    def wait_for_host(self, host):
+        """Block until the politeness delay for the given host has elapsed."""
+        with self.host_lock:
+            now = time.monotonic()
+            start = max(now, self.host_next_request[host])
+            self.host_next_request[host] = start + self.config.min_delay_per_host
+        if start > now:
+            time.sleep(start - now)
+
+    def download(self, url, headers=None):
+        """GET a single page, honoring the per-host connection limit and delay."""
+        host = urlparse(url).netloc
+        with self.host_semaphores[host]:
+            self.wait_for_host(host)
+            try:
+                with trace("crawl_fetch"):
+                    response = self.session.get(url, timeout=self.config.timeout, headers=headers)
+                response.raise_for_status()
+                return response
+            except requests.RequestException as e:
+                logger.error(f"Error fetching content from {url}: {e}")
+                return None
+
+    def fetch(self, url):
+        """Fetch a single page, from the page cache when it is fresh or the server reports it unchanged.
+
+        Returns a Box with the page `content`, the charset of its Content-Type header (`encoding`, None when there is
+        none), the `body_hash` it is cached under (None without a page cache) and its `cache_status`: "fresh" (not
+        requested), "revalidated" (304 Not Modified) or "downloaded".
+        """
+        entry = self.page_cache.lookup(url) if self.page_cache is not None else None
+        if entry is not None and self.page_cache.is_fresh(entry):
+            content = self.page_cache.read_body(entry.body_hash)
+            if content is not None:
+                return self.get_page(url, content, entry.encoding, entry.body_hash, "fresh")
+
+        response = self.download(url, self.page_cache.get_conditional_headers(entry) if entry is not None else None)
+        if response is not None and response.status_code == 304:
+            content = self.page_cache.read_body(entry.body_hash)
+            if content is not None:
+                self.page_cache.mark_validated(url)
+                return self.get_page(url, content, entry.encoding, entry.body_hash, "revalidated")
+            # The body was evicted meanwhile
+            response = self.download(url)
+        if response is None:
+            return None
+
+        encoding = self.get_charset(response.headers.get("Content-Type"))
+        body_hash = None
+        if self.page_cache is not None:
+            body_hash = self.page_cache.store(url, response.content, encoding=encoding,
+                                              etag=response.headers.get("ETag"),
+                                              last_modified=response.headers.get("Last-Modified"))
+        return self.get_page(url, response.content, encoding, body_hash, "downloaded")
+
+    @staticmethod
+    def get_charset(content_type):
+        """Charset parameter of a Content-Type header. Unlike `response.encoding`, there is no ISO-8859-1 default
+        for text/html, so that the document's own declaration is used when the header has none."""
+        if not content_type:
+            return None
+        message = Message()
+        message['Content-Type'] = content_type
+        return message.get_param('charset')
+
+    def get_page(self, url, content, encoding, body_hash, cache_status):
+        if self.page_cache is not None:
+            metrics.increment("knownetqa_events_total", event=f"page_cache_{cache_status}")
+        return Box(url=url, content=content, encoding=encoding, body_hash=body_hash, cache_status=cache_status)
+
+    def crawl(self, pages_to_visit, visited, process_page, max_pages):
+        """Fetch pages concurrently and hand each fetched page to `process_page` on the calling thread.
+
+        `pages_to_visit` is consumed with `pop()`, so `process_page` may add newly discovered links to it.
+        The crawl stops when `process_page` returns False, the frontier is empty or `max_pages` were fetched.
+        """
+        in_flight = {}
+        try:
+            while True:
+                while pages_to_visit and len(in_flight) < self.config.max_workers and len(visited) < max_pages:
+                    url = pages_to_visit.pop()
+                    if url in visited:
+                        continue
+                    visited.add(url)
+                    if self.config.verbose:
+                        logger.info(f"Visiting: {url}")
+                    in_flight[self.executor.submit(self.fetch, url)] = url
+
+                if not in_flight:
+                    break
+
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    url = in_flight.pop(future)
+                    page = future.result()
+                    if page is None:
+                        continue
+                    if not process_page(url, page):
+                        return
+        finally:
+            for future in in_flight:
+                future.cancel()
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.session.close()
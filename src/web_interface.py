@@ -1,41 +1,126 @@
 import os
+import threading
+import time
 from dotenv import load_dotenv
 import gradio as gr
 from src import dirs
-from src.document_extractor import DocumentExtractor
-from src.chatbot import ChatBot
+from src.session_manager import SessionManager
+from src.inference_pool import InferencePool, InferenceQueueFullError
+from src.ingestion_jobs import ACTIVE_STATES
+from src.utils import logger, config
 
 
 class WebInterface:
     def __init__(self):
-        self.document_extractor = DocumentExtractor()
-        self.chatbot = ChatBot()
-        self.chatbot.setup_chatbot()
+        self.config = config.web_interface
+        # The chatbot pulls in LangChain, Chroma and llama.cpp; it is built by `warm_up`
+        self.chatbot = None
+        self.session_manager = None
+        self.ingestion_jobs = None
+        self.inference_pool = InferencePool()
+        self.ready = threading.Event()
+        self.warm_up_error = None
+
+    def warm_up(self):
+        """Import and initialize the heavy subsystems: models, embeddings and the vector store."""
+        try:
+            start_time = time.perf_counter()
+            from src.chatbot import ChatBot
+            from src.ingestion_jobs import IngestionJobManager
+
+            self.chatbot = ChatBot()
+            self.chatbot.setup_chatbot()
+            self.session_manager = SessionManager(self.chatbot.create_retrieval_chain)
+            # Crawling and extraction (spaCy) run in separate worker processes
+            self.ingestion_jobs = IngestionJobManager(self.chatbot, str(dirs.DOCUMENTS_DIR))
+            logger.info(f"Warm-up finished in {time.perf_counter() - start_time:.1f}s, ready to answer.")
+        except Exception as e:
+            logger.exception("Warm-up failed.")
+            self.warm_up_error = e
+        finally:
+            self.ready.set()
+
+    def start_warm_up(self):
+        """Warm up in a background thread so the HTTP server can bind its port right away."""
+        threading.Thread(target=self.warm_up, name="warm-up", daemon=True).start()
+
+    def is_live(self):
+        return self.warm_up_error is None
+
+    def is_ready(self):
+        return self.ready.is_set() and self.warm_up_error is None
+
+    @staticmethod
+    def run_in_session(session, run):
+        # Turns of the same session are answered in order, so its memory stays consistent
+        with session.lock:
+            return run()
+
+    def get_chatbot_response(self, question, history, url, keywords, request: gr.Request):
+        if not self.ready.is_set():
+            yield "KnowNetQA is still loading its models, your question will be answered shortly..."
+            self.ready.wait()
+        if self.warm_up_error is not None:
+            yield "KnowNetQA failed to start, please check the logs."
+            return
 
-    def get_chatbot_response(self, question, history, url, keywords):
         user_keywords = None
         if keywords:
             # Split keywords by comma and strip spaces
             user_keywords = [keyword.strip() for keyword in keywords.split(",")]
 
-        # Extract text from the provided URL and save it
+        # Crawl and index the provided URL in the background; this question is answered from the current index.
+        # The job's progress is shown by the status component, not in the answer, so it stays out of the memory.
         if url:
-            self.document_extractor.crawl_and_extract(
-                documents_dir=str(dirs.DOCUMENTS_DIR),
-                url=url,
-                query=question,
-                user_keywords=user_keywords,
+            self.ingestion_jobs.submit(url, query=question, user_keywords=user_keywords)
+
+        # Get response from the chatbot, using the conversation memory of this user's session
+        session_id = request.session_hash if request else "default"
+        session = self.session_manager.get_session(session_id, history)
+        try:
+            # Stream partial answers to the chat as tokens are generated
+            yield from self.chatbot.stream_question(
+                question,
+                session.retrieval_chain,
+                submit=lambda run: self.inference_pool.submit(self.run_in_session, session, run),
             )
+        except InferenceQueueFullError:
+            logger.info("Inference queue is full, rejecting the request.")
+            yield "The server is busy, please try again in a moment."
 
-            # Set up the chatbot with the configuration
-            self.chatbot.setup_chatbot()
+    def get_status(self):
+        """Indexing notice for the URLs still being crawled or indexed, empty when there are none."""
+        if self.ingestion_jobs is None:
+            return ""
+        active = [job for job in self.ingestion_jobs.list_jobs() if job.status in ACTIVE_STATES]
+        return "\n\n".join(f"*Indexing {job.url} in the background (job `{job.job_id}`, {job.status}); "
+                         f"answers use the documents indexed so far.*" for job in active)
 
-        # Get response from the chatbot
-        response = self.chatbot.ask_question(question)
-        return response
+    def get_job_rows(self):
+        """Rows of the ingestion jobs table, most recent first."""
+        if self.ingestion_jobs is None:
+            return []
+        return [
+            [job.job_id, job.url, job.status, job.pages_visited, job.paragraphs, job.chunks_added, job.error or ""]
+            for job in self.ingestion_jobs.list_jobs()
+        ]
 
     def create_web_interface(self):
-        app = gr.ChatInterface(
+        with gr.Blocks(title="KnowNetQA") as app:
+            self.create_chat_interface()
+            status = gr.Markdown()
+            with gr.Accordion(label="Ingestion Jobs", open=False):
+                jobs_table = gr.Dataframe(
+                    headers=["job", "url", "status", "pages", "paragraphs", "chunks added", "error"],
+                    interactive=False,
+                )
+            # Poll the job status while the page is open
+            app.load(self.get_status, None, status, every=self.config.job_poll_interval)
+            app.load(self.get_job_rows, None, jobs_table, every=self.config.job_poll_interval)
+        return app
+
+    def create_chat_interface(self):
+        return gr.ChatInterface(
             fn=self.get_chatbot_response,
             additional_inputs_accordion=gr.Accordion(label="Additional Inputs", open=True),
             additional_inputs=[
@@ -44,6 +129,7 @@ class WebInterface:
                            placeholder="[Optional] Enter Keywords here separated by commas..."),
             ],
             title="KnowNetQA",
+            concurrency_limit=self.config.concurrency_limit,
             description=
             """Provide a URL and keywords to extract documents for the chatbot to learn from, then ask any question.""",
             examples=[
@@ -54,12 +140,12 @@ class WebInterface:
                 ]
             ],
         )
-        return app
 
 
 if __name__ == "__main__":
     load_dotenv()
     web_interface = WebInterface()
+    web_interface.start_warm_up()
     app = web_interface.create_web_interface()
     app.launch(server_name=os.environ.get('GRADIO_SERVER_NAME'),
                server_port=int(os.environ.get('GRADIO_SERVER_PORT')),
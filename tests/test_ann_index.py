@@ -0,0 +1,125 @@
+import numpy as np
+import pytest
+from box import Box
+from src.ann_index import ExactIndex, HnswIndex, create_index
+
+
+def random_unit_vectors(count, dimensions, seed=0):
+    vectors = np.random.default_rng(seed).normal(size=(count, dimensions)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def create_hnsw_index(dimensions):
+    pytest.importorskip("hnswlib")
+    return HnswIndex(dimensions, initial_capacity=8)
+
+
+INDEXES = {
+    "float32": lambda dimensions: ExactIndex(dimensions, "float32"),
+    "int8": lambda dimensions: ExactIndex(dimensions, "int8"),
+    "hnsw": create_hnsw_index,
+}
+
+
+@pytest.fixture(params=INDEXES)
+def index_factory(request):
+    return INDEXES[request.param]
+
+
+def test_search_returns_the_nearest_vectors_best_first(index_factory):
+    vectors = random_unit_vectors(100, 16)
+    index = index_factory(16)
+    index.add([str(i) for i in range(100)], vectors)
+
+    results = index.search(vectors[7], 5)
+    expected = np.argsort(-(vectors @ vectors[7]))[:5]
+    assert [vector_id for vector_id, _ in results] == [str(i) for i in expected]
+    assert results[0][1] == pytest.approx(1.0, abs=0.02)
+    assert [score for _, score in results] == sorted((score for _, score in results), reverse=True)
+
+
+def test_add_replaces_and_remove_deletes(index_factory):
+    vectors = random_unit_vectors(20, 8)
+    index = index_factory(8)
+    index.add([str(i) for i in range(10)], vectors[:10])
+    index.add(["3"], vectors[15:16])
+    index.remove(["0", "9", "missing"])
+
+    assert len(index) == 8
+    assert index.search(vectors[15], 1)[0][0] == "3"
+    assert {vector_id for vector_id, _ in index.search(vectors[0], 8)} == {str(i) for i in range(1, 9)}
+
+
+def test_search_is_limited_to_the_index_size(index_factory):
+    index = index_factory(4)
+    assert index.search(np.ones(4, dtype=np.float32), 3) == []
+    index.add(["a", "b"], random_unit_vectors(2, 4))
+    assert len(index.search(np.ones(4, dtype=np.float32), 3)) == 2
+
+
+def test_save_and_load(index_factory, tmp_path):
+    vectors = random_unit_vectors(30, 8)
+    index = index_factory(8)
+    index.add([str(i) for i in range(30)], vectors)
+    index.remove(["4"])
+    path = tmp_path / "index"
+    index.save(path)
+    if isinstance(index, ExactIndex):
+        path = tmp_path / "index.npz"
+
+    loaded = index_factory(8)
+    loaded.load(path)
+    assert len(loaded) == 29
+    assert loaded.search(vectors[5], 3) == index.search(vectors[5], 3)
+    # A removed vector stays removed
+    assert "4" not in {vector_id for vector_id, _ in loaded.search(vectors[4], 29)}
+
+
+def test_int8_scores_are_close_to_float32():
+    vectors = random_unit_vectors(50, 32)
+    exact, quantized = ExactIndex(32, "float32"), ExactIndex(32, "int8")
+    for index in (exact, quantized):
+        index.add([str(i) for i in range(50)], vectors)
+    exact_scores = dict(exact.search(vectors[0], 50))
+    for vector_id, score in quantized.search(vectors[0], 50):
+        assert score == pytest.approx(exact_scores[vector_id], abs=0.02)
+
+
+def test_estimate_memory_bytes():
+    index = ExactIndex(8, "int8")
+    index.add(["a", "b"], random_unit_vectors(2, 8))
+    assert index.estimate_memory_bytes() == 2 * (8 + 4)
+
+
+def test_create_index():
+    assert isinstance(create_index("exact", 8, Box(dtype="int8")), ExactIndex)
+    with pytest.raises(ValueError):
+        create_index("faiss", 8, Box())
+    with pytest.raises(ValueError):
+        ExactIndex(8, "float16")
+
+
+def test_int8_search_in_blocks_matches_one_block():
+    vectors = random_unit_vectors(50, 16)
+    blocked, whole = ExactIndex(16, "int8", block_rows=7), ExactIndex(16, "int8")
+    for index in (blocked, whole):
+        index.add([str(i) for i in range(50)], vectors)
+    assert blocked.search(vectors[3], 10) == whole.search(vectors[3], 10)
+
+
+def test_hnsw_reuses_the_slots_of_removed_vectors(tmp_path):
+    vectors = random_unit_vectors(16, 8)
+    index = create_hnsw_index(8)
+    index.add([str(i) for i in range(8)], vectors[:8])
+    index.remove(["0", "1", "2", "3"])
+    index.add([str(i) for i in range(8, 12)], vectors[8:12])
+    assert (index.index.get_current_count(), index.index.get_max_elements()) == (8, 8)
+
+    index.save(tmp_path / "index.bin")
+    loaded = create_hnsw_index(8)
+    loaded.load(tmp_path / "index.bin")
+    loaded.remove(["4"])
+    loaded.add(["12"], vectors[12:13])
+    assert loaded.index.get_current_count() == 8
+    assert loaded.search(vectors[12], 1)[0][0] == "12"
+    assert {vector_id for vector_id, _ in loaded.search(vectors[0], 8)} == {"5", "6", "7", "8", "9", "10", "11", "12"}
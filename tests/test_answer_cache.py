@@ -0,0 +1,54 @@
+import pytest
+from src import dirs
+from src.answer_cache import AnswerCache
+from src.utils import config
+
+
+@pytest.fixture(autouse=True)
+def cache_config(tmp_path, monkeypatch):
+    monkeypatch.setattr(dirs, "VECTOR_STORE_DIR", tmp_path)
+    monkeypatch.setattr(config.answer_cache, "persist", False)
+    monkeypatch.setattr(config.answer_cache, "similarity_threshold", 0.95)
+
+
+@pytest.fixture
+def answer_cache():
+    return AnswerCache()
+
+
+def test_same_and_near_duplicate_questions_hit(answer_cache):
+    answer_cache.put("What is Python?", [1.0, 0.0], "A language.", index_version="v1")
+    assert answer_cache.lookup("  what is   PYTHON? ", [0.0, 1.0], "v1") == "A language."
+    assert answer_cache.lookup("What's Python?", [0.99, 0.05], "v1") == "A language."
+    assert answer_cache.lookup("Who created Python?", [0.6, 0.8], "v1") is None
+
+
+def test_a_new_index_version_invalidates_the_answers(answer_cache):
+    answer_cache.put("What is Python?", [1.0, 0.0], "A language.", index_version="v1")
+    assert answer_cache.lookup("What is Python?", [1.0, 0.0], "v2") is None
+    assert not answer_cache.entries
+
+
+def test_least_recently_used_and_expired_answers_are_evicted(answer_cache, monkeypatch):
+    monkeypatch.setattr(config.answer_cache, "max_entries", 2)
+    answer_cache.put("a", [1.0, 0.0, 0.0], "A", "v1")
+    answer_cache.put("b", [0.0, 1.0, 0.0], "B", "v1")
+    answer_cache.lookup("a", [1.0, 0.0, 0.0], "v1")
+    answer_cache.put("c", [0.0, 0.0, 1.0], "C", "v1")
+    assert list(answer_cache.entries) == ["a", "c"]
+
+    monkeypatch.setattr(config.answer_cache, "ttl", -1)
+    assert answer_cache.lookup("a", [1.0, 0.0, 0.0], "v1") is None
+    assert not answer_cache.entries
+
+
+def test_answers_are_saved_and_loaded(monkeypatch):
+    monkeypatch.setattr(config.answer_cache, "persist", True)
+    monkeypatch.setattr(config.answer_cache, "save_interval", 3600)
+    saved_cache = AnswerCache()
+    saved_cache.put("What is Python?", [1.0, 0.0], "A language.", "v1")
+    saved_cache.close()
+
+    loaded_cache = AnswerCache()
+    assert loaded_cache.lookup("What is Python?", [1.0, 0.0], "v1") == "A language."
+    loaded_cache.close()
@@ -0,0 +1,55 @@
+from langchain_core.documents import Document
+from src.context_budgeter import ContextBudgeter
+
+
+def count_words(text):
+    return len(text.split())
+
+
+def create_budgeter(**kwargs):
+    return ContextBudgeter(count_tokens=count_words, **kwargs)
+
+
+DOCUMENTS = [
+    Document(page_content="Python was created by Guido van Rossum. It was first released in 1991.",
+             metadata={"source": "a"}),
+    Document(page_content="Python was created by Guido van Rossum! It was first released in 1991.",
+             metadata={"source": "b"}),
+    Document(page_content="The garbage collector uses reference counting. Cycles are detected separately.",
+             metadata={"source": "c"}),
+]
+
+
+def test_near_duplicates_are_dropped_and_sentences_selected():
+    packed = create_budgeter(max_context_tokens=100).compress_documents(DOCUMENTS, "Who created Python?")
+    assert [(document.page_content, document.metadata["source"]) for document in packed] == [
+        ("Python was created by Guido van Rossum.", "a"),
+        # No sentence shares a term with the query, so the whole chunk is kept
+        ("The garbage collector uses reference counting. Cycles are detected separately.", "c"),
+    ]
+
+
+def test_packing_stops_at_the_token_budget():
+    packed = create_budgeter(max_context_tokens=10).compress_documents(DOCUMENTS, "Who created Python?")
+    assert [document.page_content for document in packed] == ["Python was created by Guido van Rossum."]
+    assert sum(count_words(document.page_content) for document in packed) <= 10
+
+
+def test_whole_chunks_without_sentence_extraction():
+    budgeter = create_budgeter(max_context_tokens=100, extract_sentences=False)
+    packed = budgeter.compress_documents(DOCUMENTS, "Who created Python?")
+    assert packed[0].page_content == DOCUMENTS[0].page_content
+
+
+def test_sentences_keep_their_order():
+    document = Document(page_content="Python is old. Java is not. Python is popular.")
+    packed = create_budgeter(max_context_tokens=100, min_term_length=3).compress_documents([document], "python")
+    assert packed[0].page_content == "Python is old. Python is popular."
+
+
+def test_best_document_is_truncated_when_no_sentence_fits():
+    packed = create_budgeter(max_context_tokens=3).compress_documents(DOCUMENTS, "Who created Python?")
+    assert [(document.page_content, document.metadata["source"]) for document in packed] == \
+        [("Python was created", "a")]
+    assert create_budgeter(max_context_tokens=0).compress_documents(DOCUMENTS, "Python") == []
+    assert create_budgeter().compress_documents([], "Python") == []
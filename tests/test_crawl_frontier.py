@@ -0,0 +1,60 @@
+import pytest
+from src.crawl_frontier import CrawlFrontier, canonicalize_url
+from src.keyword_matcher import KeywordMatcher
+
+
+@pytest.mark.parametrize("url, expected", [
+    ("HTTPS://En.Wikipedia.org:443/wiki/Python#History", "https://en.wikipedia.org/wiki/Python"),
+    ("http://example.com:8080/a/./b/../c", "http://example.com:8080/a/c"),
+    ("http://example.com", "http://example.com/"),
+    ("http://example.com/docs/", "http://example.com/docs/"),
+    ("http://example.com/?b=2&a=1&utm_source=x&fbclid=y&gclid=z&mc_cid=1&mc_eid=2",
+     "http://example.com/?a=1&b=2"),
+    # Parameters that select another page or revision are kept
+    ("https://en.wikipedia.org/w/index.php?title=Python&oldid=5&action=history&printable=yes&ref=x",
+     "https://en.wikipedia.org/w/index.php?action=history&oldid=5&printable=yes&ref=x&title=Python"),
+])
+def test_canonicalize_url(url, expected):
+    assert canonicalize_url(url) == expected
+
+
+def create_frontier(max_depth=None):
+    return CrawlFrontier(KeywordMatcher(["python", "language"]), max_depth=max_depth)
+
+
+def test_pop_returns_the_best_scored_url_then_discovery_order():
+    frontier = create_frontier()
+    frontier.add("http://example.com/a", score=1.0)
+    frontier.add("http://example.com/b", score=3.0)
+    frontier.add("http://example.com/c", score=1.0)
+    assert len(frontier) == 3
+    assert [frontier.pop() for _ in range(3)] == ["http://example.com/b", "http://example.com/a",
+                                                  "http://example.com/c"]
+    assert not frontier
+
+
+def test_duplicates_and_links_beyond_max_depth_are_dropped():
+    frontier = create_frontier(max_depth=1)
+    assert frontier.add("http://example.com/a#top", depth=1)
+    assert not frontier.add("HTTP://EXAMPLE.COM/a")
+    assert not frontier.add("http://example.com/deep", depth=2)
+    assert frontier.get_depth("http://example.com/a") == 1
+    assert len(frontier) == 1
+
+
+def test_links_are_scored_by_anchor_url_context_and_page_relevance():
+    frontier = create_frontier()
+    assert frontier.score_link("http://example.com/wiki/Python_(language)", "Python", "a language", 2) == \
+        3.0 * 1 + 2.0 * 2 + 1.0 * 1 + 0.5 * 2
+    # Page relevance is capped
+    assert frontier.score_link("http://example.com/x", "", "", 100) == 0.5 * 10
+
+
+def test_add_links_queues_relevant_links_first():
+    frontier = create_frontier()
+    frontier.add_links([
+        ("http://example.com/contact", "Contact", "Contact us"),
+        ("http://example.com/wiki/Python", "Python", "The Python language"),
+    ], depth=1)
+    assert frontier.pop() == "http://example.com/wiki/Python"
+    assert frontier.get_depth("http://example.com/contact") == 1
@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+from src.embedding_cache import EmbeddingCache, CachedEmbeddings
+from src.utils import config
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(config.document_embeddings.cache, "max_open_shards", 2)
+    monkeypatch.setattr(config.document_embeddings.cache, "merge_shard_rows", 4)
+    monkeypatch.setattr(config.document_embeddings.cache, "max_small_shards", 2)
+    return tmp_path
+
+
+def fill(cache, keys):
+    for key in keys:
+        cache.put(key, np.full(3, int(key), dtype=np.float32))
+    cache.flush()
+
+
+def test_vectors_are_found_again_after_reopening(cache_dir):
+    cache = EmbeddingCache(cache_dir, "org/model", {"normalize_embeddings": True})
+    fill(cache, ["1", "2"])
+    cache.close()
+    cache = EmbeddingCache(cache_dir, "org/model", {"normalize_embeddings": True})
+    assert cache.get("2").tolist() == [2.0, 2.0, 2.0]
+    assert cache.get("3") is None
+
+
+def test_encode_params_are_part_of_the_key(cache_dir):
+    fill(EmbeddingCache(cache_dir, "org/model", {"normalize_embeddings": True}), ["1"])
+    assert EmbeddingCache(cache_dir, "org/model", {"normalize_embeddings": False}).get("1") is None
+
+
+def test_small_shards_are_merged_and_open_shards_capped(cache_dir):
+    cache = EmbeddingCache(cache_dir, "org/model")
+    for key in range(10):
+        fill(cache, [str(key)])
+    # A shard of 4 vectors no longer counts as small, so at most 2 + 1 small shards and the big ones remain
+    assert len(list(cache.cache_dir.glob("shard_*.npy"))) <= 5
+    assert [cache.get(str(key))[0] for key in range(10)] == list(range(10))
+    assert len(cache.open_shards) <= 2
+
+
+def test_replaced_vectors_are_dropped_when_merging(cache_dir):
+    cache = EmbeddingCache(cache_dir, "org/model")
+    fill(cache, ["1"])
+    cache.put("1", np.zeros(3, dtype=np.float32))
+    cache.flush()
+    fill(cache, ["2"])
+    assert cache.get("1").tolist() == [0.0, 0.0, 0.0]
+    assert cache.connection.execute("SELECT SUM(rows) FROM shards").fetchone()[0] == 2
+
+
+class CountingEmbeddings:
+    def __init__(self):
+        self.encoded = []
+
+    def embed_documents(self, texts):
+        self.encoded += texts
+        return [[float(len(text))] * 3 for text in texts]
+
+
+def test_cached_embeddings_encode_each_missing_text_once(cache_dir):
+    embeddings = CountingEmbeddings()
+    cached_embeddings = CachedEmbeddings(embeddings, EmbeddingCache(cache_dir, "org/model"), batch_size=2)
+    assert cached_embeddings.embed_documents(["a", "bb", "a"]) == [[1.0] * 3, [2.0] * 3, [1.0] * 3]
+    assert cached_embeddings.embed_documents(["bb", "ccc"]) == [[2.0] * 3, [3.0] * 3]
+    assert embeddings.encoded == ["a", "bb", "ccc"]
@@ -0,0 +1,88 @@
+import pytest
+from benchmarks.fixture_site import generate_pages
+from src.html_parser import create_html_parser, get_encoding
+
+BACKENDS = ["html.parser", "strainer", "lxml", "selectolax"]
+# Backends that close unclosed elements the way browsers do
+HTML5_BACKENDS = ["lxml", "selectolax"]
+
+
+def get_parser(backend):
+    try:
+        return create_html_parser(backend)
+    except ImportError:
+        pytest.skip(f"{backend} is not installed")
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_fixture_pages_parse_like_html_parser(backend):
+    reference, html_parser = create_html_parser("html.parser"), get_parser(backend)
+    for content in generate_pages(10, paragraphs_per_page=30, links_per_page=40).values():
+        assert html_parser.parse(content) == reference.parse(content)
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_links_have_anchor_text_and_context(backend):
+    content = (b'<p>Python is a <b>programming</b> language.</p>'
+               b'<ul><li>See <a href="/wiki/CPython">CPython</a>, the reference implementation</li></ul>'
+               b'<a href="/top">top</a>')
+    parsed = get_parser(backend).parse(content)
+    assert parsed.paragraphs == ["Python is aprogramminglanguage."]
+    assert parsed.links == [("/wiki/CPython", "CPython", "See CPython , the reference implementation"),
+                            ("/top", "top", "")]
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_script_style_and_comments_are_not_text(backend):
+    content = b'<p>a<script>x = 1</script>b<style>p {}</style>c<!-- d --></p>'
+    assert get_parser(backend).parse(content).paragraphs == ["abc"]
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_empty_paragraphs_are_dropped(backend):
+    assert get_parser(backend).parse(b'<p></p><p> </p><p>text</p></p>').paragraphs == ["text"]
+
+
+@pytest.mark.parametrize("backend", ["html.parser", "strainer"])
+def test_nested_paragraphs_stay_nested_with_beautifulsoup(backend):
+    content = b'<p>outer <p>inner</p> tail</p>'
+    assert get_parser(backend).parse(content).paragraphs == ["outerinnertail", "inner"]
+
+
+@pytest.mark.parametrize("backend", HTML5_BACKENDS)
+def test_nested_paragraphs_are_closed_like_browsers(backend):
+    content = b'<p>outer <p>inner</p> tail</p>'
+    assert get_parser(backend).parse(content).paragraphs == ["outer", "inner"]
+
+
+@pytest.mark.parametrize("backend", ["html.parser", "strainer"])
+def test_unclosed_list_item_context_runs_on_with_beautifulsoup(backend):
+    content = b'<ul><li>one <a href="/1">1</a><li>two <a href="/2">2</a></ul>'
+    assert get_parser(backend).parse(content).links == [("/1", "1", "one 1 two 2"), ("/2", "2", "two 2")]
+
+
+@pytest.mark.parametrize("backend", HTML5_BACKENDS)
+def test_unclosed_list_item_context_is_its_own_item(backend):
+    content = b'<ul><li>one <a href="/1">1</a><li>two <a href="/2">2</a></ul>'
+    assert get_parser(backend).parse(content).links == [("/1", "1", "one 1"), ("/2", "2", "two 2")]
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+@pytest.mark.parametrize("content, http_encoding", [
+    # Undeclared Latin-1 is detected
+    ("<p>crème brûlée naïve</p>".encode("latin-1"), None),
+    # The HTTP charset wins over a wrong declaration
+    ('<meta charset="utf-8"><p>crème brûlée naïve</p>'.encode("latin-1"), "iso-8859-1"),
+    ('<meta charset="windows-1252"><p>crème brûlée naïve</p>'.encode("cp1252"), None),
+    ("<p>crème brûlée naïve</p>".encode("utf-16"), None),
+    ("<p>crème brûlée naïve</p>".encode("utf-8"), None),
+])
+def test_encodings(backend, content, http_encoding):
+    assert get_parser(backend).parse(content, http_encoding).paragraphs == ["crème brûlée naïve"]
+
+
+def test_get_encoding_order():
+    assert get_encoding('<meta charset="latin-1"><p>é</p>'.encode("latin-1"), "utf-8") == "utf-8"
+    assert get_encoding('<meta charset="latin-1"><p>é</p>'.encode("latin-1")) == "iso8859-1"
+    assert get_encoding('<meta charset="unknown"><p>é</p>'.encode("utf-8")) == "utf-8"
+    assert get_encoding("<p>é</p>".encode("utf-8"), "no-such-charset") == "utf-8"
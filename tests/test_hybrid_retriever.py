@@ -0,0 +1,111 @@
+import pytest
+from langchain_core.documents import Document
+from src.hybrid_retriever import BM25Index, HybridRetriever
+
+TEXTS = {
+    "python": "Python is a programming language with dynamic typing.",
+    "java": "Java is a programming language that runs on the JVM.",
+    "snake": "The python is a large snake found in Africa and Asia.",
+    "garbage": "Reference counting frees most objects; a cycle collector handles the rest.",
+}
+
+
+def create_bm25_index():
+    bm25_index = BM25Index()
+    for document_id, text in TEXTS.items():
+        bm25_index.add(document_id, text, {"source": document_id})
+    return bm25_index
+
+
+class StubVectorStore:
+    """Returns fixed documents, as a dense search would rank them."""
+
+    def __init__(self, document_ids):
+        self.document_ids = document_ids
+
+    def similarity_search(self, query, k=4):
+        return [Document(page_content=TEXTS[document_id], metadata={"source": document_id})
+                for document_id in self.document_ids[:k]]
+
+
+class StubReranker:
+    """Scores a pair by the position of its text in `order`, best first."""
+
+    def __init__(self, order):
+        self.order = order
+
+    def predict(self, pairs):
+        return [-self.order.index(text) for _, text in pairs]
+
+
+def test_bm25_ranks_documents_matching_more_query_terms_first():
+    results = create_bm25_index().search("python programming language", 4)
+    assert [document_id for document_id, _ in results][:2] == ["python", "java"]
+    assert "garbage" not in dict(results)
+    assert all(score > 0 for _, score in results)
+
+
+def test_bm25_rare_terms_weigh_more():
+    scores = dict(create_bm25_index().search("snake language", 4))
+    assert scores["snake"] > scores["python"]
+
+
+def test_bm25_scores_follow_okapi():
+    bm25_index = BM25Index(k1=1.5, b=0.75)
+    bm25_index.add("a", "apple banana", {})
+    bm25_index.add("b", "banana cherry cherry date", {})
+    # idf(cherry) = ln(1 + (2 - 1 + 0.5) / (1 + 0.5)); |b| = 4, average length 3
+    expected = 0.6931471805599453 * 2 * 2.5 / (2 + 1.5 * (0.25 + 0.75 * 4 / 3))
+    assert bm25_index.search("cherry", 1) == [("b", pytest.approx(expected))]
+
+
+def test_bm25_add_replaces_and_remove_deletes():
+    bm25_index = create_bm25_index()
+    bm25_index.add("python", "Completely different text about gardens.", {})
+    bm25_index.remove("java")
+    bm25_index.remove("missing")
+    assert len(bm25_index) == 3
+    assert [document_id for document_id, _ in bm25_index.search("programming", 4)] == []
+    assert bm25_index.search("gardens", 1)[0][0] == "python"
+    assert bm25_index.get_document("python").page_content == "Completely different text about gardens."
+    bm25_index.clear()
+    assert bm25_index.search("gardens", 1) == []
+
+
+def create_retriever(dense_ids, **kwargs):
+    return HybridRetriever(
+        vector_store=StubVectorStore(dense_ids),
+        bm25_index=create_bm25_index(),
+        compute_document_id=lambda document: document.metadata["source"],
+        **kwargs,
+    )
+
+
+def test_reciprocal_rank_fusion_prefers_documents_both_searches_rank_high():
+    # BM25 ranks "snake" first for this query; dense search ranks it second
+    retriever = create_retriever(["garbage", "snake", "java"], k=3, rrf_k=60)
+    documents = retriever.get_relevant_documents("large snake")
+    assert [document.metadata["source"] for document in documents] == ["snake", "garbage", "java"]
+    assert set(retriever.last_timings) == {"dense_search", "bm25_search", "fusion"}
+
+
+def test_documents_found_by_bm25_alone_are_returned():
+    retriever = create_retriever([], k=2)
+    documents = retriever.get_relevant_documents("cycle collector")
+    assert [document.page_content for document in documents] == [TEXTS["garbage"]]
+
+
+def test_reranker_reorders_the_fused_candidates():
+    order = [TEXTS["java"], TEXTS["python"], TEXTS["snake"], TEXTS["garbage"]]
+    retriever = create_retriever(["python", "snake", "java"], k=2, reranker=StubReranker(order), rerank_top_n=3)
+    documents = retriever.get_relevant_documents("python")
+    assert [document.metadata["source"] for document in documents] == ["java", "python"]
+    assert "rerank" in retriever.last_timings
+
+
+def test_reranking_keeps_k_documents_when_k_exceeds_rerank_top_n():
+    order = [TEXTS["garbage"], TEXTS["snake"], TEXTS["java"], TEXTS["python"]]
+    retriever = create_retriever(["python", "snake", "java", "garbage"], k=4, reranker=StubReranker(order),
+                                 rerank_top_n=2)
+    documents = retriever.get_relevant_documents("python")
+    assert [document.metadata["source"] for document in documents] == ["garbage", "snake", "java", "python"]
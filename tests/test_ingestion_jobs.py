@@ -0,0 +1,94 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from box import Box
+from src import ingestion_jobs
+from src.ingestion_jobs import IngestionJobManager, ACTIVE_STATES
+from src.utils import config
+
+
+class StubChatBot:
+    def __init__(self):
+        self.updates = []
+
+    def prepare_documents(self, documents_dir):
+        pass
+
+    def update_documents(self, documents_dir):
+        self.updates.append(documents_dir)
+        return Box(added=3)
+
+
+class ThreadedJobManager(IngestionJobManager):
+    """Crawls in threads, so the tests need neither spawned processes nor spaCy."""
+
+    def create_crawl_pool(self):
+        return ThreadPoolExecutor(max_workers=2)
+
+
+# Crawls of URLs containing "release" wait for this event
+release = threading.Event()
+
+
+def stub_crawl_job(job_id, documents_dir, url, query, user_keywords):
+    ingestion_jobs.worker_progress_queue.put((job_id, 5, 2))
+    if "fail" in url:
+        raise RuntimeError("unreachable")
+    if "release" in url:
+        release.wait(5)
+    return (None if "empty" in url else f"{documents_dir}/page.txt"), {'histograms': {}, 'counters': {}}
+
+
+@pytest.fixture
+def job_manager(tmp_path, monkeypatch):
+    monkeypatch.setattr(ingestion_jobs, "run_crawl_job", stub_crawl_job)
+    monkeypatch.setattr(config.ingestion, "max_finished_jobs", 2)
+    job_manager = ThreadedJobManager(StubChatBot(), str(tmp_path))
+    monkeypatch.setattr(ingestion_jobs, "worker_progress_queue", job_manager.progress_queue)
+    release.clear()
+    yield job_manager
+    release.set()
+    job_manager.shutdown()
+
+
+def wait_for(job_manager, job_id):
+    deadline = time.monotonic() + 5
+    while (job := job_manager.get_job(job_id)).status in ACTIVE_STATES:
+        assert time.monotonic() < deadline, job
+        time.sleep(0.01)
+    return job
+
+
+def test_crawled_documents_are_indexed(job_manager):
+    job = wait_for(job_manager, job_manager.submit("https://example.com/", "query").job_id)
+    assert (job.status, job.chunks_added, job.error) == ("done", 3, None)
+    assert job_manager.chatbot.updates == [job_manager.documents_dir]
+
+
+def test_failed_and_empty_crawls(job_manager):
+    failed = wait_for(job_manager, job_manager.submit("https://example.com/fail", "query").job_id)
+    assert failed.status == "failed"
+    assert "unreachable" in failed.error
+    empty = wait_for(job_manager, job_manager.submit("https://example.com/empty", "query").job_id)
+    assert (empty.status, empty.chunks_added) == ("done", 0)
+    assert job_manager.chatbot.updates == []
+
+
+def test_a_url_being_ingested_returns_the_running_job(job_manager):
+    job = job_manager.submit("https://example.com/release", "query")
+    assert job_manager.submit("https://example.com/release", "other query").job_id == job.job_id
+    release.set()
+    assert wait_for(job_manager, job.job_id).status == "done"
+    next_job = job_manager.submit("https://example.com/release", "query")
+    assert next_job.job_id != job.job_id
+    wait_for(job_manager, next_job.job_id)
+
+
+def test_only_the_latest_finished_jobs_are_kept(job_manager):
+    job_ids = [wait_for(job_manager, job_manager.submit(f"https://example.com/empty/{i}", "query").job_id).job_id
+               for i in range(4)]
+    running_job = job_manager.submit("https://example.com/release", "query")
+    assert [job.job_id for job in job_manager.list_jobs()] == [running_job.job_id] + job_ids[:1:-1]
+    release.set()
+    wait_for(job_manager, running_job.job_id)
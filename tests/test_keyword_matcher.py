@@ -0,0 +1,41 @@
+import random
+from src.keyword_matcher import KeywordMatcher
+
+
+def count_naively(keywords, text):
+    """The substring count KeywordMatcher replaces."""
+    return sum(1 for keyword in keywords if keyword and keyword.lower() in text.lower())
+
+
+def test_find_is_case_insensitive_and_includes_contained_keywords():
+    matcher = KeywordMatcher(["Python", "python programming", "program", "Java"])
+    assert matcher.find("Learn PYTHON Programming today") == {"python", "python programming", "program"}
+    assert matcher.find("no keywords here") == set()
+
+
+def test_count_counts_keywords_differing_by_case_separately():
+    matcher = KeywordMatcher(["Python", "python", "language"])
+    assert matcher.count("python is a language") == 3
+
+
+def test_no_keywords():
+    matcher = KeywordMatcher(["", ""])
+    assert matcher.keywords == []
+    assert matcher.find("anything") == set()
+    assert matcher.count("anything") == 0
+
+
+def test_regex_characters_are_literal():
+    matcher = KeywordMatcher(["c++", "a.b", "(x)"])
+    assert matcher.find("c++ and a.b and (x)") == {"c++", "a.b", "(x)"}
+    assert matcher.find("cc and axb and x") == set()
+
+
+def test_count_matches_substring_count():
+    rng = random.Random(0)
+    alphabet = "abc "
+    for _ in range(500):
+        keywords = ["".join(rng.choices(alphabet, k=rng.randint(1, 4))) for _ in range(rng.randint(0, 6))]
+        keywords += [keyword.upper() for keyword in keywords[:rng.randint(0, 2)]]
+        text = "".join(rng.choices(alphabet + "ABC", k=rng.randint(0, 30)))
+        assert KeywordMatcher(keywords).count(text) == count_naively(keywords, text), (keywords, text)
@@ -0,0 +1,91 @@
+import pytest
+from benchmarks.fixture_site import FixtureSite
+from src.page_cache import PageCache
+from src.utils import config
+from src.web_crawler import WebCrawler
+
+
+@pytest.fixture
+def page_cache(tmp_path):
+    page_cache = PageCache(tmp_path)
+    yield page_cache
+    page_cache.close()
+
+
+@pytest.fixture
+def web_crawler(page_cache, monkeypatch):
+    monkeypatch.setattr(config.web_crawler, "min_delay_per_host", 0.0)
+    web_crawler = WebCrawler(page_cache=page_cache)
+    yield web_crawler
+    web_crawler.close()
+
+
+def test_fresh_revalidated_and_changed_pages(web_crawler, monkeypatch):
+    pages = {"/page": b"<p>first version</p>"}
+    with FixtureSite(pages) as site:
+        url = f"{site.base_url}/page"
+        downloaded = web_crawler.fetch(url)
+        assert (downloaded.cache_status, downloaded.content, downloaded.encoding) == \
+            ("downloaded", pages["/page"], "utf-8")
+
+        fresh = web_crawler.fetch(url)
+        assert (fresh.cache_status, fresh.content, fresh.encoding) == ("fresh", pages["/page"], "utf-8")
+        assert site.request_count == 1
+
+        # Expired entries are revalidated with their ETag
+        monkeypatch.setattr(config.page_cache, "ttl", 0)
+        revalidated = web_crawler.fetch(url)
+        assert (revalidated.cache_status, revalidated.body_hash) == ("revalidated", downloaded.body_hash)
+        assert (site.request_count, site.not_modified_count) == (2, 1)
+
+        pages["/page"] = b"<p>second version</p>"
+        changed = web_crawler.fetch(url)
+        assert (changed.cache_status, changed.content) == ("downloaded", pages["/page"])
+        assert changed.body_hash != downloaded.body_hash
+
+
+def test_evicted_body_is_downloaded_again(web_crawler, page_cache, monkeypatch):
+    with FixtureSite({"/page": b"<p>text</p>"}) as site:
+        url = f"{site.base_url}/page"
+        body_hash = web_crawler.fetch(url).body_hash
+        page_cache.get_body_path(body_hash).unlink()
+        monkeypatch.setattr(config.page_cache, "ttl", 0)
+        assert web_crawler.fetch(url).cache_status == "downloaded"
+
+
+def test_lookup_and_conditional_headers(page_cache):
+    assert page_cache.lookup("https://example.com/") is None
+    page_cache.store("https://example.com/", b"body", encoding="latin-1", etag='"v1"',
+                     last_modified="Mon, 01 Jan 2024 00:00:00 GMT")
+    entry = page_cache.lookup("https://example.com/")
+    assert entry.encoding == "latin-1"
+    assert page_cache.is_fresh(entry)
+    assert page_cache.get_conditional_headers(entry) == {"If-None-Match": '"v1"',
+                                                         "If-Modified-Since": "Mon, 01 Jan 2024 00:00:00 GMT"}
+
+
+def test_parsed_pages_are_cached_per_parser_and_encoding(page_cache):
+    body_hash = page_cache.store("https://example.com/", b"<p>text</p>")
+    page_cache.put_parsed(body_hash, "lxml", None, {"paragraphs": ["text"], "links": [["/a", "a", ""]]})
+    parsed = page_cache.get_parsed(body_hash, "lxml")
+    assert parsed.paragraphs == ["text"]
+    assert parsed.links == [["/a", "a", ""]]
+    assert page_cache.get_parsed(body_hash, "selectolax") is None
+    assert page_cache.get_parsed(body_hash, "lxml", "iso-8859-1") is None
+
+
+def test_least_recently_used_pages_are_evicted(page_cache, monkeypatch):
+    monkeypatch.setattr(config.page_cache, "max_size_mb", 3.5 / 1024)
+    bodies = {f"https://example.com/{i}": bytes([i]) * 1024 for i in range(3)}
+    for url, body in bodies.items():
+        page_cache.store(url, body)
+        page_cache.put_parsed(page_cache.hash_body(body), "lxml", None, {"paragraphs": [], "links": []})
+    # The first page is used again, so the second one is evicted
+    page_cache.lookup("https://example.com/0")
+    page_cache.store("https://example.com/3", b"x" * 1024)
+
+    assert page_cache.lookup("https://example.com/1") is None
+    assert not page_cache.get_body_path(page_cache.hash_body(bodies["https://example.com/1"])).exists()
+    assert page_cache.get_parsed(page_cache.hash_body(bodies["https://example.com/1"]), "lxml") is None
+    assert page_cache.lookup("https://example.com/0") is not None
+    assert page_cache.lookup("https://example.com/3") is not None
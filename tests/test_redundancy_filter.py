@@ -0,0 +1,41 @@
+from src.redundancy_filter import RedundancyFilter
+
+PARAGRAPHS = [
+    "Python is a high-level, general-purpose programming language created by Guido van Rossum.",
+    "Its design philosophy emphasizes code readability with the use of significant indentation.",
+    "Python is dynamically typed and garbage-collected, and supports multiple programming paradigms.",
+]
+
+
+def create_filter():
+    return RedundancyFilter(similarity_threshold=0.8)
+
+
+def test_distinct_paragraphs_are_kept_in_order():
+    assert create_filter().filter(PARAGRAPHS) == PARAGRAPHS
+
+
+def test_near_duplicates_are_dropped():
+    near_duplicate = PARAGRAPHS[0].replace("Guido van Rossum.", "Guido van Rossum!").upper()
+    assert create_filter().filter([PARAGRAPHS[0], PARAGRAPHS[1], near_duplicate]) == PARAGRAPHS[:2]
+
+
+def test_accepted_paragraphs_are_remembered_across_calls():
+    redundancy_filter = create_filter()
+    redundancy_filter.filter(PARAGRAPHS[:2])
+    assert redundancy_filter.filter(PARAGRAPHS) == PARAGRAPHS[2:]
+    redundancy_filter.reset()
+    assert redundancy_filter.filter(PARAGRAPHS[:1]) == PARAGRAPHS[:1]
+
+
+def test_limit_counts_accepted_paragraphs_only():
+    redundancy_filter = create_filter()
+    assert redundancy_filter.filter([PARAGRAPHS[0], PARAGRAPHS[0], PARAGRAPHS[1], PARAGRAPHS[2]], limit=2) == \
+        PARAGRAPHS[:2]
+    # Paragraphs beyond the limit were not remembered
+    assert redundancy_filter.filter([PARAGRAPHS[2]]) == [PARAGRAPHS[2]]
+
+
+def test_empty_and_one_word_paragraphs():
+    assert create_filter().filter([]) == []
+    assert create_filter().filter(["python", "java", "Python"]) == ["python", "java"]
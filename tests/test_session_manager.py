@@ -0,0 +1,48 @@
+import pytest
+from src.session_manager import SessionManager
+from src.utils import config
+
+
+@pytest.fixture
+def created_chains():
+    return []
+
+
+@pytest.fixture
+def session_manager(created_chains, monkeypatch):
+    monkeypatch.setattr(config.web_interface, "max_sessions", 2)
+    monkeypatch.setattr(config.web_interface, "session_ttl", 3600)
+
+    def create_retrieval_chain(chat_history=None):
+        created_chains.append(chat_history)
+        return f"chain {len(created_chains)}"
+
+    return SessionManager(create_retrieval_chain)
+
+
+def test_each_session_keeps_its_own_chain(session_manager, created_chains):
+    first = session_manager.get_session("a", history=[["Hi", "Hello"]])
+    second = session_manager.get_session("b")
+    assert session_manager.get_session("a") is first
+    assert (first.retrieval_chain, second.retrieval_chain) == ("chain 1", "chain 2")
+    assert created_chains == [[["Hi", "Hello"]], None]
+    assert first.lock is not second.lock
+
+
+def test_least_recently_used_session_is_evicted(session_manager, created_chains):
+    session_manager.get_session("a")
+    session_manager.get_session("b")
+    session_manager.get_session("a")
+    session_manager.get_session("c")
+    assert list(session_manager.sessions) == ["a", "c"]
+    # An evicted session is rebuilt from the history the UI still shows
+    assert session_manager.get_session("b", history=[["Q", "A"]]).retrieval_chain == "chain 4"
+    assert created_chains[-1] == [["Q", "A"]]
+
+
+def test_idle_sessions_are_evicted(session_manager, monkeypatch):
+    session_manager.get_session("a")
+    monkeypatch.setattr(config.web_interface, "session_ttl", -1)
+    session_manager.get_session("b")
+    assert list(session_manager.sessions) == ["b"]
+    assert len(session_manager) == 1
@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+from box import Box
+
+pytest.importorskip("llama_cpp")
+
+from src.speculative_decoding import TrackedDraftModel, create_draft_model
+
+
+class ScriptedDraftModel:
+    """Returns the given drafts in order."""
+
+    def __init__(self, drafts):
+        self.drafts = iter(drafts)
+
+    def __call__(self, input_ids, /, **kwargs):
+        return np.array(next(self.drafts), dtype=np.intc)
+
+
+def tokens(*ids):
+    return np.array(ids, dtype=np.intc)
+
+
+def test_prompt_lookup_acceptance():
+    tracked = create_draft_model(Box(mode="prompt_lookup", max_ngram_size=2, num_pred_tokens=4), n_ctx=64)
+    prompt = tokens(5, 6, 7, 8, 9, 1, 5, 6)
+    assert tracked(prompt).tolist() == [7, 8, 9, 1]
+    # The model kept 7 and 8, then sampled 3 instead of 9
+    tracked(np.concatenate([prompt, tokens(7, 8, 3)]))
+    assert (tracked.accepted, tracked.drafted) == (2, 4)
+    assert tracked.acceptance_rate == 0.5
+
+
+def test_no_rate_before_a_draft_is_verified():
+    tracked = TrackedDraftModel(ScriptedDraftModel([[1, 2]]))
+    assert tracked.acceptance_rate is None
+    tracked(tokens(9))
+    assert tracked.acceptance_rate is None
+
+
+def test_fully_accepted_and_rejected_drafts():
+    tracked = TrackedDraftModel(ScriptedDraftModel([[1, 2, 3], [4, 5], []]))
+    tracked(tokens(9))
+    tracked(tokens(9, 1, 2, 3, 7))
+    tracked(tokens(9, 1, 2, 3, 7, 6))
+    assert (tracked.accepted, tracked.drafted) == (3, 5)
+
+
+def test_last_draft_of_a_completion_is_not_counted():
+    tracked = TrackedDraftModel(ScriptedDraftModel([[1, 2], [3, 4]]))
+    tracked(tokens(9, 8))
+    # A new prompt that does not extend the previous input starts another completion
+    tracked(tokens(7))
+    assert tracked.drafted == 0